@@ -5,13 +5,15 @@ This avoids import issues and segmentation faults.
 """
 
 import random
-import sqlite3
 import logging
 from datetime import datetime
 import time
 import os
 from dotenv import load_dotenv
 
+from dbSchema import connect, migrate
+from tradeStats import daily_stats_statements
+
 # Load environment variables
 load_dotenv()
 
@@ -26,47 +28,13 @@ class SimpleSimulator:
     """Simplified trading simulator for testing"""
     
     def __init__(self, db_path='paper_trading.db'):
-        self.conn = sqlite3.connect(db_path)
+        self.conn = connect(db_path)
         self.init_database()
         self.trades_executed = []
         
     def init_database(self):
         """Initialize the database tables"""
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS price_history (
-                symbol TEXT,
-                timestamp DATETIME,
-                price REAL,
-                daily_change_pct REAL,
-                PRIMARY KEY (symbol, timestamp)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                symbol TEXT,
-                timestamp DATETIME,
-                action TEXT,
-                quantity REAL,
-                price REAL,
-                amount REAL,
-                reason TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS positions (
-                symbol TEXT PRIMARY KEY,
-                quantity REAL,
-                avg_price REAL,
-                last_update DATETIME
-            )
-        ''')
-        
-        self.conn.commit()
+        migrate(self.conn)
         
     def generate_test_data(self, num_stocks=30):
         """Generate test stocks with various price movements"""
@@ -115,12 +83,18 @@ class SimpleSimulator:
             change_pct = stock['change_pct']
             
             # Record price history
+            now = datetime.now()
             cursor = self.conn.cursor()
             cursor.execute('''
                 INSERT OR REPLACE INTO price_history 
                 (symbol, timestamp, price, daily_change_pct)
                 VALUES (?, ?, ?, ?)
-            ''', (symbol, datetime.now(), price, change_pct))
+            ''', (symbol, now, price, change_pct))
+            cursor.execute('''
+                INSERT OR REPLACE INTO latest_price 
+                (symbol, timestamp, price, daily_change_pct)
+                VALUES (?, ?, ?, ?)
+            ''', (symbol, now, price, change_pct))
             
             # Check for trades
             if change_pct <= buy_threshold:
@@ -136,6 +110,8 @@ class SimpleSimulator:
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (symbol, datetime.now(), 'buy', quantity, price, 10.0, 
                       f"Price dropped {change_pct*100:.2f}%"))
+                for sql, params in daily_stats_statements(symbol, datetime.now(), 'buy', 10.0):
+                    cursor.execute(sql, params)
                 
                 # Update position
                 cursor.execute('''
@@ -158,6 +134,8 @@ class SimpleSimulator:
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (symbol, datetime.now(), 'sell', quantity, price, 10.0, 
                       f"Price increased {change_pct*100:.2f}%"))
+                for sql, params in daily_stats_statements(symbol, datetime.now(), 'sell', 10.0):
+                    cursor.execute(sql, params)
                 
                 self.trades_executed.append(('sell', symbol, price, change_pct))
             
@@ -1,14 +1,33 @@
-from flask import Flask, render_template_string, jsonify, request
+from flask import Flask, render_template_string, jsonify, request, Response, g
 from flask_cors import CORS
 import sqlite3
 import json
+import base64
+import csv
+import io
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
 from datetime import datetime, timedelta
 import pandas as pd
+import numpy as np
 import os
+import queue
+
+from changeFeed import FeedBroadcaster
+from dbSchema import connect, connect_readonly, migrate
+from metrics import load_snapshot, metrics_path_for, registry, render_prometheus
+from tickStore import TickStore, store_path_for
+from tradeStats import DAILY_TRADES_MARKER
 
 app = Flask(__name__)
 CORS(app)
 
+REQUEST_SECONDS = registry.histogram('dashboard_request_seconds', 'Dashboard request latency by endpoint')
+CACHE_REQUESTS = registry.counter('dashboard_cache_requests_total', 'Response cache lookups by result (hit, miss)')
+
 # HTML template embedded in Python file for easier deployment
 DASHBOARD_HTML = '''<!DOCTYPE html>
 <html lang="en">
@@ -112,140 +131,393 @@ DASHBOARD_HTML = '''<!DOCTYPE html>
     
     <script>
         let performanceChart;
+        // symbol -> position, kept current by the live stream between full loads
+        let positions = {};
         
-        async function updateDashboard() {
-            try {
-                // Update portfolio
-                const portfolioRes = await fetch('/api/portfolio');
-                const portfolioData = await portfolioRes.json();
-                
-                // Update summary
-                document.getElementById('totalValue').textContent = `${portfolioData.summary.total_value.toFixed(2)}`;
-                document.getElementById('totalCost').textContent = `${portfolioData.summary.total_cost.toFixed(2)}`;
-                document.getElementById('totalPnL').textContent = `${portfolioData.summary.total_pnl.toFixed(2)}`;
-                document.getElementById('totalPnL').className = portfolioData.summary.total_pnl >= 0 ? 'text-2xl font-bold positive' : 'text-2xl font-bold negative';
-                document.getElementById('totalPnLPct').textContent = `${portfolioData.summary.total_pnl_pct.toFixed(2)}%`;
-                document.getElementById('totalPnLPct').className = portfolioData.summary.total_pnl_pct >= 0 ? 'text-2xl font-bold positive' : 'text-2xl font-bold negative';
-                document.getElementById('positionCount').textContent = portfolioData.summary.position_count;
-                
-                // Update positions table
-                const positionsTable = document.getElementById('positionsTable');
-                positionsTable.innerHTML = '';
-                portfolioData.positions.forEach(pos => {
-                    const row = `
-                        <tr class="border-b">
-                            <td class="py-2 font-medium">${pos.symbol}</td>
-                            <td class="py-2">${pos.quantity}</td>
-                            <td class="py-2">${pos.avg_price.toFixed(2)}</td>
-                            <td class="py-2">${pos.current_price.toFixed(2)}</td>
-                            <td class="py-2">${pos.value.toFixed(2)}</td>
-                            <td class="py-2 ${pos.pnl >= 0 ? 'positive' : 'negative'}">${pos.pnl.toFixed(2)}</td>
-                            <td class="py-2 ${pos.pnl_pct >= 0 ? 'positive' : 'negative'}">${pos.pnl_pct.toFixed(2)}%</td>
-                            <td class="py-2 ${pos.daily_change_pct >= 0 ? 'positive' : 'negative'}">${pos.daily_change_pct.toFixed(2)}%</td>
-                        </tr>
-                    `;
-                    positionsTable.innerHTML += row;
-                });
-                
-                // Update trades
-                const tradesRes = await fetch('/api/trades');
-                const tradesData = await tradesRes.json();
-                
-                const tradesTable = document.getElementById('tradesTable');
-                tradesTable.innerHTML = '';
-                tradesData.trades.forEach(trade => {
-                    const time = new Date(trade.timestamp).toLocaleString();
-                    const row = `
-                        <tr class="border-b">
-                            <td class="py-2 text-sm">${time}</td>
-                            <td class="py-2 font-medium">${trade.symbol}</td>
-                            <td class="py-2 ${trade.action === 'buy' ? 'positive' : 'negative'}">${trade.action.toUpperCase()}</td>
-                            <td class="py-2">${trade.quantity}</td>
-                            <td class="py-2">${trade.price.toFixed(2)}</td>
-                            <td class="py-2">${trade.amount.toFixed(2)}</td>
-                            <td class="py-2 text-sm text-gray-600">${trade.reason}</td>
-                        </tr>
-                    `;
-                    tradesTable.innerHTML += row;
-                });
-                
-                // Update performance chart
-                const perfRes = await fetch('/api/performance');
-                const perfData = await perfRes.json();
-                
-                const chartData = {
-                    labels: perfData.daily_pnl.map(d => d.date),
-                    datasets: [{
-                        label: 'Cumulative P&L',
-                        data: perfData.daily_pnl.map(d => d.cumulative_pnl),
-                        borderColor: 'rgb(59, 130, 246)',
-                        backgroundColor: 'rgba(59, 130, 246, 0.1)',
-                        fill: true,
-                        tension: 0.1
-                    }]
-                };
-                
-                if (performanceChart) {
-                    performanceChart.data = chartData;
-                    performanceChart.update();
-                } else {
-                    const ctx = document.getElementById('performanceChart').getContext('2d');
-                    performanceChart = new Chart(ctx, {
-                        type: 'line',
-                        data: chartData,
-                        options: {
-                            responsive: true,
-                            maintainAspectRatio: false,
-                            plugins: {
-                                legend: {
-                                    display: false
-                                },
-                                tooltip: {
-                                    callbacks: {
-                                        label: function(context) {
-                                            return ' + context.parsed.y.toFixed(2);
-                                        }
+        function money(value) {
+            return `$${value.toFixed(2)}`;
+        }
+        
+        function renderPortfolio() {
+            let totalValue = 0;
+            let totalCost = 0;
+            const rows = [];
+            Object.values(positions).forEach(pos => {
+                const value = pos.quantity * pos.current_price;
+                const cost = pos.quantity * pos.avg_price;
+                const pnl = value - cost;
+                const pnlPct = cost > 0 ? (pnl / cost) * 100 : 0;
+                totalValue += value;
+                totalCost += cost;
+                rows.push(`
+                    <tr class="border-b">
+                        <td class="py-2 font-medium">${pos.symbol}</td>
+                        <td class="py-2">${Number(pos.quantity.toFixed(4))}</td>
+                        <td class="py-2">${money(pos.avg_price)}</td>
+                        <td class="py-2">${money(pos.current_price)}</td>
+                        <td class="py-2">${money(value)}</td>
+                        <td class="py-2 ${pnl >= 0 ? 'positive' : 'negative'}">${money(pnl)}</td>
+                        <td class="py-2 ${pnlPct >= 0 ? 'positive' : 'negative'}">${pnlPct.toFixed(2)}%</td>
+                        <td class="py-2 ${pos.daily_change_pct >= 0 ? 'positive' : 'negative'}">${pos.daily_change_pct.toFixed(2)}%</td>
+                    </tr>
+                `);
+            });
+            document.getElementById('positionsTable').innerHTML = rows.join('');
+            
+            const totalPnl = totalValue - totalCost;
+            const totalPnlPct = totalCost > 0 ? (totalPnl / totalCost) * 100 : 0;
+            document.getElementById('totalValue').textContent = money(totalValue);
+            document.getElementById('totalCost').textContent = money(totalCost);
+            document.getElementById('totalPnL').textContent = money(totalPnl);
+            document.getElementById('totalPnL').className = totalPnl >= 0 ? 'text-2xl font-bold positive' : 'text-2xl font-bold negative';
+            document.getElementById('totalPnLPct').textContent = `${totalPnlPct.toFixed(2)}%`;
+            document.getElementById('totalPnLPct').className = totalPnlPct >= 0 ? 'text-2xl font-bold positive' : 'text-2xl font-bold negative';
+            document.getElementById('positionCount').textContent = rows.length;
+        }
+        
+        function tradeRow(trade) {
+            const time = new Date(trade.timestamp).toLocaleString();
+            return `
+                <tr class="border-b">
+                    <td class="py-2 text-sm">${time}</td>
+                    <td class="py-2 font-medium">${trade.symbol}</td>
+                    <td class="py-2 ${trade.action === 'buy' ? 'positive' : 'negative'}">${trade.action.toUpperCase()}</td>
+                    <td class="py-2">${Number(trade.quantity.toFixed(4))}</td>
+                    <td class="py-2">${money(trade.price)}</td>
+                    <td class="py-2">${money(trade.amount)}</td>
+                    <td class="py-2 text-sm text-gray-600">${trade.reason}</td>
+                </tr>
+            `;
+        }
+        
+        async function loadPortfolio() {
+            const portfolioRes = await fetch('/api/portfolio');
+            const portfolioData = await portfolioRes.json();
+            positions = {};
+            portfolioData.positions.forEach(pos => { positions[pos.symbol] = pos; });
+            renderPortfolio();
+        }
+        
+        async function loadTrades() {
+            const tradesRes = await fetch('/api/trades');
+            const tradesData = await tradesRes.json();
+            document.getElementById('tradesTable').innerHTML = tradesData.trades.map(tradeRow).join('');
+        }
+        
+        async function loadPerformance() {
+            const perfRes = await fetch('/api/performance');
+            const perfData = await perfRes.json();
+            
+            const chartData = {
+                labels: perfData.daily_pnl.map(d => d.date),
+                datasets: [{
+                    label: 'Cumulative P&L',
+                    data: perfData.daily_pnl.map(d => d.cumulative_pnl),
+                    borderColor: 'rgb(59, 130, 246)',
+                    backgroundColor: 'rgba(59, 130, 246, 0.1)',
+                    fill: true,
+                    tension: 0.1
+                }]
+            };
+            
+            if (performanceChart) {
+                performanceChart.data = chartData;
+                performanceChart.update();
+            } else {
+                const ctx = document.getElementById('performanceChart').getContext('2d');
+                performanceChart = new Chart(ctx, {
+                    type: 'line',
+                    data: chartData,
+                    options: {
+                        responsive: true,
+                        maintainAspectRatio: false,
+                        plugins: {
+                            legend: {
+                                display: false
+                            },
+                            tooltip: {
+                                callbacks: {
+                                    label: function(context) {
+                                        return '$' + context.parsed.y.toFixed(2);
                                     }
                                 }
-                            },
-                            scales: {
-                                y: {
-                                    beginAtZero: true,
-                                    ticks: {
-                                        callback: function(value) {
-                                            return ' + value;
-                                        }
+                            }
+                        },
+                        scales: {
+                            y: {
+                                beginAtZero: true,
+                                ticks: {
+                                    callback: function(value) {
+                                        return '$' + value;
                                     }
                                 }
                             }
                         }
-                    });
-                }
+                    }
+                });
+            }
+        }
+        
+        async function updateDashboard() {
+            try {
+                await Promise.all([loadPortfolio(), loadTrades(), loadPerformance()]);
             } catch (error) {
                 console.error('Error updating dashboard:', error);
             }
         }
         
-        // Update dashboard every 30 seconds
+        // Live updates: the bot's change feed pushes trades, position changes
+        // and prices for held symbols, so there is nothing to poll for
+        let performanceTimer;
+        
+        function connectStream() {
+            const source = new EventSource('/api/stream');
+            
+            source.addEventListener('trade', event => {
+                const trade = JSON.parse(event.data);
+                const tradesTable = document.getElementById('tradesTable');
+                tradesTable.insertAdjacentHTML('afterbegin', tradeRow(trade));
+                while (tradesTable.rows.length > 50) {
+                    tradesTable.deleteRow(-1);
+                }
+                // A burst of trades only needs one chart refresh
+                clearTimeout(performanceTimer);
+                performanceTimer = setTimeout(loadPerformance, 2000);
+            });
+            
+            source.addEventListener('position', event => {
+                const change = JSON.parse(event.data);
+                if (change.quantity <= 0) {
+                    delete positions[change.symbol];
+                } else if (positions[change.symbol]) {
+                    positions[change.symbol].quantity = change.quantity;
+                    positions[change.symbol].avg_price = change.avg_price;
+                } else {
+                    positions[change.symbol] = {
+                        symbol: change.symbol, quantity: change.quantity, avg_price: change.avg_price,
+                        current_price: change.avg_price, daily_change_pct: 0
+                    };
+                }
+                renderPortfolio();
+            });
+            
+            source.addEventListener('prices', event => {
+                const prices = JSON.parse(event.data);
+                Object.entries(prices).forEach(([symbol, [price, changePct]]) => {
+                    if (positions[symbol]) {
+                        positions[symbol].current_price = price;
+                        positions[symbol].daily_change_pct = changePct ? changePct * 100 : 0;
+                    }
+                });
+                renderPortfolio();
+            });
+            
+            // We fell behind the feed; start over from a full load
+            source.addEventListener('resync', updateDashboard);
+            return source;
+        }
+        
         updateDashboard();
-        setInterval(updateDashboard, 30000);
+        if (window.EventSource) {
+            connectStream();
+            // Occasional full reload in case anything was missed
+            setInterval(updateDashboard, 300000);
+        } else {
+            // Update dashboard every 30 seconds
+            setInterval(updateDashboard, 30000);
+        }
     </script>
 </body>
 </html>'''
 
+class PooledConnection(sqlite3.Connection):
+    """A pooled connection remembers which database file it was opened on"""
+    inode = None
+
+class ConnectionPool:
+    """Read-only connections reused across requests
+    
+    A request checks a connection out on first use and returns it when
+    its app context tears down, so each connection is only ever used by
+    one thread at a time, whatever threading the WSGI server does. Idle
+    connections keep their page cache and prepared statements warm.
+    The pool is dropped after a fork (each worker process builds its own)
+    and when the database file is replaced.
+    """
+    
+    def __init__(self, db_path='paper_trading.db', max_idle=16):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle = []
+        self.pid = os.getpid()
+        self.inode = None
+        self.schema_ready = False
+    
+    def acquire(self):
+        """A read-only connection, or None if the database doesn't exist yet"""
+        try:
+            inode = os.stat(self.db_path).st_ino
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            if self.pid != os.getpid() or self.inode != inode:
+                # Never share SQLite handles across a fork; a new file needs new handles
+                if self.pid == os.getpid():
+                    for conn in self.idle:
+                        conn.close()
+                self.idle = []
+                self.pid = os.getpid()
+                self.inode = inode
+                self.schema_ready = False
+            if self.idle:
+                return self.idle.pop()
+            if not self.schema_ready:
+                # The dashboard may be started against a database the bot hasn't upgraded yet
+                conn = connect(self.db_path)
+                migrate(conn)
+                conn.close()
+                self.schema_ready = True
+        conn = connect_readonly(self.db_path, check_same_thread=False, factory=PooledConnection)
+        conn.row_factory = sqlite3.Row
+        conn.inode = inode
+        return conn
+    
+    def release(self, conn):
+        with self.lock:
+            if self.pid == os.getpid() and conn.inode == self.inode and len(self.idle) < self.max_idle:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+db_pool = ConnectionPool()
+
 def get_db_connection():
-    # Check if database exists
-    if not os.path.exists('paper_trading.db'):
-        return None
-    conn = sqlite3.connect('paper_trading.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """This request's pooled read-only connection (None if there is no database)
+    
+    Returned to the pool when the request ends; don't close it.
+    """
+    if 'db' not in g:
+        conn = db_pool.acquire()
+        if conn is None:
+            return None
+        g.db = conn
+    return g.db
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+class ResponseCache:
+    """Memoized JSON responses, invalidated by the database's change marker
+    
+    PRAGMA data_version on a long-lived connection changes whenever any
+    other connection commits, and costs no table reads. While it holds,
+    cached bodies are served as-is. When it moves, routes with a
+    high-water mark query (e.g. MAX(trades.id)) check that first and only
+    rebuild if it moved too, so price writes don't invalidate trade views.
+    """
+    
+    def __init__(self, db_path='paper_trading.db', max_entries=256):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = None
+        self.inode = None
+        self.entries = OrderedDict()  # key -> [data_version, marker, body, etag]
+    
+    def data_version(self):
+        """Change marker for the whole database; call with self.lock held"""
+        # A replaced database file needs a fresh connection
+        inode = os.stat(self.db_path).st_ino
+        if self.conn is None or inode != self.inode:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = connect_readonly(self.db_path, check_same_thread=False)
+            self.inode = inode
+            self.entries.clear()
+        return inode, self.conn.execute('PRAGMA data_version').fetchone()[0]
+    
+    def get(self, key, marker_sql=None):
+        """(version, marker, entry) for key; entry is None if it must be rebuilt
+        
+        Markers are read before the view runs, so a rebuilt body is never
+        older than the marks it is stored under.
+        """
+        with self.lock:
+            version = self.data_version()
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                marker = self.conn.execute(marker_sql).fetchone() if marker_sql else None
+                if entry is None or marker_sql is None or marker != entry[1]:
+                    return version, marker, None
+                entry[0] = version  # something else changed; this view didn't
+            self.entries.move_to_end(key)
+            CACHE_REQUESTS.inc(result='hit')
+            return version, entry[1], entry
+    
+    def put(self, key, version, marker, body):
+        etag = hashlib.sha1(body).hexdigest()
+        CACHE_REQUESTS.inc(result='miss')
+        with self.lock:
+            self.entries[key] = [version, marker, body, etag]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return etag
+
+response_cache = ResponseCache()
+
+def cached_json(marker_sql=None):
+    """Serve a JSON view from response_cache, with an ETag and 304s
+    
+    marker_sql, if given, is a cheap query whose result changes whenever
+    the view's output can (its high-water mark).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not os.path.exists(response_cache.db_path):
+                return view(*args, **kwargs)
+            
+            key = request.full_path
+            version, marker, entry = response_cache.get(key, marker_sql)
+            if entry is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                etag = response_cache.put(key, version, marker, body)
+            else:
+                body, etag = entry[2], entry[3]
+            
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            # Let browsers keep the body but always revalidate it
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    # Streams are timed to their first byte, not their end
+    if 'request_start' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or 'unknown')
+    return response
 
 @app.route('/')
 def index():
     return render_template_string(DASHBOARD_HTML)
 
 @app.route('/api/portfolio')
+@cached_json()
 def get_portfolio():
     conn = get_db_connection()
     if not conn:
@@ -256,16 +528,12 @@ def get_portfolio():
     
     cursor = conn.cursor()
     
-    # Get positions
+    # Get positions with their latest observed price
     cursor.execute('''
         SELECT p.symbol, p.quantity, p.avg_price,
-               h.price as current_price, h.daily_change_pct
+               l.price as current_price, l.daily_change_pct
         FROM positions p
-        LEFT JOIN (
-            SELECT symbol, price, daily_change_pct,
-                   ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC) as rn
-            FROM price_history
-        ) h ON p.symbol = h.symbol AND h.rn = 1
+        LEFT JOIN latest_price l ON p.symbol = l.symbol
         WHERE p.quantity > 0
     ''')
     
@@ -297,8 +565,6 @@ def get_portfolio():
     total_pnl = total_value - total_cost
     total_pnl_pct = (total_pnl / total_cost) * 100 if total_cost > 0 else 0
     
-    conn.close()
-    
     return jsonify({
         'positions': positions,
         'summary': {
@@ -310,26 +576,56 @@ def get_portfolio():
         }
     })
 
+# /api/trades pages are capped; bigger pulls go through /api/trades/export
+MAX_TRADES_PAGE = 500
+
+TRADE_COLUMNS = ['id', 'symbol', 'timestamp', 'action', 'quantity', 'price', 'amount', 'reason']
+
+def encode_cursor(timestamp, trade_id):
+    return base64.urlsafe_b64encode(json.dumps([timestamp, trade_id]).encode()).decode()
+
+def decode_cursor(cursor):
+    """(timestamp, id) from a next_cursor value, or None if it isn't one"""
+    try:
+        timestamp, trade_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(timestamp), int(trade_id)
+    except (ValueError, TypeError):
+        return None
+
 @app.route('/api/trades')
+@cached_json('SELECT MAX(id) FROM trades')
 def get_trades():
+    """Newest trades first, a page at a time
+    
+    Pass the response's next_cursor back as ?cursor= for the next page.
+    Pages are keyset-based on (timestamp, id), so each one is an index
+    range scan however deep into the history it is.
+    """
     conn = get_db_connection()
     if not conn:
-        return jsonify({'trades': []})
+        return jsonify({'trades': [], 'next_cursor': None})
     
     cursor = conn.cursor()
     
     # Get limit from query params
-    limit = request.args.get('limit', 50, type=int)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_TRADES_PAGE)
+    after = None
+    if request.args.get('cursor'):
+        after = decode_cursor(request.args['cursor'])
+        if after is None:
+            return jsonify({'error': 'invalid cursor'}), 400
     
-    cursor.execute('''
-        SELECT symbol, timestamp, action, quantity, price, amount, reason
+    cursor.execute(f'''
+        SELECT id, symbol, timestamp, action, quantity, price, amount, reason
         FROM trades
-        ORDER BY timestamp DESC
+        {'WHERE (timestamp, id) < (?, ?)' if after else ''}
+        ORDER BY timestamp DESC, id DESC
         LIMIT ?
-    ''', (limit,))
+    ''', (*(after or ()), limit))
     
     trades = []
-    for row in cursor.fetchall():
+    rows = cursor.fetchall()
+    for row in rows:
         trades.append({
             'symbol': row['symbol'],
             'timestamp': row['timestamp'],
@@ -340,10 +636,72 @@ def get_trades():
             'reason': row['reason']
         })
     
-    conn.close()
-    return jsonify({'trades': trades})
+    next_cursor = encode_cursor(rows[-1]['timestamp'], rows[-1]['id']) if len(rows) == limit else None
+    return jsonify({'trades': trades, 'next_cursor': next_cursor})
+
+@app.route('/api/trades/export')
+def export_trades():
+    """Full trade history as NDJSON (default) or CSV, oldest first
+    
+    Rows are streamed straight from a keyset cursor in chunks, so memory
+    stays flat however long the history is. Optional ?since= and ?until=
+    bound the timestamps (since inclusive, until exclusive).
+    """
+    if get_db_connection() is None:
+        return jsonify({'error': 'no database'}), 404
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    since = request.args.get('since')
+    until = request.args.get('until')
+    
+    def rows():
+        # Streams outlive the request's pooled connection, so use a private one
+        conn = connect_readonly('paper_trading.db')
+        try:
+            after = (since or '', -1)
+            while True:
+                chunk = conn.execute(f'''
+                    SELECT {', '.join(TRADE_COLUMNS)}
+                    FROM trades
+                    WHERE (timestamp, id) > (?, ?) {'AND timestamp < ?' if until else ''}
+                    ORDER BY timestamp, id
+                    LIMIT 1000
+                ''', (*after, *((until,) if until else ()))).fetchall()
+                if not chunk:
+                    break
+                yield chunk
+                after = (chunk[-1][2], chunk[-1][0])
+        finally:
+            conn.close()
+    
+    def ndjson():
+        for chunk in rows():
+            yield ''.join(json.dumps(dict(zip(TRADE_COLUMNS, row))) + '\n' for row in chunk)
+    
+    def csv_lines():
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(TRADE_COLUMNS)
+        for chunk in rows():
+            writer.writerows(chunk)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        if out.getvalue():
+            yield out.getvalue()  # header only, when there are no trades
+    
+    if export_format == 'csv':
+        body, mimetype = csv_lines(), 'text/csv'
+    else:
+        body, mimetype = ndjson(), 'application/x-ndjson'
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=trades.{export_format}'
+    })
 
 @app.route('/api/performance')
+@cached_json(DAILY_TRADES_MARKER)
 def get_performance():
     conn = get_db_connection()
     if not conn:
@@ -354,40 +712,34 @@ def get_performance():
     
     cursor = conn.cursor()
     
-    # Get daily P&L
+    # Daily P&L, pre-aggregated one row per trading day (see tradeStats.py)
     cursor.execute('''
-        SELECT DATE(timestamp) as date,
-               SUM(CASE WHEN action = 'buy' THEN -amount ELSE amount END) as daily_pnl
-        FROM trades
-        GROUP BY DATE(timestamp)
+        SELECT date, sell_amount - buy_amount as daily_pnl, cumulative_pnl
+        FROM daily_trades
         ORDER BY date
     ''')
     
     daily_pnl = []
-    cumulative_pnl = 0
     for row in cursor.fetchall():
-        cumulative_pnl += row['daily_pnl']
         daily_pnl.append({
             'date': row['date'],
             'daily_pnl': round(row['daily_pnl'], 2),
-            'cumulative_pnl': round(cumulative_pnl, 2)
+            'cumulative_pnl': round(row['cumulative_pnl'], 2)
         })
     
     # Get trade statistics
     cursor.execute('''
         SELECT 
-            COUNT(*) as total_trades,
-            SUM(CASE WHEN action = 'buy' THEN 1 ELSE 0 END) as buy_trades,
-            SUM(CASE WHEN action = 'sell' THEN 1 ELSE 0 END) as sell_trades,
-            COUNT(DISTINCT symbol) as unique_symbols,
-            COUNT(DISTINCT DATE(timestamp)) as trading_days
-        FROM trades
+            SUM(buy_count + sell_count) as total_trades,
+            SUM(buy_count) as buy_trades,
+            SUM(sell_count) as sell_trades,
+            (SELECT COUNT(*) FROM traded_symbols) as unique_symbols,
+            COUNT(*) as trading_days
+        FROM daily_trades
     ''')
     
     stats = cursor.fetchone()
     
-    conn.close()
-    
     return jsonify({
         'daily_pnl': daily_pnl,
         'statistics': {
@@ -400,5 +752,103 @@ def get_performance():
         }
     })
 
+# Started by the first /api/stream client; shared by all of them
+feed_broadcaster = None
+feed_broadcaster_lock = threading.Lock()
+
+def get_feed_broadcaster():
+    global feed_broadcaster
+    if feed_broadcaster is None:
+        # Concurrent first clients must not start a second tailing thread
+        with feed_broadcaster_lock:
+            if feed_broadcaster is None:
+                feed_broadcaster = FeedBroadcaster('paper_trading.db').start()
+    return feed_broadcaster
+
+def format_event(event_id, kind, payload):
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events: trades, position changes and held-symbol prices as they happen"""
+    if get_db_connection() is None:
+        return jsonify({'error': 'no database'}), 404
+    
+    broadcaster = get_feed_broadcaster()
+    subscriber = broadcaster.subscribe()
+    # EventSource sends this when it reconnects, so missed events can be replayed
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    
+    def events():
+        # Highest event id sent so far; the subscription started before the
+        # replay, so the queue can repeat events the replay already sent (or,
+        # if the replay was a resync, events the reload already covers)
+        sent = last_event_id
+        try:
+            yield 'retry: 3000\n\n'
+            if last_event_id is not None:
+                for event_id, _, kind, payload in broadcaster.events_since(last_event_id):
+                    yield format_event(event_id, kind, payload)
+                    sent = event_id
+            while True:
+                try:
+                    event_id, _, kind, payload = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if sent is not None and event_id <= sent and kind != 'resync':
+                    continue  # already sent
+                yield format_event(event_id, kind, payload)
+                sent = event_id if sent is None else max(sent, event_id)
+        finally:
+            broadcaster.unsubscribe(subscriber)
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/prices/<symbol>')
+def get_price_series(symbol):
+    """Recorded prices for one symbol, read from the tick store"""
+    if not os.path.isdir(store_path_for('paper_trading.db')):
+        return jsonify({'symbol': symbol, 'prices': []})
+    
+    # Default to the last day of observations
+    days = request.args.get('days', 1, type=int)
+    start = request.args.get('start') or (datetime.now() - timedelta(days=days)).isoformat()
+    end = request.args.get('end')
+    
+    data = TickStore(store_path_for('paper_trading.db')).read(start, end, symbol=symbol.upper())
+    timestamps = np.datetime_as_string(data['timestamp'], unit='s')
+    
+    return jsonify({
+        'symbol': symbol.upper(),
+        'prices': [
+            {'timestamp': t, 'price': round(p, 2),
+             'daily_change_pct': round(c * 100, 2) if not np.isnan(c) else None}
+            for t, p, c in zip(timestamps.tolist(), data['price'].tolist(), data['change_pct'].tolist())
+        ]
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text: the bot's last per-scan snapshot plus the dashboard's own metrics"""
+    snapshot = registry.snapshot()
+    bot_snapshot = load_snapshot(metrics_path_for('paper_trading.db'))
+    if bot_snapshot is not None:
+        # Metrics recorded in this process win (only matters if the bot runs in-process)
+        live = {metric['name'] for metric in snapshot['metrics']}
+        bot_metrics = [metric for metric in bot_snapshot['metrics'] if metric['name'] not in live]
+        snapshot['metrics'] = bot_metrics + snapshot['metrics'] + [{
+            'name': 'bot_metrics_age_seconds', 'type': 'gauge',
+            'help': 'Seconds since the bot last wrote its metrics snapshot',
+            'samples': [{'labels': {}, 'value': round(time.time() - bot_snapshot['timestamp'], 3)}],
+        }]
+    return Response(render_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics')
+def get_metrics():
+    """The bot's last metrics snapshot as JSON, including the last scan's phase timings"""
+    return jsonify(load_snapshot(metrics_path_for('paper_trading.db')) or {})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
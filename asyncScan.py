@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List
+
+import aiohttp
+from alpaca_trade_api.common import get_data_url
+
+from rateLimiter import RETRY_STATUS_CODES, THROTTLE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPriceFetcher:
+    """asyncio version of the scan's latest-price fetch
+
+    Every batch request is started at once on one aiohttp session, so
+    they share a pool of keep-alive connections. A semaphore caps the
+    requests in flight at max_in_flight. Requests go through the same
+    RequestScheduler bucket and retry policy as the blocking client, so
+    both backends stay inside one rate limit. Finished batches go on a
+    queue that a single consumer drains.
+    """
+
+    def __init__(self, scheduler, max_in_flight: int = 200, timeout: float = 30):
+        api = scheduler.api
+        self.scheduler = scheduler
+        # Same data URL resolution as alpaca_trade_api (APCA_API_DATA_URL)
+        self.url = f"{get_data_url().rstrip('/')}/v2/stocks/trades/latest"
+        self.headers = {
+            'APCA-API-KEY-ID': api._key_id,
+            'APCA-API-SECRET-KEY': api._secret_key,
+        }
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+
+    def get_latest_prices(self, batches: List[List[str]],
+                          on_batch: Callable[[Dict[str, float]], None] = None) -> Dict[str, float]:
+        """Fetch latest trade prices for all batches; blocks until done
+
+        on_batch is called with each batch's {symbol: price} as it arrives.
+        """
+        return asyncio.run(self.fetch_all(batches, on_batch))
+
+    async def fetch_all(self, batches, on_batch=None) -> Dict[str, float]:
+        queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                         timeout=timeout) as session:
+            async def produce(batch):
+                async with semaphore:
+                    try:
+                        prices = await self._fetch_batch(session, batch)
+                    except Exception as e:
+                        logger.warning(f"Error fetching latest trades for {len(batch)} symbols: {e!r}")
+                        prices = {}
+                await queue.put(prices)
+
+            producers = [asyncio.create_task(produce(batch)) for batch in batches]
+
+            # Single consumer: results are merged in arrival order
+            results = {}
+            for _ in producers:
+                prices = await queue.get()
+                results.update(prices)
+                if on_batch:
+                    on_batch(prices)
+            await asyncio.gather(*producers)
+        return results
+
+    async def _fetch_batch(self, session, batch) -> Dict[str, float]:
+        scheduler = self.scheduler
+        params = {'symbols': ','.join(batch)}
+        attempt = 0
+        while True:
+            with THROTTLE_SECONDS.time(call='get_latest_trades'):
+                await scheduler.bucket.acquire_async()
+            scheduler.record_call()
+            start = time.perf_counter()
+            async with session.get(self.url, params=params) as response:
+                scheduler.observe_headers(response.headers)
+                if response.status in RETRY_STATUS_CODES and attempt < scheduler.max_retries:
+                    scheduler.observe_request('get_latest_trades', time.perf_counter() - start, 'retry')
+                    attempt += 1
+                    backoff = scheduler.retry_backoff('get_latest_trades', response.status, attempt)
+                    if response.status != 429:
+                        await asyncio.sleep(backoff)
+                    continue
+                if response.status != 200:
+                    scheduler.observe_request('get_latest_trades', time.perf_counter() - start, 'error')
+                    scheduler.record_call(failed=True)
+                    response.raise_for_status()
+                payload = await response.json()
+                scheduler.observe_request('get_latest_trades', time.perf_counter() - start, 'ok')
+
+            trades = payload.get('trades') or {}
+            return {symbol: trade['p'] for symbol, trade in trades.items() if trade and trade.get('p')}
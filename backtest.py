@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Vectorized multi-day backtest of the ±threshold strategy.
+Prices come from MarketSimulator.simulate_price_matrix, or from recorded
+bars in the tick store; each day the strategy is screened across every
+symbol at once with ThresholdScreener, so the rules are exactly the ones
+the live scan uses.
+
+Usage:
+  python backtest.py                              # 10,000 symbols x 2,500 days
+  python backtest.py --symbols 2000 --days 500    # Smaller run
+  python backtest.py --seed 7                     # Different random market
+  python backtest.py --test-thresholds            # ±2% instead of ±5%
+  python backtest.py --store price_store          # Recorded prices from the tick store
+  python backtest.py --store price_store --interval 300   # ...in 5-minute bars
+"""
+
+import logging
+import sys
+import time
+
+import numpy as np
+
+from marketSim import MarketSimulator
+from screener import ThresholdScreener
+
+logger = logging.getLogger(__name__)
+
+
+class BacktestResult:
+    """Daily series from one backtest run, one entry per simulated day"""
+
+    def __init__(self, equity, turnover, exposure, buys, sells, quantity):
+        self.equity = equity        # cash + marked-to-market positions
+        self.pnl = np.diff(equity, prepend=0.0)
+        self.turnover = turnover    # $ bought + $ sold
+        self.exposure = exposure    # $ held at the close
+        self.buys = buys            # number of buy trades
+        self.sells = sells          # number of sell trades
+        self.quantity = quantity    # shares held per symbol at the end
+
+    def summary(self) -> dict:
+        peak = np.maximum.accumulate(self.equity)
+        return {
+            'days': len(self.equity),
+            'total_pnl': float(self.equity[-1]),
+            'max_drawdown': float((peak - self.equity).max()),
+            'total_turnover': float(self.turnover.sum()),
+            'avg_exposure': float(self.exposure.mean()),
+            'max_exposure': float(self.exposure.max()),
+            'buys': int(self.buys.sum()),
+            'sells': int(self.sells.sum()),
+            'open_positions': int((self.quantity > 0).sum()),
+        }
+
+
+def run_threshold_backtest(prices: np.ndarray, buy_threshold: float = -0.05,
+                           sell_threshold: float = 0.05, trade_amount: float = 10,
+                           max_position_value: float = 100,
+                           prev_close: np.ndarray = None) -> BacktestResult:
+    """Run the bot's buy/sell rules over a (days + 1, symbols) close matrix
+
+    Row 0 is the starting close. On each later day every symbol is screened
+    once at its close against the previous close, like one scan per day:
+    buys spend trade_amount, sells close up to trade_amount of the
+    position, and positions are capped at max_position_value.
+
+    prev_close, if given, has the same shape as prices and supplies each
+    row's reference close instead of the row before it (recorded scans,
+    several per day). NaN there means "not observed": no signal.
+    """
+    num_days, num_symbols = prices.shape[0] - 1, prices.shape[1]
+    screener = ThresholdScreener(buy_threshold, sell_threshold, max_position_value)
+    screener.set_universe([str(i) for i in range(num_symbols)])
+    quantity = screener.quantity
+
+    cash = 0.0
+    equity = np.empty(num_days)
+    turnover = np.empty(num_days)
+    exposure = np.empty(num_days)
+    buys = np.empty(num_days, dtype=np.int64)
+    sells = np.empty(num_days, dtype=np.int64)
+
+    for day in range(num_days):
+        price = prices[day + 1]
+        screener.prev_close = prices[day] if prev_close is None else prev_close[day + 1]
+        screener.last_price = price
+        result = screener.screen()
+
+        buy, sell = result.buy, result.sell
+        quantity[buy] += trade_amount / price[buy]
+        sell_qty = np.minimum(trade_amount / price[sell], quantity[sell])
+        quantity[sell] -= sell_qty
+        sold = float(sell_qty @ price[sell])
+
+        cash += sold - trade_amount * len(buy)
+        exposure[day] = quantity @ price
+        equity[day] = cash + exposure[day]
+        turnover[day] = trade_amount * len(buy) + sold
+        buys[day], sells[day] = len(buy), len(sell)
+
+    return BacktestResult(equity, turnover, exposure, buys, sells, quantity.copy())
+
+
+def _with_start_row(price: np.ndarray, prev_close: np.ndarray) -> tuple:
+    """Turn recorded (scans x symbols) matrices into backtest input
+
+    Prepends row 0 with each symbol's first known previous close, then
+    carries prices forward over gaps (and back for late listings) so
+    positions can always be valued. prev_close keeps its NaNs, so an
+    unobserved symbol is never traded.
+    """
+    observed = ~np.isnan(prev_close)
+    first = observed.argmax(axis=0)
+    start = prev_close[first, np.arange(prev_close.shape[1])]
+
+    prices = np.vstack([start, price])
+    prev_close = np.vstack([np.full(len(start), np.nan), prev_close])
+    for row in range(1, len(prices)):
+        missing = np.isnan(prices[row])
+        prices[row, missing] = prices[row - 1, missing]
+    for row in range(len(prices) - 1, 0, -1):
+        missing = np.isnan(prices[row - 1])
+        prices[row - 1, missing] = prices[row, missing]
+    return prices, prev_close
+
+
+def load_recorded_matrix(rows) -> tuple:
+    """Build (symbols, prices, prev_close) matrices from price_history rows
+
+    rows is a timestamp-ordered stream such as replay.iter_db_rows(); each
+    scan becomes a row (see _with_start_row for row 0 and gaps).
+    """
+    from replay import iter_scans
+
+    index, scans = {}, []
+    for scan in iter_scans(rows):
+        idx = np.fromiter((index.setdefault(symbol, len(index)) for symbol, _, _, _ in scan),
+                          dtype=np.intp, count=len(scan))
+        price = np.array([row[2] for row in scan], dtype=np.float64)
+        change_pct = np.array([row[3] for row in scan], dtype=np.float64)  # None -> NaN
+        scans.append((idx, price, change_pct))
+
+    price = np.full((len(scans), len(index)), np.nan)
+    prev_close = np.full_like(price, np.nan)
+    for row, (idx, scan_price, change_pct) in enumerate(scans):
+        price[row, idx] = scan_price
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prev_close[row, idx] = np.where(change_pct > -1, scan_price / (1 + change_pct), np.nan)
+
+    symbols = sorted(index, key=index.get)
+    return (symbols, *_with_start_row(price, prev_close))
+
+
+def load_store_matrix(store, start=None, end=None, interval: float = 120) -> tuple:
+    """Build (symbols, prices, prev_close) matrices from a TickStore
+
+    Each interval-second bar (default: the bot's two-minute scan cycle)
+    becomes a row holding each symbol's last observation in it.
+    """
+    symbols, _, price, prev_close = store.bars(start, end, interval)
+    return (symbols, *_with_start_row(price, prev_close))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    num_symbols = 10_000
+    if '--symbols' in sys.argv:
+        num_symbols = int(sys.argv[sys.argv.index('--symbols') + 1])
+    num_days = 2_500
+    if '--days' in sys.argv:
+        num_days = int(sys.argv[sys.argv.index('--days') + 1])
+    seed = 42
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+    threshold = 0.02 if '--test-thresholds' in sys.argv else 0.05
+
+    start = time.perf_counter()
+    prev_close = None
+    if '--store' in sys.argv:
+        from tickStore import TickStore
+        root = sys.argv[sys.argv.index('--store') + 1]
+        interval = float(sys.argv[sys.argv.index('--interval') + 1]) if '--interval' in sys.argv else 120
+        symbols, prices, prev_close = load_store_matrix(TickStore(root), interval=interval)
+        logger.info(f"Loaded {prices.shape[0] - 1:,} bars x {len(symbols):,} symbols from {root} "
+                    f"in {time.perf_counter() - start:.2f}s")
+    else:
+        prices, regimes = MarketSimulator().simulate_price_matrix(num_symbols, num_days, seed=seed)
+        simulated = time.perf_counter() - start
+        counts = np.bincount(regimes, minlength=len(MarketSimulator.REGIMES))
+        logger.info(f"Simulated {num_symbols:,} symbols x {num_days:,} days in {simulated:.2f}s "
+                    f"({', '.join(f'{n} {name}' for name, n in zip(MarketSimulator.REGIMES, counts))})")
+
+    start = time.perf_counter()
+    result = run_threshold_backtest(prices, -threshold, threshold, prev_close=prev_close)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Backtest ran in {elapsed:.2f}s")
+
+    summary = result.summary()
+    logger.info("=" * 60)
+    logger.info(f"Thresholds:     ±{threshold * 100:.0f}%")
+    logger.info(f"Total P&L:      ${summary['total_pnl']:,.2f}")
+    logger.info(f"Max drawdown:   ${summary['max_drawdown']:,.2f}")
+    logger.info(f"Turnover:       ${summary['total_turnover']:,.2f}")
+    logger.info(f"Exposure:       avg ${summary['avg_exposure']:,.2f}, max ${summary['max_exposure']:,.2f}")
+    logger.info(f"Trades:         {summary['buys']:,} buys, {summary['sells']:,} sells")
+    logger.info(f"Open positions: {summary['open_positions']:,}")
@@ -0,0 +1,549 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the paper trading bot's hot paths.
+Everything runs locally on synthetic data - no Alpaca account needed.
+
+Usage:
+  python benchmarks.py              # Run all benchmarks
+  python benchmarks.py screener     # Run one benchmark by name:
+                                    #   screener, writer, portfolio, scan, store, performance, dashboard, sync, cache
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _make_bot(tmp, **kwargs):
+    """A PaperTradingBot on a scratch database that never touches the network"""
+    os.environ.setdefault('ALPACA_API_KEY', 'bench-key')
+    os.environ.setdefault('ALPACA_SECRET_KEY', 'bench-secret')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from paperTradingBot import PaperTradingBot
+
+    return PaperTradingBot(db_path=os.path.join(tmp, 'paper_trading.db'), **kwargs)
+
+
+def _synthetic_universe(num_symbols, seed=42):
+    """Symbols, prices, previous closes and a sprinkling of held positions"""
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i:06d}" for i in range(num_symbols)]
+    prev_close = rng.uniform(10, 500, num_symbols)
+    price = prev_close * (1 + np.clip(rng.normal(0, 0.025, num_symbols), -0.15, 0.15))
+    held = rng.random(num_symbols) < 0.02
+    quantity = np.where(held, rng.uniform(0.01, 1, num_symbols), 0.0)
+    return symbols, price, prev_close, quantity
+
+
+def bench_screener():
+    """Vectorized ThresholdScreener vs per-symbol should_buy/should_sell"""
+    from priceCache import PriceCache
+    from screener import ThresholdScreener
+
+    for num_symbols in (10_000, 100_000):
+        symbols, price, prev_close, quantity = _synthetic_universe(num_symbols)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            bot = _make_bot(tmp)
+            bot.conn.executemany(
+                'INSERT INTO positions (symbol, quantity, avg_price, last_update) VALUES (?, ?, ?, ?)',
+                [(s, float(q), float(p), None) for s, q, p in zip(symbols, quantity, price) if q > 0]
+            )
+            bot.conn.commit()
+            bot.position_book.load()
+
+            # Per-symbol path: one Python call per symbol
+            # (prices pre-cached so get_current_price doesn't hit the API)
+            change_pct = (price - prev_close) / prev_close
+            bot.price_cache = PriceCache(max_entries=num_symbols)
+            bot.price_cache.put_many(dict(zip(symbols, price.tolist())))
+
+            start = time.perf_counter()
+            per_symbol_signals = 0
+            for s, c in zip(symbols, change_pct.tolist()):
+                if bot.should_buy(s, c) or bot.should_sell(s, c):
+                    per_symbol_signals += 1
+            per_symbol = time.perf_counter() - start
+
+            # Vectorized path: load arrays from the scan's price dict and screen once
+            prices = dict(zip(symbols, zip(price.tolist(), prev_close.tolist())))
+            screener = ThresholdScreener(bot.buy_threshold, bot.sell_threshold)
+            start = time.perf_counter()
+            screener.set_universe(symbols)
+            screener.update_prices(prices)
+            screener.set_positions({s: q for s, (q, _) in bot.position_book.open_positions().items()})
+            result = screener.screen()
+            vectorized = time.perf_counter() - start
+
+            # Later scans reuse the universe arrays
+            start = time.perf_counter()
+            screener.set_universe(symbols)
+            screener.update_prices(prices)
+            screener.set_positions({s: q for s, (q, _) in bot.position_book.open_positions().items()})
+            screener.screen()
+            rescan = time.perf_counter() - start
+
+            start = time.perf_counter()
+            screener.screen()
+            screen_only = time.perf_counter() - start
+            bot.writer.close()
+            bot.conn.close()
+
+        vector_signals = len(result.buy) + len(result.sell)
+        logger.info(f"screener {num_symbols:>7,} symbols: per-symbol {per_symbol * 1000:7.1f}ms | "
+                    f"vectorized first scan {vectorized * 1000:6.1f}ms, rescan {rescan * 1000:6.1f}ms, "
+                    f"screen only {screen_only * 1000:5.2f}ms | signals {per_symbol_signals}/{vector_signals}")
+
+
+def bench_writer():
+    """Per-row commits vs the write-behind BatchWriter for a scan's price_history rows"""
+    import sqlite3
+    from dbWriter import BatchWriter
+    from paperTradingBot import PRICE_HISTORY_INSERT
+
+    for num_symbols in (6_000, 20_000):
+        symbols, price, prev_close, _ = _synthetic_universe(num_symbols)
+        change_pct = ((price - prev_close) / prev_close).tolist()
+        now = datetime.now()
+        rows = [(s, now, p, c) for s, p, c in zip(symbols, price.tolist(), change_pct)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _make_bot(tmp).writer.close()  # creates the schema
+            db_path = os.path.join(tmp, 'paper_trading.db')
+
+            # Old path: INSERT + commit per symbol
+            conn = sqlite3.connect(db_path)
+            start = time.perf_counter()
+            for row in rows:
+                conn.execute(PRICE_HISTORY_INSERT, row)
+                conn.commit()
+            per_row = time.perf_counter() - start
+            conn.execute('DELETE FROM price_history')
+            conn.commit()
+            conn.close()
+
+            # Write-behind, one write() per symbol as the streaming path does
+            writer = BatchWriter(db_path).start()
+            start = time.perf_counter()
+            for row in rows:
+                writer.write(PRICE_HISTORY_INSERT, row)
+            enqueue_single = time.perf_counter() - start
+            writer.flush()
+            single = time.perf_counter() - start
+
+            # Write-behind, whole scan in one write_many() as run_scan does
+            rows = [(s, datetime.now(), p, c) for s, _, p, c in rows]
+            start = time.perf_counter()
+            writer.write_many(PRICE_HISTORY_INSERT, rows)
+            enqueue_many = time.perf_counter() - start
+            writer.flush()
+            many = time.perf_counter() - start
+            writer.close()
+
+        logger.info(f"writer {num_symbols:>6,} rows: per-row commit {per_row * 1000:8.1f}ms | "
+                    f"write() x{num_symbols} {single * 1000:7.1f}ms ({enqueue_single * 1000:.1f}ms on caller) | "
+                    f"write_many() {many * 1000:6.1f}ms ({enqueue_many * 1000:.1f}ms on caller)")
+
+
+def bench_portfolio():
+    """/api/portfolio: window function over price_history vs the latest_price table"""
+    from dbSchema import open_database
+
+    old_query = '''
+        SELECT p.symbol, p.quantity, p.avg_price,
+               h.price as current_price, h.daily_change_pct
+        FROM positions p
+        LEFT JOIN (
+            SELECT symbol, price, daily_change_pct,
+                   ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY timestamp DESC) as rn
+            FROM price_history
+        ) h ON p.symbol = h.symbol AND h.rn = 1
+        WHERE p.quantity > 0
+    '''
+    new_query = '''
+        SELECT p.symbol, p.quantity, p.avg_price,
+               l.price as current_price, l.daily_change_pct
+        FROM positions p
+        LEFT JOIN latest_price l ON p.symbol = l.symbol
+        WHERE p.quantity > 0
+    '''
+
+    num_symbols, num_scans, num_positions = 6000, 350, 50
+    symbols, price, _, _ = _synthetic_universe(num_symbols)
+    rng = np.random.default_rng(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_database(os.path.join(tmp, 'paper_trading.db'))
+        start = time.perf_counter()
+        base = datetime(2024, 1, 2, 9, 30)
+        for scan in range(num_scans):
+            stamp = base + timedelta(minutes=2 * scan)
+            moves = price * (1 + rng.normal(0, 0.01, num_symbols))
+            conn.executemany(
+                'INSERT INTO price_history (symbol, timestamp, price, daily_change_pct) VALUES (?, ?, ?, ?)',
+                [(s, stamp, p, 0.0) for s, p in zip(symbols, moves.tolist())]
+            )
+        conn.execute('''
+            INSERT OR REPLACE INTO latest_price (symbol, timestamp, price, daily_change_pct)
+            SELECT symbol, MAX(timestamp), price, daily_change_pct FROM price_history GROUP BY symbol
+        ''')
+        conn.executemany(
+            'INSERT INTO positions (symbol, quantity, avg_price, last_update) VALUES (?, ?, ?, ?)',
+            [(s, 0.5, 100.0, base) for s in symbols[:num_positions]]
+        )
+        conn.commit()
+        rows = conn.execute('SELECT COUNT(*) FROM price_history').fetchone()[0]
+        logger.info(f"portfolio: built {rows:,} price_history rows in {time.perf_counter() - start:.1f}s")
+
+        for name, query in (('window over price_history', old_query), ('latest_price join', new_query)):
+            start = time.perf_counter()
+            result = conn.execute(query).fetchall()
+            elapsed = time.perf_counter() - start
+            logger.info(f"portfolio {name:>26}: {elapsed * 1000:9.2f}ms for {len(result)} positions")
+        conn.close()
+
+
+def bench_scan():
+    """Scan price fetch: thread-pool backend vs asyncio backend against the fake API"""
+    from fakeAlpaca import FakeAlpacaServer, FakeMarket
+
+    num_symbols, batch_size = 20_000, 50
+    # Per-batch progress lines would drown the results
+    logging.getLogger('paperTradingBot').setLevel(logging.WARNING)
+
+    for latency in (0.0, 0.02, 0.1):
+        server = FakeAlpacaServer(FakeMarket(num_symbols, latency=latency)).start()
+        server.configure_environment()
+        with tempfile.TemporaryDirectory() as tmp:
+            bot = _make_bot(tmp, scan_backend='async')
+            bot.market_data.batch_size = batch_size
+            batches = bot.market_data.batches(server.market.symbols)
+
+            timings = {}
+            for backend, fetch in (('threads', bot.fetch_batches_threaded),
+                                   ('async', bot.fetch_batches_async)):
+                start = time.perf_counter()
+                prices = fetch(batches, num_symbols)
+                timings[backend] = (time.perf_counter() - start, len(prices))
+            bot.writer.close()
+            bot.conn.close()
+        server.stop()
+
+        (threaded, priced_threaded), (asynced, priced_async) = timings['threads'], timings['async']
+        logger.info(f"scan {len(batches)} requests @ {latency * 1000:5.0f}ms latency: "
+                    f"threads ({bot.max_in_flight} workers) {threaded * 1000:7.1f}ms [{priced_threaded}] | "
+                    f"async ({bot.async_fetcher.max_in_flight} in flight) {asynced * 1000:7.1f}ms [{priced_async}] | "
+                    f"{threaded / asynced:.1f}x")
+
+
+def bench_store():
+    """Bulk price reads: SQLite price_history rows vs memory-mapped tick store columns"""
+    from dbSchema import open_database
+    from tickStore import TickStore
+
+    num_symbols, num_scans = 6000, 350
+    symbols, price, _, _ = _synthetic_universe(num_symbols)
+    rng = np.random.default_rng(7)
+    base = datetime(2024, 1, 2, 9, 30)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_database(os.path.join(tmp, 'paper_trading.db'))
+        store = TickStore(os.path.join(tmp, 'price_store'))
+        start = time.perf_counter()
+        for scan in range(num_scans):
+            stamp = base + timedelta(minutes=2 * scan)
+            moves = price * (1 + rng.normal(0, 0.01, num_symbols))
+            rows = [(s, stamp, p, 0.0) for s, p in zip(symbols, moves.tolist())]
+            conn.executemany('INSERT INTO price_history (symbol, timestamp, price, daily_change_pct) '
+                             'VALUES (?, ?, ?, ?)', rows)
+            store.append(rows)
+        conn.commit()
+        store.close()
+        total = num_symbols * num_scans
+        logger.info(f"store: wrote {total:,} rows to both in {time.perf_counter() - start:.1f}s")
+
+        day, next_day = '2024-01-02', '2024-01-03'
+        cases = [
+            ('whole day', lambda: np.array(conn.execute(
+                'SELECT price FROM price_history WHERE timestamp >= ? AND timestamp < ?',
+                (day, next_day)).fetchall()).ravel(),
+             lambda: store.read(day, next_day)['price']),
+            ('one symbol', lambda: np.array(conn.execute(
+                'SELECT price FROM price_history WHERE symbol = ?', (symbols[123],)).fetchall()).ravel(),
+             lambda: store.read(symbol=symbols[123])['price']),
+        ]
+        for name, from_sqlite, from_store in cases:
+            start = time.perf_counter()
+            rows_sqlite = len(from_sqlite())
+            sqlite_time = time.perf_counter() - start
+            start = time.perf_counter()
+            prices = from_store()
+            prices.sum()  # touch every page, so the mapping isn't measured empty
+            store_time = time.perf_counter() - start
+            logger.info(f"store {name:>10}: SQLite {sqlite_time * 1000:8.1f}ms | "
+                        f"tick store {store_time * 1000:6.1f}ms | {rows_sqlite:,} / {len(prices):,} rows")
+        conn.close()
+
+
+def bench_performance():
+    """/api/performance: GROUP BY over trades vs the daily_trades aggregates"""
+    from dbSchema import open_database
+    from tradeStats import backfill
+
+    old_queries = [
+        '''
+        SELECT DATE(timestamp) as date,
+               SUM(CASE WHEN action = 'buy' THEN -amount ELSE amount END) as daily_pnl
+        FROM trades
+        GROUP BY DATE(timestamp)
+        ORDER BY date
+        ''',
+        '''
+        SELECT COUNT(*), SUM(CASE WHEN action = 'buy' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN action = 'sell' THEN 1 ELSE 0 END),
+               COUNT(DISTINCT symbol), COUNT(DISTINCT DATE(timestamp))
+        FROM trades
+        ''',
+    ]
+    new_queries = [
+        'SELECT date, sell_amount - buy_amount, cumulative_pnl FROM daily_trades ORDER BY date',
+        '''
+        SELECT SUM(buy_count + sell_count), SUM(buy_count), SUM(sell_count),
+               (SELECT COUNT(*) FROM traded_symbols), COUNT(*)
+        FROM daily_trades
+        ''',
+    ]
+
+    num_trades, num_days = 1_000_000, 500
+    symbols, _, _, _ = _synthetic_universe(6000)
+    rng = np.random.default_rng(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_database(os.path.join(tmp, 'paper_trading.db'))
+        start = time.perf_counter()
+        base = datetime(2022, 1, 3, 9, 30)
+        offsets = np.sort(rng.integers(0, num_days * 86400, num_trades))
+        conn.executemany(
+            'INSERT INTO trades (symbol, timestamp, action, quantity, price, amount, reason) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((symbols[s], base + timedelta(seconds=int(t)), 'buy' if b else 'sell', 0.1, 100.0, 10.0, 'bench')
+             for s, t, b in zip(rng.integers(0, len(symbols), num_trades).tolist(), offsets.tolist(),
+                                (rng.random(num_trades) < 0.5).tolist()))
+        )
+        conn.commit()
+        logger.info(f"performance: built {num_trades:,} trades in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        days = backfill(conn)
+        logger.info(f"performance: backfilled {days} days in {time.perf_counter() - start:.2f}s")
+
+        for name, queries in (('GROUP BY over trades', old_queries), ('daily_trades', new_queries)):
+            start = time.perf_counter()
+            for query in queries:
+                conn.execute(query).fetchall()
+            elapsed = time.perf_counter() - start
+            logger.info(f"performance {name:>21}: {elapsed * 1000:9.2f}ms")
+        conn.close()
+
+
+def bench_dashboard():
+    """Dashboard API under concurrent load: a connection per request vs the read-only pool"""
+    import threading
+    from dbSchema import open_database
+
+    num_symbols, num_positions, num_trades = 6000, 200, 100_000
+    num_threads, requests_per_thread = 8, 250
+    routes = ['/api/portfolio', '/api/trades', '/api/performance']
+    symbols, price, _, _ = _synthetic_universe(num_symbols)
+    rng = np.random.default_rng(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = open_database(os.path.join(tmp, 'paper_trading.db'))
+        base = datetime(2024, 1, 2, 9, 30)
+        conn.executemany(
+            'INSERT INTO latest_price (symbol, timestamp, price, daily_change_pct) VALUES (?, ?, ?, ?)',
+            [(s, base, p, 0.01) for s, p in zip(symbols, price.tolist())]
+        )
+        conn.executemany(
+            'INSERT INTO positions (symbol, quantity, avg_price, last_update) VALUES (?, ?, ?, ?)',
+            [(s, 0.5, 100.0, base) for s in symbols[:num_positions]]
+        )
+        conn.executemany(
+            'INSERT INTO trades (symbol, timestamp, action, quantity, price, amount, reason) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((symbols[s], base + timedelta(minutes=i), 'buy', 0.1, 100.0, 10.0, 'bench')
+             for i, s in enumerate(rng.integers(0, num_symbols, num_trades).tolist()))
+        )
+        conn.commit()
+        from tradeStats import backfill
+        backfill(conn)
+        conn.close()
+
+        # The app reads paper_trading.db from the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+            import app
+            # Measure the queries, not the response cache
+            app.response_cache.max_entries = 0
+
+            for name, max_idle in (('connection per request', 0), ('read-only pool', 16)):
+                app.db_pool.max_idle = max_idle
+                latencies = []
+
+                def worker():
+                    client = app.app.test_client()
+                    local = []
+                    for i in range(requests_per_thread):
+                        start = time.perf_counter()
+                        client.get(routes[i % len(routes)])
+                        local.append(time.perf_counter() - start)
+                    latencies.extend(local)
+
+                threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+                logger.info(f"dashboard {name:>22}: {len(latencies) / elapsed:7.0f} req/s, "
+                            f"p50 {p50:6.2f}ms, p99 {p99:6.2f}ms ({num_threads} threads)")
+        finally:
+            os.chdir(cwd)
+
+
+def bench_sync():
+    """Post-scan portfolio summary: per-position price lookups vs one bulk broker sync"""
+    from fakeAlpaca import FakeAlpacaServer, FakeMarket
+
+    num_symbols, latency = 6000, 0.02
+    logging.getLogger('paperTradingBot').setLevel(logging.WARNING)
+    logging.getLogger('portfolioSync').setLevel(logging.ERROR)
+
+    for num_positions in (10, 100, 500):
+        market = FakeMarket(num_symbols, latency=latency)
+        held = market.symbols[:num_positions]
+        market.positions = {symbol: 0.1 for symbol in held}
+        server = FakeAlpacaServer(market).start()
+        server.configure_environment()
+        with tempfile.TemporaryDirectory() as tmp:
+            bot = _make_bot(tmp)
+            # A tenth of the local book has drifted from the broker's
+            bot.position_book.reconcile({symbol: (0.1 if i % 10 else 0.2, market.prices[symbol])
+                                         for i, symbol in enumerate(held)})
+
+            # Old path: every position priced with its own request
+            market.reset_counts()
+            start = time.perf_counter()
+            for symbol in bot.position_book.open_positions():
+                bot.api.get_latest_trade(symbol)
+            per_position = time.perf_counter() - start
+            per_position_requests = market.total_requests()
+
+            market.reset_counts()
+            start = time.perf_counter()
+            summary = bot.get_portfolio_summary()
+            synced = time.perf_counter() - start
+            sync_requests = market.total_requests()
+            bot.orders.close()
+            bot.writer.close()
+            bot.conn.close()
+        server.stop()
+
+        logger.info(f"sync {num_positions:>4} positions @ {latency * 1000:.0f}ms: per-position "
+                    f"{per_position * 1000:8.1f}ms ({per_position_requests} requests) | bulk sync "
+                    f"{synced * 1000:6.1f}ms ({sync_requests} requests, {summary['adjusted']} positions corrected)")
+
+
+def bench_cache():
+    """Price lookups: dict + datetime.now() TTL check vs the bounded PriceCache"""
+    import tracemalloc
+    from priceCache import PriceCache
+
+    num_symbols, num_lookups = 20_000, 200_000
+    symbols, price, _, _ = _synthetic_universe(num_symbols)
+    prices = dict(zip(symbols, price.tolist()))
+    rng = np.random.default_rng(3)
+    lookups = [symbols[i] for i in rng.integers(0, num_symbols, num_lookups)]
+
+    # Old path: two dicts, a datetime per entry, datetime.now() and a
+    # labelled counter per lookup
+    from metrics import registry
+    counter = registry.counter('bench_dict_cache_requests_total')
+    tracemalloc.start()
+    price_cache, last_update = {}, {}
+    for symbol, p in prices.items():
+        price_cache[symbol] = p
+        last_update[symbol] = datetime.now()
+    dict_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for symbol in lookups:
+        if symbol in price_cache and datetime.now() - last_update.get(symbol, datetime.min) < timedelta(minutes=1):
+            counter.inc(result='hit')
+            price_cache[symbol]
+    dict_lookups = time.perf_counter() - start
+
+    tracemalloc.start()
+    cache = PriceCache(max_entries=num_symbols)
+    cache.put_many(prices)
+    cache_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for symbol in lookups:
+        cache.get(symbol)
+    cache_lookups = time.perf_counter() - start
+    start = time.perf_counter()
+    cache.get_many(lookups)
+    batch_lookups = time.perf_counter() - start
+
+    logger.info(f"cache {num_symbols:,} symbols: dict+datetime {dict_memory / 1e6:5.1f}MB, "
+                f"{num_lookups / dict_lookups / 1e6:4.2f}M lookups/s | PriceCache {cache_memory / 1e6:5.1f}MB, "
+                f"{num_lookups / cache_lookups / 1e6:4.2f}M get/s, {num_lookups / batch_lookups / 1e6:4.2f}M get_many/s")
+
+    # A long multi-universe run: the dicts keep every symbol ever seen
+    bounded = PriceCache(max_entries=16_384)
+    for day in range(10):
+        day_prices = {f"D{day}{symbol}": p for symbol, p in prices.items()}
+        bounded.put_many(day_prices)
+        price_cache.update(day_prices)
+    stats = bounded.stats()
+    logger.info(f"cache after 10 universes of {num_symbols:,}: dict holds {len(price_cache):,} prices | "
+                f"PriceCache holds {stats['entries']:,} ({stats['evictions']:,} evicted)")
+
+
+BENCHMARKS = {
+    'screener': bench_screener,
+    'writer': bench_writer,
+    'portfolio': bench_portfolio,
+    'scan': bench_scan,
+    'store': bench_store,
+    'performance': bench_performance,
+    'dashboard': bench_dashboard,
+    'sync': bench_sync,
+    'cache': bench_cache,
+}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    names = [a for a in sys.argv[1:] if not a.startswith('--')] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            logger.error(f"Unknown benchmark '{name}', choose from: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[name]()
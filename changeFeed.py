@@ -0,0 +1,147 @@
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+from dbSchema import connect_readonly
+
+logger = logging.getLogger(__name__)
+
+
+FEED_INSERT = '''
+    INSERT INTO change_feed (timestamp, kind, payload)
+    VALUES (?, ?, ?)
+'''
+
+FEED_PRUNE = '''
+    DELETE FROM change_feed
+    WHERE id <= (SELECT MAX(id) FROM change_feed) - ?
+'''
+
+
+class ChangeFeed:
+    """Bot side of the change feed: appends events to the change_feed table
+
+    Events are queued on the BatchWriter like any other row, so a trade's
+    events commit in the same transaction as the trade itself. Only the
+    newest `keep` events are retained.
+    """
+
+    def __init__(self, writer, keep: int = 10000, prune_every: int = 500):
+        self.writer = writer
+        self.keep = keep
+        self.prune_every = prune_every
+        self.lock = threading.Lock()
+        self.published = 0
+
+    def entry(self, kind: str, payload: dict, timestamp: datetime = None) -> Tuple[str, tuple]:
+        """An event as a (sql, params) statement, for BatchWriter.write_group"""
+        with self.lock:
+            self.published += 1
+            prune = self.published % self.prune_every == 0
+        if prune:
+            self.writer.write(FEED_PRUNE, (self.keep,))
+        return FEED_INSERT, (timestamp or datetime.now(), kind, json.dumps(payload))
+
+    def publish(self, kind: str, payload: dict, timestamp: datetime = None):
+        self.writer.write(*self.entry(kind, payload, timestamp))
+
+
+class FeedBroadcaster:
+    """Dashboard side: one thread tails change_feed and fans events out
+
+    However many clients are subscribed, the database sees one small
+    indexed query per poll_interval. Each subscriber gets a bounded queue;
+    a client that falls too far behind is sent a 'resync' event instead of
+    the backlog.
+    """
+
+    def __init__(self, db_path: str, poll_interval: float = 0.25, max_queue: int = 1000):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.last_id = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='feed-broadcaster', daemon=True)
+        self.thread.start()
+        return self
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def events_since(self, last_id: int, limit: int = 1000) -> List[tuple]:
+        """(id, timestamp, kind, payload) events after last_id, for resuming clients
+
+        If they can't all be replayed - events after last_id have been
+        pruned, or there are more than `limit` of them - this returns a
+        single 'resync' event at the newest id instead.
+        """
+        conn = connect_readonly(self.db_path)
+        try:
+            events = conn.execute(
+                'SELECT id, timestamp, kind, payload FROM change_feed WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, limit + 1)
+            ).fetchall()
+            # Read after the page, so a prune that lands in between is seen
+            oldest = conn.execute('SELECT MIN(id) FROM change_feed').fetchone()[0]
+            if len(events) > limit or (oldest is not None and last_id < oldest - 1):
+                newest = conn.execute(
+                    'SELECT id, timestamp FROM change_feed ORDER BY id DESC LIMIT 1'
+                ).fetchone()
+                return [(newest[0], newest[1], 'resync', '{}')]
+            return events
+        finally:
+            conn.close()
+
+    def _run(self):
+        conn = connect_readonly(self.db_path)
+        try:
+            # New subscribers only get events from now on
+            self.last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM change_feed').fetchone()[0]
+            while True:
+                try:
+                    events = conn.execute(
+                        'SELECT id, timestamp, kind, payload FROM change_feed WHERE id > ? ORDER BY id LIMIT 1000',
+                        (self.last_id,)
+                    ).fetchall()
+                except Exception as e:
+                    logger.error(f"Error reading change feed: {e}")
+                    events = []
+                if events:
+                    self.last_id = events[-1][0]
+                    self._broadcast(events)
+                else:
+                    time.sleep(self.poll_interval)
+        finally:
+            conn.close()
+
+    def _broadcast(self, events):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            for event in events:
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    # Too far behind: drop its backlog and tell it to reload
+                    while not subscriber.empty():
+                        try:
+                            subscriber.get_nowait()
+                        except queue.Empty:
+                            break
+                    subscriber.put_nowait((event[0], event[1], 'resync', '{}'))
+                    break
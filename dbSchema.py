@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Shared schema, migrations and connection tuning for paper_trading.db.
+Used by the bot, the simulators and the dashboard so they all agree on
+the tables, indexes and pragmas.
+
+Usage:
+  python dbSchema.py                     # Migrate paper_trading.db to the latest version
+  python dbSchema.py path/to/other.db    # Migrate another database
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = 'paper_trading.db'
+
+# Per-connection tuning. WAL lets the dashboard read while the bot writes,
+# and NORMAL sync is durable across application crashes under WAL.
+PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -65536',       # 64MB page cache
+    'PRAGMA mmap_size = 268435456',     # 256MB memory-mapped reads
+    'PRAGMA temp_store = MEMORY',
+]
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version).
+# Never edit an existing entry - append a new one.
+MIGRATIONS = [
+    # 1: original tables
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS price_history (
+            symbol TEXT,
+            timestamp DATETIME,
+            price REAL,
+            daily_change_pct REAL,
+            PRIMARY KEY (symbol, timestamp)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT,
+            timestamp DATETIME,
+            action TEXT,
+            quantity REAL,
+            price REAL,
+            amount REAL,
+            reason TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS positions (
+            symbol TEXT PRIMARY KEY,
+            quantity REAL,
+            avg_price REAL,
+            last_update DATETIME
+        )
+        ''',
+    ],
+    # 2: previous-close cache and indexes for the dashboard queries
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS prev_close (
+            symbol TEXT,
+            trading_date TEXT,
+            close REAL,
+            PRIMARY KEY (symbol, trading_date)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_trades_symbol_timestamp ON trades (symbol, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_positions_quantity ON positions (quantity)',
+    ],
+    # 3: most recent price per symbol, so portfolio queries don't scan price_history
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS latest_price (
+            symbol TEXT PRIMARY KEY,
+            timestamp DATETIME,
+            price REAL,
+            daily_change_pct REAL
+        )
+        ''',
+        # SQLite takes the bare columns from the row holding MAX(timestamp)
+        '''
+        INSERT OR REPLACE INTO latest_price (symbol, timestamp, price, daily_change_pct)
+        SELECT symbol, MAX(timestamp), price, daily_change_pct
+        FROM price_history
+        GROUP BY symbol
+        ''',
+    ],
+    # 4: time-ordered reads of price_history (replay, exports)
+    [
+        'CREATE INDEX IF NOT EXISTS idx_price_history_timestamp ON price_history (timestamp)',
+    ],
+    # 5: change feed the dashboard tails for live updates
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS change_feed (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME,
+            kind TEXT,
+            payload TEXT
+        )
+        ''',
+    ],
+    # 6: per-day trade aggregates for /api/performance, filled from existing trades
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_trades (
+            date TEXT PRIMARY KEY,
+            buy_amount REAL,
+            sell_amount REAL,
+            buy_count INTEGER,
+            sell_count INTEGER,
+            symbol_count INTEGER,
+            cumulative_pnl REAL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS daily_trade_symbols (
+            date TEXT,
+            symbol TEXT,
+            PRIMARY KEY (date, symbol)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE TABLE IF NOT EXISTS traded_symbols (symbol TEXT PRIMARY KEY) WITHOUT ROWID',
+        'INSERT INTO daily_trade_symbols (date, symbol) SELECT DISTINCT DATE(timestamp), symbol FROM trades',
+        'INSERT INTO traded_symbols (symbol) SELECT DISTINCT symbol FROM trades',
+        '''
+        INSERT INTO daily_trades (date, buy_amount, sell_amount, buy_count, sell_count, symbol_count, cumulative_pnl)
+        SELECT date, buy_amount, sell_amount, buy_count, sell_count, symbol_count,
+               SUM(sell_amount - buy_amount) OVER (ORDER BY date)
+        FROM (
+            SELECT DATE(timestamp) AS date,
+                   SUM(CASE WHEN action = 'buy' THEN amount ELSE 0 END) AS buy_amount,
+                   SUM(CASE WHEN action = 'buy' THEN 0 ELSE amount END) AS sell_amount,
+                   SUM(CASE WHEN action = 'buy' THEN 1 ELSE 0 END) AS buy_count,
+                   SUM(CASE WHEN action = 'sell' THEN 1 ELSE 0 END) AS sell_count,
+                   COUNT(DISTINCT symbol) AS symbol_count
+            FROM trades
+            GROUP BY DATE(timestamp)
+        )
+        ''',
+    ],
+    # 7: cached tradable universe, refreshed once per trading day
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS universe (
+            symbol TEXT PRIMARY KEY,
+            position INTEGER
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS universe_refresh (
+            trading_date TEXT PRIMARY KEY,
+            refreshed_at DATETIME,
+            symbol_count INTEGER,
+            added INTEGER,
+            removed INTEGER
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS universe_changes (
+            trading_date TEXT,
+            symbol TEXT,
+            change TEXT,
+            PRIMARY KEY (trading_date, symbol)
+        )
+        ''',
+    ],
+    # 8: broker orders, tracked from submission until they fill
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id TEXT PRIMARY KEY,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            signal_price REAL,
+            reason TEXT,
+            status TEXT NOT NULL,
+            filled_quantity REAL DEFAULT 0,
+            filled_price REAL,
+            submitted_at DATETIME,
+            updated_at DATETIME
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)',
+    ],
+    # 9: account and position totals from each broker sync
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME NOT NULL,
+            equity REAL,
+            cash REAL,
+            buying_power REAL,
+            market_value REAL,
+            position_count INTEGER,
+            adjusted_count INTEGER
+        )
+        ''',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def connect(db_path: str = DEFAULT_DB_PATH, **kwargs) -> sqlite3.Connection:
+    """Open a connection with the standard tuning applied"""
+    conn = sqlite3.connect(db_path, **kwargs)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# Read-only connections can't change the journal mode or sync setting
+READONLY_PRAGMAS = [pragma for pragma in PRAGMAS if 'journal_mode' not in pragma and 'synchronous' not in pragma]
+
+
+def connect_readonly(db_path: str = DEFAULT_DB_PATH, cached_statements: int = 256, **kwargs) -> sqlite3.Connection:
+    """Open a read-only (mode=ro) connection with the read-side tuning applied
+
+    The database must already exist. Writes on it raise
+    sqlite3.OperationalError.
+    """
+    uri = f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, cached_statements=cached_statements, **kwargs)
+    for pragma in READONLY_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Bring the schema up to SCHEMA_VERSION; returns the version it started at"""
+    start_version = get_version(conn)
+    if start_version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema v{start_version} is newer than this code (v{SCHEMA_VERSION})")
+
+    for version in range(start_version + 1, SCHEMA_VERSION + 1):
+        with conn:
+            # sqlite3 doesn't open a transaction for DDL on its own; begin one
+            # explicitly so a migration and its version bump apply together
+            conn.execute('BEGIN IMMEDIATE')
+            if get_version(conn) >= version:
+                continue  # another connection migrated it first
+            for statement in MIGRATIONS[version - 1]:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+        logger.info(f"Database schema migrated to v{version}")
+    return start_version
+
+
+def open_database(db_path: str = DEFAULT_DB_PATH, **kwargs) -> sqlite3.Connection:
+    """Open a tuned connection and make sure the schema is current"""
+    conn = connect(db_path, **kwargs)
+    migrate(conn)
+    return conn
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db_path = args[0] if args else DEFAULT_DB_PATH
+    conn = open_database(db_path)
+    logger.info(f"{db_path} is at schema v{get_version(conn)}")
+    conn.close()
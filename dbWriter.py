@@ -0,0 +1,201 @@
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from itertools import groupby
+from typing import Iterable, List, Tuple
+
+from dbSchema import connect
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COMMIT_SECONDS = registry.histogram('db_commit_seconds', 'BatchWriter transaction latency')
+ROWS_WRITTEN = registry.counter('db_rows_written_total', 'Statements committed by the BatchWriter')
+WRITE_ERRORS = registry.counter('db_write_errors_total', 'BatchWriter statement groups that could not be committed')
+WRITE_RETRIES = registry.counter('db_write_retries_total', 'BatchWriter transactions retried after a busy/locked error')
+QUEUE_DEPTH = registry.gauge('db_writer_queue_depth', 'Items waiting in the BatchWriter queue at the last commit')
+
+
+class BatchWriter:
+    """Write-behind SQLite writer
+
+    Callers queue rows and move on; a dedicated thread drains the queue
+    and commits everything it has (up to batch_size rows, or whatever
+    arrived within flush_interval) in a single transaction, using
+    executemany for runs of the same statement.
+
+    The queue holds at most max_pending items, and each item at most
+    batch_size rows, so memory is bounded: when the writer falls behind,
+    write() blocks until there is room again.
+
+    A transaction that hits a busy or locked database is retried with
+    backoff. If a batch still fails, each queued item (a write_group, or
+    a chunk of write_many rows) is committed in its own transaction, so
+    only the item that can't be written is lost - and its statements are
+    appended to lost_path and logged as critical, never dropped quietly.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 5000,
+                 flush_interval: float = 1.0, max_pending: int = 1000,
+                 max_retries: int = 3, retry_backoff: float = 0.05):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff  # seconds, doubled per retry
+        # Statements that could not be committed, as JSON lines
+        self.lost_path = f"{db_path}.lost.jsonl"
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.closed = False
+
+        # Stats
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors = 0
+        self.rows_lost = 0
+
+    def start(self):
+        """Start the writer thread; pending rows are flushed at interpreter exit"""
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+        return self
+
+    def write(self, sql: str, params: tuple):
+        """Queue a single statement"""
+        self._put([(sql, params)])
+
+    def write_many(self, sql: str, rows: Iterable[tuple]):
+        """Queue the same statement for many rows"""
+        rows = list(rows)
+        for i in range(0, len(rows), self.batch_size):
+            self._put([(sql, row) for row in rows[i:i + self.batch_size]])
+
+    def write_group(self, statements: List[Tuple[str, tuple]]):
+        """Queue statements that must be committed in the same transaction"""
+        self._put(list(statements))
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far has been committed"""
+        if self.thread is None or not self.thread.is_alive():
+            return True
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 30):
+        """Flush pending rows and stop the writer thread"""
+        if self.closed or self.thread is None:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join(timeout)
+        logger.info(f"DB writer stopped: {self.rows_written} rows in {self.batches_written} batches")
+        if self.rows_lost:
+            logger.critical(f"DB writer lost {self.rows_lost} rows in {self.errors} groups - see {self.lost_path}")
+
+    def _put(self, item):
+        if self.closed:
+            raise RuntimeError("BatchWriter is closed")
+        self.queue.put(item)
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            stopping = False
+            while not stopping:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+
+                # Keep collecting for up to flush_interval, unless the batch
+                # fills up or someone is waiting on a flush
+                groups, statements, markers = [], [], []
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is None:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        markers.append(item)
+                    else:
+                        groups.append(item)
+                        statements.extend(item)
+                    remaining = deadline - time.monotonic()
+                    if stopping or markers or len(statements) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if statements:
+                    self._commit(conn, groups, statements)
+                for marker in markers:
+                    marker.set()
+        finally:
+            conn.close()
+
+    def _commit(self, conn, groups, statements):
+        QUEUE_DEPTH.set(self.queue.qsize())
+        start = time.perf_counter()
+        error = self._transaction(conn, statements)
+        if error is None:
+            COMMIT_SECONDS.observe(time.perf_counter() - start)
+            return
+
+        # Find the bad item: everything else still gets written
+        logger.error(f"DB writer batch of {len(statements)} rows failed ({error}), "
+                     f"committing its {len(groups)} groups one at a time")
+        for group in groups:
+            error = self._transaction(conn, group)
+            if error is not None:
+                self._lose(group, error)
+
+    def _transaction(self, conn, statements) -> Exception:
+        """Commit statements in one transaction, retrying busy/locked errors
+
+        Returns None on success, else the last error.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with conn:
+                    for sql, group in groupby(statements, key=lambda statement: statement[0]):
+                        conn.executemany(sql, [params for _, params in group])
+            except sqlite3.OperationalError as e:
+                # Busy, locked and disk I/O errors can clear up; give it a moment
+                if attempt == self.max_retries:
+                    return e
+                WRITE_RETRIES.inc()
+                logger.warning(f"DB writer transaction failed ({e}), retry {attempt + 1}/{self.max_retries}")
+                time.sleep(self.retry_backoff * 2 ** attempt)
+            except Exception as e:
+                return e
+            else:
+                self.rows_written += len(statements)
+                self.batches_written += 1
+                ROWS_WRITTEN.inc(len(statements))
+                return None
+
+    def _lose(self, statements, error):
+        """Escalate statements that could not be committed: log them and keep a copy"""
+        self.errors += 1
+        self.rows_lost += len(statements)
+        WRITE_ERRORS.inc()
+        tables = sorted({' '.join(sql.split()[:4]) for sql, _ in statements})
+        logger.critical(f"DB writer could not commit {len(statements)} statements ({', '.join(tables)}): "
+                        f"{error} - the database no longer matches memory; statements saved to {self.lost_path}")
+        try:
+            with open(self.lost_path, 'a') as f:
+                for sql, params in statements:
+                    f.write(json.dumps({'error': str(error), 'sql': ' '.join(sql.split()), 'params': params},
+                                       default=str) + '\n')
+        except OSError as e:
+            for sql, params in statements:
+                logger.critical(f"Lost statement: {' '.join(sql.split())} {params!r}")
+            logger.critical(f"Could not save lost statements to {self.lost_path}: {e}")
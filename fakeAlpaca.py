@@ -0,0 +1,828 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Alpaca trading and market data REST APIs.
+Serves a synthetic universe of fractionable stocks and counts every HTTP
+request, so a full scan can be exercised without network access.
+
+Also provides a stand-in for the market data websocket, and a replay
+harness that pushes trades through it into a streaming bot.
+
+Usage:
+  python fakeAlpaca.py                  # Run one bot scan against the fake server
+  python fakeAlpaca.py --symbols 6000   # Size of the synthetic universe
+  python fakeAlpaca.py --scans 3        # Run several scans back to back
+  python fakeAlpaca.py --rate-limit 200 # Enforce a requests/minute limit (429s + X-RateLimit-* headers)
+  python fakeAlpaca.py --latency 50     # Add 50ms to every response
+  python fakeAlpaca.py --order-latency 500 --fill-delay 2   # Slow order acks, fills 2s after submission
+  python fakeAlpaca.py --async          # Scan with the asyncio backend
+  python fakeAlpaca.py --tiered --rate-limit 200 --duration 120   # Tiered polling, per-tier freshness
+  python fakeAlpaca.py --stream         # Replay synthetic trades into a streaming bot
+  python fakeAlpaca.py --stream --rate 2000      # Pace the replay (trades/s)
+  python fakeAlpaca.py --stream --replay paper_trading.db   # Replay recorded price_history
+  python fakeAlpaca.py --serve          # Only serve on http://127.0.0.1:8765
+  python fakeAlpaca.py --check          # Run the assertion-based checks (exits non-zero on failure)
+"""
+
+import asyncio
+
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+
+class FakeMarket:
+    """Synthetic market state shared by all request handlers"""
+
+    def __init__(self, num_symbols=6000, seed=42, rate_limit=None, latency=0.0,
+                 order_latency=0.0, fill_delay=0.0, exhaust_after=None):
+        rng = random.Random(seed)
+        self.symbols = [f"SYM{i:05d}" for i in range(num_symbols)]
+        self.prev_closes = {}
+        self.prices = {}
+        for symbol in self.symbols:
+            prev_close = rng.uniform(10, 500)
+            change_pct = max(-0.15, min(0.15, rng.gauss(0, 0.025)))
+            self.prev_closes[symbol] = prev_close
+            self.prices[symbol] = prev_close * (1 + change_pct)
+
+        self.orders = {}
+        self.positions = {}
+        self.request_counts = Counter()
+        self.lock = threading.Lock()
+
+        # Requests per minute, enforced in fixed one-minute windows like Alpaca's
+        self.rate_limit = rate_limit
+        self.window_start = time.time()
+        self.window_used = 0
+        # After this many requests the rest of the window is used up at once,
+        # as if another client on the same account had burst through it
+        self.exhaust_after = exhaust_after
+
+        # Seconds added to every response, to stand in for the network
+        self.latency = latency
+        # Extra seconds before an order is acknowledged, and before it fills
+        # (0: filled in the acknowledgement)
+        self.order_latency = order_latency
+        self.fill_delay = fill_delay
+        self.fill_times = {}  # order id -> when it fills
+
+    @classmethod
+    def from_price_history(cls, db_path):
+        """Build a market from the first observation of each symbol in a recorded price_history"""
+        market = cls(num_symbols=0)
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('''
+            SELECT symbol, price, daily_change_pct FROM price_history
+            GROUP BY symbol HAVING timestamp = MIN(timestamp)
+        ''')
+        for symbol, price, change_pct in rows:
+            market.symbols.append(symbol)
+            market.prices[symbol] = price
+            market.prev_closes[symbol] = price / (1 + (change_pct or 0))
+        conn.close()
+        return market
+
+    def count(self, route: str):
+        with self.lock:
+            self.request_counts[route] += 1
+
+    def total_requests(self) -> int:
+        with self.lock:
+            return sum(self.request_counts.values())
+
+    def take_request(self):
+        """Charge one request against the rate limit
+
+        Returns (allowed, headers) where headers are the X-RateLimit-* values
+        the real API sends with every response.
+        """
+        if self.rate_limit is None:
+            return True, {}
+        with self.lock:
+            now = time.time()
+            if now >= self.window_start + 60:
+                self.window_start, self.window_used = now, 0
+            if self.exhaust_after is not None and self.window_used >= self.exhaust_after:
+                self.window_used, self.exhaust_after = self.rate_limit, None
+            allowed = self.window_used < self.rate_limit
+            if allowed:
+                self.window_used += 1
+            headers = {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(self.rate_limit - self.window_used),
+                'X-RateLimit-Reset': str(int(self.window_start + 60)),
+            }
+        return allowed, headers
+
+    def drift(self, rng, fraction=0.01, sigma=0.005):
+        """Random-walk the prices of a random fraction of the universe"""
+        with self.lock:
+            for symbol in rng.sample(self.symbols, max(1, int(len(self.symbols) * fraction))):
+                self.prices[symbol] *= 1 + rng.gauss(0, sigma)
+
+    def reset_counts(self):
+        with self.lock:
+            self.request_counts.clear()
+
+    def trade_json(self, symbol):
+        return {'t': _now(), 'x': 'V', 'p': round(self.prices[symbol], 4), 's': 100, 'c': ['@'], 'i': 1, 'z': 'C'}
+
+    def bar_json(self, symbol, close, open_price):
+        return {'t': _now(), 'o': round(open_price, 4), 'h': round(max(open_price, close), 4),
+                'l': round(min(open_price, close), 4), 'c': round(close, 4), 'v': 100000,
+                'n': 1000, 'vw': round((open_price + close) / 2, 4)}
+
+    def snapshot_json(self, symbol):
+        prev_close = self.prev_closes[symbol]
+        return {
+            'latestTrade': self.trade_json(symbol),
+            'dailyBar': self.bar_json(symbol, self.prices[symbol], prev_close),
+            'prevDailyBar': self.bar_json(symbol, prev_close, prev_close),
+        }
+
+    def submit_order(self, data):
+        if self.order_latency:
+            time.sleep(self.order_latency)
+        order_id = str(uuid.uuid4())
+        order = {
+            'id': order_id, 'symbol': data['symbol'], 'qty': str(float(data['qty'])), 'side': data['side'],
+            'type': data.get('type', 'market'), 'status': 'accepted',
+            'filled_qty': '0', 'filled_avg_price': None,
+            'submitted_at': _now(), 'filled_at': None,
+        }
+        with self.lock:
+            self.orders[order_id] = order
+            self.fill_times[order_id] = time.time() + self.fill_delay
+        return self.get_order(order_id)
+
+    def get_order(self, order_id):
+        """The order, filled at the current price once its fill time has passed"""
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is not None and order['status'] == 'accepted' and time.time() >= self.fill_times[order_id]:
+                symbol, qty = order['symbol'], float(order['qty'])
+                order.update(status='filled', filled_qty=order['qty'],
+                             filled_avg_price=str(self.prices.get(symbol, 0)), filled_at=_now())
+                held = self.positions.get(symbol, 0.0)
+                self.positions[symbol] = held + qty if order['side'] == 'buy' else held - qty
+            return dict(order) if order is not None else None
+
+    def list_orders(self):
+        with self.lock:
+            order_ids = list(self.orders)
+        return [self.get_order(order_id) for order_id in order_ids]
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FakeAlpacaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
+    # (method, path regex, handler name - also the request counter key)
+    ROUTES = [
+        ('GET', r'/v2/assets', 'list_assets'),
+        ('GET', r'/v2/clock', 'get_clock'),
+        ('GET', r'/v2/account', 'get_account'),
+        ('GET', r'/v2/positions', 'list_positions'),
+        ('POST', r'/v2/orders', 'submit_order'),
+        ('GET', r'/v2/orders', 'list_orders'),
+        ('GET', r'/v2/orders/(?P<order_id>[^/]+)', 'get_order'),
+        ('GET', r'/v2/stocks/snapshots', 'get_snapshots'),
+        ('GET', r'/v2/stocks/trades/latest', 'get_latest_trades'),
+        ('GET', r'/v2/stocks/(?P<symbol>[^/]+)/trades/latest', 'get_latest_trade'),
+        ('GET', r'/v2/stocks/(?P<symbol>[^/]+)/bars', 'get_bars'),
+    ]
+
+    @property
+    def market(self) -> FakeMarket:
+        return self.server.market
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self, method):
+        parsed = urlparse(self.path)
+        self.params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        if method == 'POST':
+            # Read the body even if the request is rejected, or it poisons the keep-alive connection
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+        else:
+            body = None
+
+        if self.market.latency:
+            time.sleep(self.market.latency)
+        allowed, limit_headers = self.market.take_request()
+        if not allowed:
+            self.market.count('rate_limited')
+            return self.send_json(429, {'code': 42910000, 'message': 'too many requests.'}, limit_headers)
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, parsed.path)
+            if route_method == method and match:
+                self.market.count(name)
+                status, payload = getattr(self, name)(body=body, **match.groupdict())
+                return self.send_json(status, payload, limit_headers)
+        self.market.count('not_found')
+        self.send_json(404, {'message': f'no route for {method} {parsed.path}'}, limit_headers)
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def requested_symbols(self):
+        return [s for s in self.params.get('symbols', '').split(',') if s in self.market.prices]
+
+    # Trading API
+
+    def list_assets(self, body=None):
+        return 200, [{'id': symbol, 'symbol': symbol, 'class': 'us_equity', 'exchange': 'NASDAQ',
+                      'status': 'active', 'tradable': True, 'fractionable': True}
+                     for symbol in self.market.symbols]
+
+    def get_clock(self, body=None):
+        return 200, {'timestamp': _now(), 'is_open': True, 'next_open': _now(), 'next_close': _now()}
+
+    def get_account(self, body=None):
+        return 200, {'id': 'fake', 'status': 'ACTIVE', 'cash': '100000', 'equity': '100000',
+                     'buying_power': '100000'}
+
+    def list_positions(self, body=None):
+        with self.market.lock:
+            held = {s: q for s, q in self.market.positions.items() if q > 0}
+        return 200, [{'symbol': s, 'qty': str(q), 'current_price': str(self.market.prices[s]),
+                      'avg_entry_price': str(self.market.prices[s]),
+                      'market_value': str(q * self.market.prices[s])}
+                     for s, q in held.items()]
+
+    def submit_order(self, body=None):
+        if body.get('symbol') not in self.market.prices:
+            return 422, {'message': f"asset {body.get('symbol')} not found"}
+        return 200, self.market.submit_order(body)
+
+    def get_order(self, body=None, order_id=None):
+        order = self.market.get_order(order_id)
+        if order is None:
+            return 404, {'message': 'order not found'}
+        return 200, order
+
+    def list_orders(self, body=None):
+        # Oldest first from `after`, like direction=asc; status and the rest are ignored
+        after = self.params.get('after', '')[:19]
+        orders = [order for order in self.market.list_orders() if order['submitted_at'][:19] > after]
+        return 200, orders[:int(self.params.get('limit', 50))]
+
+    # Market data API
+
+    def get_snapshots(self, body=None):
+        return 200, {s: self.market.snapshot_json(s) for s in self.requested_symbols()}
+
+    def get_latest_trades(self, body=None):
+        return 200, {'trades': {s: self.market.trade_json(s) for s in self.requested_symbols()}}
+
+    def get_latest_trade(self, body=None, symbol=None):
+        if symbol not in self.market.prices:
+            return 404, {'message': f'symbol {symbol} not found'}
+        return 200, {'symbol': symbol, 'trade': self.market.trade_json(symbol)}
+
+    def get_bars(self, body=None, symbol=None):
+        if symbol not in self.market.prices:
+            return 404, {'message': f'symbol {symbol} not found'}
+        prev_close = self.market.prev_closes[symbol]
+        bars = [self.market.bar_json(symbol, prev_close, prev_close),
+                self.market.bar_json(symbol, self.market.prices[symbol], prev_close)]
+        return 200, {'symbol': symbol, 'bars': bars, 'next_page_token': None}
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when hundreds arrive at once
+    request_queue_size = 1024
+
+
+class FakeAlpacaServer:
+    """Runs the fake API on a background thread"""
+
+    def __init__(self, market: FakeMarket = None, port=0):
+        self.market = market or FakeMarket()
+        self.httpd = FakeHTTPServer(('127.0.0.1', port), FakeAlpacaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.market = self.market
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def configure_environment(self):
+        """Point the bot and alpaca_trade_api at this server"""
+        os.environ['ALPACA_BASE_URL'] = self.url
+        os.environ['APCA_API_DATA_URL'] = self.url
+        os.environ.setdefault('ALPACA_API_KEY', 'fake-key')
+        os.environ.setdefault('ALPACA_SECRET_KEY', 'fake-secret')
+        # Start the bot's scheduler at the server's limit (effectively none by default)
+        os.environ['ALPACA_RATE_LIMIT'] = str(self.market.rate_limit or 1000000)
+
+
+class FakeStreamServer:
+    """Stand-in for the Alpaca market data websocket (JSON protocol)
+
+    Accepts any credentials and pushes whatever trades are passed to
+    publish() to clients subscribed to those symbols (or "*").
+    """
+
+    def __init__(self, port=0):
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.clients = {}
+        self.ready = threading.Event()
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _serve(self):
+        import websockets
+
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(websockets.serve(self._handler, '127.0.0.1', self.port))
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _handler(self, ws, path=None):
+        await ws.send(json.dumps([{'T': 'success', 'msg': 'connected'}]))
+        subscriptions = set()
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get('action') == 'auth':
+                    await ws.send(json.dumps([{'T': 'success', 'msg': 'authenticated'}]))
+                elif msg.get('action') == 'subscribe':
+                    subscriptions.update(msg.get('trades', []) + msg.get('bars', []))
+                    self.clients[ws] = subscriptions
+                    await ws.send(json.dumps([{'T': 'subscription', 'trades': sorted(subscriptions)}]))
+        finally:
+            self.clients.pop(ws, None)
+
+    def publish(self, trades):
+        """Push (symbol, price) trades to subscribers as a single frame"""
+        messages = [{'T': 't', 'S': symbol, 'p': price, 's': 100, 't': _now()} for symbol, price in trades]
+        asyncio.run_coroutine_threadsafe(self._broadcast(messages), self.loop).result()
+
+    async def _broadcast(self, messages):
+        for ws, subscriptions in list(self.clients.items()):
+            wanted = [m for m in messages if '*' in subscriptions or m['S'] in subscriptions]
+            if wanted:
+                await ws.send(json.dumps(wanted))
+
+
+def iter_replay_trades(market, replay_db=None, ticks=100000, seed=7):
+    """Yield (symbol, price) trades, from a recorded price_history or a random walk"""
+    if replay_db:
+        conn = sqlite3.connect(replay_db)
+        for symbol, price in conn.execute('SELECT symbol, price FROM price_history ORDER BY timestamp'):
+            yield symbol, price
+        conn.close()
+        return
+
+    rng = random.Random(seed)
+    prices = dict(market.prices)
+    for _ in range(ticks):
+        symbol = rng.choice(market.symbols)
+        prices[symbol] *= 1 + rng.gauss(0, 0.002)
+        yield symbol, round(prices[symbol], 4)
+
+
+def run_stream_replay(num_symbols, replay_db=None, rate=None, frame_size=50, ticks=100000):
+    """Replay trades through the websocket stand-in into a streaming bot
+
+    rate caps the replay speed in trades per second (default: as fast as
+    the bot keeps up). Reports replay throughput and the delay between a
+    trade being sent and the bot evaluating the resulting signal.
+
+    Returns a summary: trades published, received by the client and
+    handled by the bot, the symbols evaluated, the first threshold
+    crossing ('buy' or 'sell') of each symbol in the replay, the order
+    pipeline's stats and the signal latencies.
+    """
+    market = FakeMarket.from_price_history(replay_db) if replay_db else FakeMarket(num_symbols)
+    server = FakeAlpacaServer(market).start()
+    server.configure_environment()
+    stream_server = FakeStreamServer().start()
+    os.environ['ALPACA_STREAM_URL'] = stream_server.url
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from paperTradingBot import PaperTradingBot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = PaperTradingBot(db_path=os.path.join(tmp, 'paper_trading.db'))
+        bot.start_streaming()
+        bot.stream.subscribed.wait(timeout=10)
+
+        # Count the trades that reach the bot's handler
+        handled = 0
+        on_price = bot.stream.on_price
+
+        def counted_on_price(symbol, price):
+            nonlocal handled
+            handled += 1
+            on_price(symbol, price)
+        bot.stream.on_price = counted_on_price
+
+        # Record when each symbol's signal is evaluated
+        sent_at = {}
+        latencies = []
+        evaluated = []
+        evaluate_stock = bot.evaluate_stock
+
+        def timed_evaluate(symbol, price, change_pct):
+            latencies.append(time.perf_counter() - sent_at[symbol])
+            evaluated.append(symbol)
+            evaluate_stock(symbol, price, change_pct)
+        bot.evaluate_stock = timed_evaluate
+
+        # The first threshold crossing of each symbol, as the bot should see it
+        crossings = {}
+
+        published = 0
+        frame = []
+        start = time.perf_counter()
+        for trade in iter_replay_trades(market, replay_db, ticks):
+            symbol, price = trade
+            prev_close = bot.prev_closes.get(symbol)
+            if prev_close and symbol not in crossings:
+                change_pct = (price - prev_close) / prev_close
+                if change_pct <= bot.buy_threshold:
+                    crossings[symbol] = 'buy'
+                elif change_pct >= bot.sell_threshold:
+                    crossings[symbol] = 'sell'
+            frame.append(trade)
+            if len(frame) == frame_size:
+                if rate:
+                    time.sleep(max(0.0, start + published / rate - time.perf_counter()))
+                now = time.perf_counter()
+                sent_at.update((symbol, now) for symbol, _ in frame)
+                stream_server.publish(frame)
+                published += len(frame)
+                frame = []
+        if frame:
+            now = time.perf_counter()
+            sent_at.update((symbol, now) for symbol, _ in frame)
+            stream_server.publish(frame)
+            published += len(frame)
+
+        # Wait for the client to drain the socket
+        deadline = time.time() + 30
+        while bot.stream.messages_received < published and time.time() < deadline:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        received = bot.stream.messages_received
+
+        bot.stream.stop()
+        bot.record_stream_prices()
+        bot.orders.close()
+        order_stats = bot.orders.stats()
+        bot.writer.close()
+        bot.conn.close()
+    stream_server.stop()
+    server.stop()
+
+    logger.info("=" * 60)
+    logger.info(f"Replayed {received}/{published} trades in {elapsed:.2f}s "
+                f"({received / elapsed:,.0f} trades/s)")
+    if latencies:
+        latencies.sort()
+        logger.info(f"Signals evaluated: {len(latencies)}, "
+                    f"median latency {statistics.median(latencies) * 1000:.1f}ms, "
+                    f"max {latencies[-1] * 1000:.1f}ms")
+    logger.info(f"Orders: {order_stats['submitted']} submitted, {order_stats['filled']} fills recorded")
+    return {'published': published, 'received': received, 'handled': handled, 'evaluated': evaluated,
+            'crossings': crossings, 'orders': order_stats, 'latencies': latencies}
+
+
+def run_scan_check(num_symbols, scans=1, rate_limit=None, latency=0.0, scan_backend='threads',
+                   order_latency=0.0, fill_delay=0.0, exhaust_after=None):
+    """Run full scans against the fake server and report HTTP call counts per scan
+
+    Returns a summary: per-scan (seconds, {route: requests}, seconds
+    queueing orders), the bot's batch size, how many symbols were priced,
+    and the scheduler's and order pipeline's stats.
+    """
+    market = FakeMarket(num_symbols, rate_limit=rate_limit, latency=latency,
+                        order_latency=order_latency, fill_delay=fill_delay, exhaust_after=exhaust_after)
+    server = FakeAlpacaServer(market).start()
+    server.configure_environment()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from paperTradingBot import PaperTradingBot
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = PaperTradingBot(db_path=os.path.join(tmp, 'paper_trading.db'), scan_backend=scan_backend)
+        batch_size = bot.market_data.batch_size
+        for _ in range(scans):
+            server.market.reset_counts()
+            start = time.time()
+            bot.run_scan()
+            elapsed = time.time() - start
+            results.append((elapsed, dict(server.market.request_counts), bot.scan_phases.get('order', 0.0)))
+
+        start = time.time()
+        bot.orders.close()
+        settle = time.time() - start
+        order_stats = bot.orders.stats()
+        bot.writer.close()
+        api_stats = bot.api.stats()
+        priced = bot.conn.execute('SELECT COUNT(DISTINCT symbol) FROM price_history').fetchone()[0]
+        trades = bot.conn.execute('SELECT COUNT(*) FROM trades').fetchone()[0]
+        slippage = bot.conn.execute('SELECT AVG(ABS(filled_price - signal_price) / signal_price) '
+                                    'FROM orders WHERE filled_quantity > 0').fetchone()[0]
+        bot.conn.close()
+    server.stop()
+
+    logger.info("=" * 60)
+    logger.info(f"Priced {priced}/{num_symbols} symbols")
+    for i, (elapsed, counts, ordering) in enumerate(results, 1):
+        logger.info(f"Scan {i}: {elapsed:.2f}s ({ordering:.2f}s queueing orders), "
+                    f"{sum(counts.values())} HTTP requests")
+        for route, count in sorted(counts.items()):
+            logger.info(f"  {route}: {count}")
+    logger.info(f"Scheduler: {api_stats['calls']} calls, {api_stats['retries']} retries "
+                f"({api_stats['rate_limited']} rate limited), {api_stats['failures']} failures")
+    logger.info(f"Orders: {order_stats['submitted']} submitted, {order_stats['filled']} fills recorded "
+                f"({trades} trades, mean |fill - signal| {(slippage or 0) * 100:.3f}%), "
+                f"{order_stats['open']} still open; settled {settle:.2f}s after the last scan")
+    return {'scans': results, 'batch_size': batch_size, 'priced': priced, 'api': api_stats, 'orders': order_stats}
+
+
+def check_scan_calls(num_symbols=1050, scans=3, scan_backend='threads'):
+    """Assert that scans stay batched, whatever the universe size
+
+    Every scan prices the universe with ceil(N / batch_size) latest-trade
+    requests; previous closes (snapshots) and the asset list are fetched
+    on the first scan of the trading day only; nothing is fetched one
+    symbol at a time.
+    """
+    report = run_scan_check(num_symbols, scans, scan_backend=scan_backend)
+    batches = -(-num_symbols // report['batch_size'])
+
+    assert report['priced'] == num_symbols, f"priced {report['priced']}/{num_symbols} symbols"
+    for i, (_, counts, _) in enumerate(report['scans'], 1):
+        assert counts.get('get_latest_trades', 0) == batches, \
+            f"scan {i}: {counts.get('get_latest_trades', 0)} latest-trade requests, expected {batches}"
+        first = i == 1
+        assert counts.get('get_snapshots', 0) == (batches if first else 0), \
+            f"scan {i}: {counts.get('get_snapshots', 0)} snapshot requests, expected {batches if first else 0}"
+        assert counts.get('list_assets', 0) == (1 if first else 0), \
+            f"scan {i}: {counts.get('list_assets', 0)} list_assets requests, expected {1 if first else 0}"
+        for route in ('get_latest_trade', 'get_bars'):
+            assert not counts.get(route), f"scan {i}: {counts[route]} per-symbol {route} requests"
+    logger.info(f"OK: {scans} {scan_backend} scans of {num_symbols} symbols took {batches} "
+                f"latest-trade requests each, snapshots and assets on the first scan only")
+
+
+def check_rate_limit(num_symbols=1000, rate_limit=60, exhaust_after=3):
+    """Assert that a scan under an enforced rate limit loses nothing
+
+    The server allows rate_limit requests a minute, and after exhaust_after
+    requests another client uses up the rest of the window, so the bot
+    gets 429s it couldn't have predicted from the headers. Every batch
+    must still succeed after retrying, every symbol must be priced, and
+    the 429s must show up in the scheduler's stats and in the metrics.
+    Takes a little over a minute: the bot has to wait out the window.
+    """
+    from metrics import registry
+
+    def rate_limited_total():
+        return sum(sample['value'] for sample in registry.counter('alpaca_rate_limited_total').samples())
+
+    before = rate_limited_total()
+    report = run_scan_check(num_symbols, rate_limit=rate_limit, exhaust_after=exhaust_after)
+    api = report['api']
+    _, counts, _ = report['scans'][0]
+    rate_limited = rate_limited_total() - before
+
+    assert api['failures'] == 0, f"{api['failures']} requests failed for good"
+    assert report['priced'] == num_symbols, f"priced {report['priced']}/{num_symbols} symbols"
+    assert counts.get('rate_limited', 0) > 0, "the server never rate limited the scan"
+    # Orders settling after the scan can be rate limited too
+    assert api['rate_limited'] >= counts['rate_limited'], \
+        f"scheduler counted {api['rate_limited']} 429s, the server sent {counts['rate_limited']} during the scan"
+    assert api['retries'] >= api['rate_limited'], f"{api['retries']} retries for {api['rate_limited']} 429s"
+    assert rate_limited == api['rate_limited'], \
+        f"alpaca_rate_limited_total rose by {rate_limited}, the scheduler counted {api['rate_limited']}"
+    assert api['server_limit'] == rate_limit, f"scheduler saw a limit of {api['server_limit']}/min"
+    logger.info(f"OK: {num_symbols} symbols priced under a {rate_limit}/min limit, "
+                f"{api['rate_limited']} 429s retried, no failures")
+
+
+def check_stream_replay(num_symbols=2000, ticks=40000):
+    """Assert that streamed trades reach the bot and crossings turn into orders
+
+    Every published trade must reach the stream handler. Each symbol that
+    crosses a threshold is evaluated exactly once (the replay is shorter
+    than the signal cooldown), and every symbol whose first crossing is a
+    drop gets a buy order - nothing is held yet, so nothing can be sold.
+    """
+    report = run_stream_replay(num_symbols, ticks=ticks)
+    crossings = report['crossings']
+    buys = sum(1 for action in crossings.values() if action == 'buy')
+
+    assert report['received'] == report['published'], \
+        f"client received {report['received']}/{report['published']} trades"
+    assert report['handled'] == report['published'], \
+        f"handler saw {report['handled']}/{report['published']} trades"
+    assert buys, "replay produced no threshold crossings to check"
+    assert sorted(report['evaluated']) == sorted(crossings), \
+        f"evaluated {len(report['evaluated'])} symbols, {len(crossings)} crossed a threshold"
+    assert report['orders']['submitted'] == buys, \
+        f"{report['orders']['submitted']} orders submitted for {buys} buy crossings"
+    assert report['orders']['filled'] == buys and not report['orders']['open'], \
+        f"{report['orders']['filled']}/{buys} orders filled, {report['orders']['open']} still open"
+    logger.info(f"OK: {report['handled']}/{report['published']} streamed trades handled, "
+                f"{len(crossings)} crossings evaluated, {buys} buy orders filled")
+
+
+def run_checks():
+    """Run every assertion-based check against the fake servers"""
+    check_scan_calls(scan_backend='threads')
+    check_scan_calls(scan_backend='async')
+    check_stream_replay()
+    check_rate_limit()
+    logger.info("All checks passed")
+
+
+def run_tiered_check(num_symbols, duration=120, rate_limit=None):
+    """Run tiered polling against a drifting fake market for duration seconds
+
+    Reports how often each tier was actually re-polled, next to how stale a
+    full scan every two minutes leaves every symbol, and the request rate
+    each mode needs.
+    """
+    market = FakeMarket(num_symbols, rate_limit=rate_limit)
+    server = FakeAlpacaServer(market).start()
+    server.configure_environment()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from metrics import registry
+    from paperTradingBot import PaperTradingBot
+
+    stop = threading.Event()
+
+    def drift():
+        rng = random.Random(11)
+        while not stop.wait(1.0):
+            market.drift(rng)
+    drifter = threading.Thread(target=drift, daemon=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = PaperTradingBot(db_path=os.path.join(tmp, 'paper_trading.db'))
+
+        # Baseline: one full scan, with previous closes already cached
+        bot.prev_closes.warm(bot.get_all_tradable_stocks())
+        market.reset_counts()
+        start = time.time()
+        bot.run_scan()
+        scan_seconds = time.time() - start
+        scan_requests = market.total_requests()
+
+        market.reset_counts()
+        drifter.start()
+        start = time.monotonic()
+        ticks = 0
+        while time.monotonic() - start < duration:
+            tick_start = time.monotonic()
+            bot.run_tier_tick()
+            ticks += 1
+            time.sleep(max(0.0, bot.tier_tick - (time.monotonic() - tick_start)))
+        elapsed = time.monotonic() - start
+        tier_requests = market.total_requests()
+        stop.set()
+
+        bot.orders.close()
+        bot.writer.close()
+        counts = bot.tiers.counts()
+        bot.conn.close()
+    server.stop()
+
+    intervals = {sample['labels']['tier']: sample
+                 for sample in registry.histogram('tier_poll_interval_seconds').samples()}
+    logger.info("=" * 60)
+    full_interval = 120 + scan_seconds
+    logger.info(f"Full scan: {scan_seconds:.2f}s, {scan_requests} requests; every symbol "
+                f"re-polled every {full_interval:.0f}s ({scan_requests / full_interval * 60:.0f} requests/min)")
+    logger.info(f"Tiered: {ticks} ticks in {elapsed:.0f}s, {tier_requests} requests "
+                f"({tier_requests / elapsed * 60:.0f} requests/min)")
+    for name, count in counts.items():
+        sample = intervals.get(name)
+        if sample and sample['count']:
+            logger.info(f"  {name:<5} {count:>6} symbols, re-polled every {sample['sum'] / sample['count']:.1f}s "
+                        f"on average ({sample['count']} re-polls)")
+        else:
+            logger.info(f"  {name:<5} {count:>6} symbols, not re-polled yet")
+    return counts, intervals
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    num_symbols = 6000
+    if '--symbols' in sys.argv:
+        num_symbols = int(sys.argv[sys.argv.index('--symbols') + 1])
+
+    scans = 1
+    if '--scans' in sys.argv:
+        scans = int(sys.argv[sys.argv.index('--scans') + 1])
+
+    rate_limit = None
+    if '--rate-limit' in sys.argv:
+        rate_limit = int(sys.argv[sys.argv.index('--rate-limit') + 1])
+
+    latency = 0.0
+    if '--latency' in sys.argv:
+        latency = float(sys.argv[sys.argv.index('--latency') + 1]) / 1000
+    scan_backend = 'async' if '--async' in sys.argv else 'threads'
+
+    order_latency = 0.0
+    if '--order-latency' in sys.argv:
+        order_latency = float(sys.argv[sys.argv.index('--order-latency') + 1]) / 1000
+    fill_delay = 0.0
+    if '--fill-delay' in sys.argv:
+        fill_delay = float(sys.argv[sys.argv.index('--fill-delay') + 1])
+
+    if '--check' in sys.argv:
+        run_checks()
+    elif '--stream' in sys.argv:
+        replay_db = None
+        if '--replay' in sys.argv:
+            replay_db = sys.argv[sys.argv.index('--replay') + 1]
+        rate = None
+        if '--rate' in sys.argv:
+            rate = float(sys.argv[sys.argv.index('--rate') + 1])
+        run_stream_replay(num_symbols, replay_db, rate)
+    elif '--tiered' in sys.argv:
+        duration = 120
+        if '--duration' in sys.argv:
+            duration = float(sys.argv[sys.argv.index('--duration') + 1])
+        run_tiered_check(num_symbols, duration, rate_limit)
+    elif '--serve' in sys.argv:
+        server = FakeAlpacaServer(FakeMarket(num_symbols, rate_limit=rate_limit, latency=latency), port=8765)
+        logger.info(f"Fake Alpaca API listening on {server.url}")
+        logger.info(f"  export ALPACA_BASE_URL={server.url} APCA_API_DATA_URL={server.url}")
+        server.httpd.serve_forever()
+    else:
+        run_scan_check(num_symbols, scans, rate_limit, latency, scan_backend, order_latency, fill_delay)
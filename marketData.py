@@ -0,0 +1,285 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from dbSchema import open_database
+
+logger = logging.getLogger(__name__)
+
+# Trading dates follow the exchange calendar day, not the local one
+MARKET_TZ = ZoneInfo('America/New_York')
+
+
+def current_trading_date() -> str:
+    """Today's date in exchange time, as YYYY-MM-DD"""
+    return datetime.now(MARKET_TZ).date().isoformat()
+
+
+class MarketDataClient:
+    """Batched market data access using Alpaca's multi-symbol endpoints"""
+
+    def __init__(self, api, batch_size: int = 200):
+        self.api = api
+        # Symbols per request - snapshots are requested via the query string,
+        # so keep batches small enough for a sane URL length
+        self.batch_size = batch_size
+
+    def batches(self, symbols: List[str]) -> List[List[str]]:
+        """Split a symbol list into request-sized batches"""
+        return [symbols[i:i + self.batch_size]
+                for i in range(0, len(symbols), self.batch_size)]
+
+    def get_snapshots(self, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+        """Get (current_price, prev_close) for many symbols
+
+        Issues one snapshot request per batch. Symbols without usable data
+        are left out of the result.
+        """
+        results = {}
+        for batch in self.batches(symbols):
+            try:
+                snapshots = self.api.get_snapshots(batch)
+            except Exception as e:
+                logger.warning(f"Error fetching snapshots for {len(batch)} symbols: {e}")
+                continue
+
+            for symbol, snapshot in snapshots.items():
+                parsed = self.parse_snapshot(snapshot)
+                if parsed:
+                    results[symbol] = parsed
+        return results
+
+    def get_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Get the latest trade price for many symbols, one request per batch"""
+        results = {}
+        for batch in self.batches(symbols):
+            try:
+                trades = self.api.get_latest_trades(batch)
+            except Exception as e:
+                logger.warning(f"Error fetching latest trades for {len(batch)} symbols: {e}")
+                continue
+
+            for symbol, trade in trades.items():
+                if trade is not None and trade.price:
+                    results[symbol] = trade.price
+        return results
+
+    def get_previous_closes(self, symbols: List[str], trading_date: str) -> Dict[str, float]:
+        """Get the close of the session before trading_date for many symbols"""
+        results = {}
+        for batch in self.batches(symbols):
+            try:
+                snapshots = self.api.get_snapshots(batch)
+            except Exception as e:
+                logger.warning(f"Error fetching snapshots for {len(batch)} symbols: {e}")
+                continue
+
+            for symbol, snapshot in snapshots.items():
+                if snapshot is None:
+                    continue
+                # Before the open the daily bar is still the previous
+                # session's, so its close is the one we want
+                daily_bar = snapshot.daily_bar
+                if daily_bar is not None and _bar_date(daily_bar) < trading_date:
+                    results[symbol] = daily_bar.close
+                elif snapshot.prev_daily_bar is not None:
+                    results[symbol] = snapshot.prev_daily_bar.close
+        return results
+
+    @staticmethod
+    def parse_snapshot(snapshot) -> Tuple[float, float]:
+        """Extract (current_price, prev_close) from a snapshot, or None"""
+        if snapshot is None:
+            return None
+
+        current_price = None
+        if snapshot.latest_trade is not None:
+            current_price = snapshot.latest_trade.price
+        elif snapshot.daily_bar is not None:
+            current_price = snapshot.daily_bar.close
+        if not current_price:
+            return None
+
+        # Same fallback as the per-symbol path: previous close if we have it,
+        # otherwise today's open
+        if snapshot.prev_daily_bar is not None:
+            prev_close = snapshot.prev_daily_bar.close
+        elif snapshot.daily_bar is not None:
+            prev_close = snapshot.daily_bar.open
+        else:
+            prev_close = None
+        return current_price, prev_close
+
+
+def _bar_date(bar) -> str:
+    """Exchange-time date of a daily bar, as YYYY-MM-DD"""
+    timestamp = pd.Timestamp(bar.timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.tz_convert(MARKET_TZ).date().isoformat()
+
+
+class PreviousCloseStore:
+    """Previous session closes keyed by (symbol, trading date)
+
+    Closes can't change during a session, so they are fetched once per
+    trading day in bulk and persisted to the prev_close table, which lets
+    a restarted bot pick up where it left off.
+    """
+
+    def __init__(self, db_path: str, market_data: MarketDataClient):
+        self.market_data = market_data
+        self.conn = open_database(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.trading_date = None
+        self.closes = {}
+        # Symbols already requested today that came back without a close
+        self.unavailable = set()
+
+    def roll(self, trading_date: str = None) -> bool:
+        """Switch to the given (default: current) trading date
+
+        Returns True if the date changed, in which case cached closes are
+        reloaded from the database and older days are purged.
+        """
+        trading_date = trading_date or current_trading_date()
+        with self.lock:
+            if trading_date == self.trading_date:
+                return False
+
+            cursor = self.conn.cursor()
+            cursor.execute('DELETE FROM prev_close WHERE trading_date < ?', (trading_date,))
+            cursor.execute('SELECT symbol, close FROM prev_close WHERE trading_date = ?', (trading_date,))
+            self.closes = dict(cursor.fetchall())
+            self.conn.commit()
+
+            self.trading_date = trading_date
+            self.unavailable = set()
+        logger.info(f"Previous closes for {trading_date}: {len(self.closes)} loaded from database")
+        return True
+
+    def warm(self, symbols: List[str]) -> int:
+        """Fetch and persist closes for any symbols not yet known today
+
+        Returns the number of closes fetched.
+        """
+        self.roll()
+        with self.lock:
+            missing = [s for s in symbols if s not in self.closes and s not in self.unavailable]
+            trading_date = self.trading_date
+        if not missing:
+            return 0
+
+        logger.info(f"Fetching previous closes for {len(missing)} symbols...")
+        fetched = self.market_data.get_previous_closes(missing, trading_date)
+
+        with self.lock:
+            if trading_date != self.trading_date:
+                return 0
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO prev_close (symbol, trading_date, close) VALUES (?, ?, ?)',
+                [(symbol, trading_date, close) for symbol, close in fetched.items()]
+            )
+            self.conn.commit()
+            self.closes.update(fetched)
+            self.unavailable.update(s for s in missing if s not in fetched)
+        return len(fetched)
+
+    def get(self, symbol: str) -> float:
+        """Previous close for symbol on the current trading date, or None"""
+        return self.closes.get(symbol)
+
+
+class UniverseStore:
+    """The tradable symbol list, refreshed once per trading day
+
+    The list changes at most daily, so it is fetched on the first use of
+    each trading day (or on demand) and persisted to the universe table
+    with each symbol's array position. A restarted bot starts scanning
+    from the stored list without calling list_assets. Symbols keep their
+    relative order across refreshes and new listings are appended, so
+    `index` ({symbol: position}) can be reused by array-based scan code.
+    Each refresh records its additions and removals in universe_changes.
+    """
+
+    def __init__(self, db_path: str, fetch_symbols: Callable[[], List[str]]):
+        self.fetch_symbols = fetch_symbols
+        self.conn = open_database(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.symbols = []
+        self.index = {}
+        self.trading_date = None  # trading date of the last successful refresh
+        self.load()
+
+    def load(self):
+        """(Re)load the stored universe"""
+        with self.lock:
+            self.symbols = [symbol for symbol, in self.conn.execute('SELECT symbol FROM universe ORDER BY position')]
+            self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+            self.trading_date = self.conn.execute('SELECT MAX(trading_date) FROM universe_refresh').fetchone()[0]
+        if self.symbols:
+            logger.info(f"Universe: {len(self.symbols)} symbols loaded from database (refreshed {self.trading_date})")
+
+    def get(self) -> List[str]:
+        """The current universe, refreshed first if it's from an earlier trading day
+
+        The returned list is never modified in place; a refresh replaces it.
+        """
+        if self.trading_date != current_trading_date():
+            self.refresh()
+        return self.symbols
+
+    def refresh(self) -> Tuple[List[str], List[str]]:
+        """Fetch the universe now; returns (added, removed)
+
+        A failed or empty fetch keeps the stored universe, and the next
+        get() tries again.
+        """
+        fetched = self.fetch_symbols()
+        if not fetched:
+            logger.warning("Universe refresh returned no symbols - keeping the stored universe")
+            return [], []
+
+        trading_date = current_trading_date()
+        with self.lock:
+            initial = not self.symbols
+            fetched_set = set(fetched)
+            added = [s for s in dict.fromkeys(fetched) if s not in self.index]
+            removed = [s for s in self.symbols if s not in fetched_set]
+            symbols = [s for s in self.symbols if s in fetched_set] + added
+
+            with self.conn:
+                if added or removed:
+                    self.conn.execute('DELETE FROM universe')
+                    self.conn.executemany('INSERT INTO universe (symbol, position) VALUES (?, ?)',
+                                          [(symbol, i) for i, symbol in enumerate(symbols)])
+                if not initial:
+                    self.conn.executemany(
+                        'INSERT OR REPLACE INTO universe_changes (trading_date, symbol, change) VALUES (?, ?, ?)',
+                        [(trading_date, s, 'added') for s in added] + [(trading_date, s, 'removed') for s in removed]
+                    )
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO universe_refresh (trading_date, refreshed_at, symbol_count, added, removed) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (trading_date, datetime.now(), len(symbols), len(added), len(removed))
+                )
+
+            if added or removed:
+                self.symbols = symbols
+                self.index = {symbol: i for i, symbol in enumerate(symbols)}
+            self.trading_date = trading_date
+
+        if initial:
+            logger.info(f"Universe: {len(symbols)} symbols")
+        else:
+            logger.info(f"Universe refreshed for {trading_date}: {len(symbols)} symbols, "
+                        f"{len(added)} added, {len(removed)} removed")
+            if added:
+                logger.info(f"  Added: {', '.join(added[:20])}{' ...' if len(added) > 20 else ''}")
+            if removed:
+                logger.info(f"  Removed: {', '.join(removed[:20])}{' ...' if len(removed) > 20 else ''}")
+        return added, removed
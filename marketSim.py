@@ -96,6 +96,65 @@ class MarketSimulator:
         
         return results
     
+    # Scenario mixture used by simulate_price_movement, as arrays:
+    # name, probability, mean, std dev, direction (0 = either way)
+    SCENARIOS = ['normal', 'volatile', 'trending_up', 'trending_down', 'major_event']
+    SCENARIO_WEIGHTS = np.array([0.7, 0.15, 0.05, 0.05, 0.05])
+    SCENARIO_MEAN = np.array([0.0, 0.0, 0.02, 0.02, 0.0], dtype=np.float32)
+    SCENARIO_STD = np.array([0.01, 0.02, 0.02, 0.02, 0.05], dtype=np.float32)
+    SCENARIO_DIRECTION = np.array([0, 0, 1, -1, 0], dtype=np.float32)
+    
+    # Market regimes used by simulate_market_day: probability and the range
+    # each symbol's volatility factor is drawn from
+    REGIMES = ['bull', 'bear', 'neutral']
+    REGIME_WEIGHTS = np.array([0.3, 0.3, 0.4])
+    REGIME_VOLATILITY = np.array([[0.8, 1.5], [0.8, 1.5], [0.5, 1.2]], dtype=np.float32)
+    
+    def simulate_price_matrix(self, num_symbols: int, num_days: int, seed: int = None,
+                              chunk_days: int = 250):
+        """Simulate closing prices for many symbols over many days at once
+        
+        Vectorized equivalent of calling simulate_market_day once per day,
+        with each day's close becoming the next day's previous close.
+        Returns (prices, regimes): prices is a (num_days + 1, num_symbols)
+        array whose first row is the starting close, and regimes holds each
+        day's index into REGIMES.
+        
+        Daily changes are drawn chunk_days at a time in float32 to keep
+        the temporaries small.
+        """
+        rng = np.random.default_rng(seed)
+        prices = np.empty((num_days + 1, num_symbols))
+        prices[0] = rng.uniform(10, 500, num_symbols)
+        regimes = np.searchsorted(np.cumsum(self.REGIME_WEIGHTS), rng.random(num_days), side='right')
+        scenario_edges = np.cumsum(self.SCENARIO_WEIGHTS).astype(np.float32)
+        
+        for start in range(0, num_days, chunk_days):
+            days = min(chunk_days, num_days - start)
+            shape = (days, num_symbols)
+            
+            scenario = np.searchsorted(scenario_edges, rng.random(shape, dtype=np.float32), side='right')
+            scenario = np.minimum(scenario, len(self.SCENARIOS) - 1)
+            change = rng.standard_normal(shape, dtype=np.float32)
+            change *= self.SCENARIO_STD[scenario]
+            change += self.SCENARIO_MEAN[scenario]
+            direction = self.SCENARIO_DIRECTION[scenario]
+            trending = direction != 0
+            change[trending] = np.abs(change[trending]) * direction[trending]
+            
+            # Per-symbol volatility factor from the day's regime
+            low, high = self.REGIME_VOLATILITY[regimes[start:start + days]].T
+            factor = rng.random(shape, dtype=np.float32)
+            factor *= (high - low)[:, None]
+            factor += low[:, None]
+            change *= factor
+            np.clip(change, -0.15, 0.15, out=change)
+            
+            change += 1
+            prices[start + 1:start + 1 + days] = np.cumprod(change, axis=0, dtype=np.float64) * prices[start]
+        
+        return prices, regimes
+    
     def get_interesting_stocks(self, num_stocks=20):
         """Generate a list of stocks with interesting movements"""
         stocks = []
@@ -133,36 +192,74 @@ class SimulatedPaperTradingBot:
         self.simulator = MarketSimulator()
         self.original_get_price = bot_instance.get_current_price
         self.original_calculate_change = bot_instance.calculate_daily_change
+        self.original_fetch_prices = bot_instance.fetch_prices
         self.original_get_stocks = bot_instance.get_all_tradable_stocks
         
     def enable_simulation(self):
         """Replace real market functions with simulated ones"""
         self.bot.get_current_price = self._simulated_get_price
         self.bot.calculate_daily_change = self._simulated_calculate_change
+        self.bot.fetch_prices = self._simulated_fetch_prices
+        # Previous closes come from the simulator, not the market data API
+        self.bot.prev_closes.warm = lambda symbols: 0
         self.bot.get_all_tradable_stocks = self._simulated_get_stocks
+        # The real account has nothing to do with simulated positions
+        self.bot.portfolio.sync = self._simulated_sync
         logger.info("📊 SIMULATION MODE ENABLED - Using simulated market data")
         
     def _simulated_get_stocks(self):
         """Return simulated stock list"""
         return self.simulator.get_interesting_stocks(50)
     
-    def _simulated_get_price(self, symbol: str):
-        """Get simulated price"""
+    def _market_price(self, symbol: str):
+        """The simulator's current price - what the market data API would return"""
         if symbol not in self.simulator.simulated_prices:
             self.simulator.initialize_stock(symbol)
         return self.simulator.simulated_prices[symbol]
     
+    def _simulated_get_price(self, symbol: str):
+        """Get simulated price, through the bot's price cache like a real lookup"""
+        price = self.bot.price_cache.get(symbol)
+        if price is None:
+            price = self._market_price(symbol)
+            self.bot.price_cache.put(symbol, price)
+        return price
+    
     def _simulated_calculate_change(self, symbol: str):
         """Calculate simulated daily change"""
         if symbol not in self.simulator.simulated_prices:
             price, change = self.simulator.simulate_price_movement(symbol)
+            self.bot.price_cache.put(symbol, price)
         else:
-            price = self.simulator.simulated_prices[symbol]
+            price = self._simulated_get_price(symbol)
             prev = self.simulator.previous_closes.get(symbol, price)
             change = (price - prev) / prev if prev != 0 else 0
         
         return price, change
     
+    def _simulated_fetch_prices(self, symbols):
+        """Get simulated (price, prev_close) for a batch of symbols, refreshing the price cache"""
+        results = {}
+        for symbol in symbols:
+            price = self._market_price(symbol)
+            results[symbol] = (price, self.simulator.previous_closes.get(symbol, price))
+        self.bot.price_cache.put_many({symbol: price for symbol, (price, _) in results.items()})
+        return results
+    
+    def _simulated_sync(self):
+        """Value local positions at simulated prices, without reconciling with the broker"""
+        positions = self.bot.position_book.open_positions()
+        prices = {symbol: self._simulated_get_price(symbol) for symbol in positions}
+        details, market_value = self.bot.portfolio.value(positions, prices)
+        return {
+            'total_value': market_value,
+            'positions': details,
+            'equity': None,
+            'cash': None,
+            'buying_power': None,
+            'adjusted': 0,
+        }
+    
     def run_simulation_test(self):
         """Run a test with simulated market data"""
         logger.info("Starting simulation test...")
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+In-process counters, gauges and latency histograms for the bot.
+Modules record into the shared `registry`; the bot dumps a JSON snapshot
+after every scan, and the dashboard serves snapshots as Prometheus text
+on /metrics.
+
+Usage:
+  python metrics.py                     # Print the bot's last snapshot (bot_metrics.json) as Prometheus text
+  python metrics.py path/to/metrics.json
+"""
+
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS_PATH = 'bot_metrics.json'
+
+# Seconds; spans a cached lookup up to a slow full scan
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def metrics_path_for(db_path: str) -> str:
+    """The metrics snapshot that sits next to a database"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), DEFAULT_METRICS_PATH)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Monotonic count per label set"""
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.values = {}  # label key -> value
+
+    def inc(self, amount: float = 1, **labels):
+        self._inc(_label_key(labels), amount)
+
+    def _inc(self, key: tuple, amount: float):
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def labels(self, **labels) -> 'BoundMetric':
+        """This metric with its labels fixed, for hot paths"""
+        return BoundMetric(self, _label_key(labels))
+
+    def samples(self) -> List[dict]:
+        with self.lock:
+            return [{'labels': dict(key), 'value': value} for key, value in self.values.items()]
+
+
+class BoundMetric:
+    """A Counter or Gauge with a fixed label set, skipping per-call label handling"""
+
+    def __init__(self, metric: Counter, key: tuple):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount: float = 1):
+        self.metric._inc(self.key, amount)
+
+    def set(self, value: float):
+        with self.metric.lock:
+            self.metric.values[self.key] = value
+
+
+class Gauge(Counter):
+    """Last value set per label set"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+
+class Histogram:
+    """Bucketed observations per label set, Prometheus style"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[dict]:
+        with self.lock:
+            values = [(key, list(state)) for key, state in self.values.items()]
+        samples = []
+        for key, state in values:
+            cumulative, buckets = 0, []
+            for le, count in zip(self.buckets, state):
+                cumulative += count
+                buckets.append([le, cumulative])
+            samples.append({'labels': dict(key), 'buckets': buckets, 'sum': state[-2], 'count': state[-1]})
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics, created on first use"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _get(self, cls, name, help, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str = '') -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = '') -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = '', buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def snapshot(self) -> dict:
+        """Every metric's current samples, JSON-serializable"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return {
+            'timestamp': time.time(),
+            'metrics': [{'name': m.name, 'type': m.kind, 'help': m.help, 'samples': m.samples()}
+                        for m in metrics],
+        }
+
+    def dump(self, path: str, **extra):
+        """Atomically write snapshot() (plus any extra keys) to path"""
+        snapshot = self.snapshot()
+        snapshot.update(extra)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> dict:
+    """A snapshot written by MetricsRegistry.dump, or None if there isn't one"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _format_labels(labels: Dict[str, str], **extra) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def render_prometheus(snapshot: dict) -> str:
+    """Prometheus text exposition format for a snapshot"""
+    lines = []
+    for metric in snapshot['metrics']:
+        name = metric['name']
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for sample in metric['samples']:
+            labels = sample['labels']
+            if metric['type'] == 'histogram':
+                for le, count in sample['buckets']:
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=le)} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {sample['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {sample['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {sample['value']}")
+    return '\n'.join(lines) + '\n'
+
+
+# Shared by everything in the process
+registry = MetricsRegistry()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    path = args[0] if args else DEFAULT_METRICS_PATH
+    snapshot = load_snapshot(path)
+    if snapshot is None:
+        logger.error(f"No metrics snapshot at {path} - it is written after each scan")
+        sys.exit(1)
+    sys.stdout.write(render_prometheus(snapshot))
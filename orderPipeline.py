@@ -0,0 +1,285 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ORDERS = registry.counter('orders_total', 'Orders by outcome (submitted, failed, filled, canceled, expired, rejected)')
+SUBMIT_SECONDS = registry.histogram('order_submit_seconds', 'Time for the broker to acknowledge an order')
+FILL_SECONDS = registry.histogram('order_fill_seconds', 'Time from queueing an order to recording its fill')
+PENDING_ORDERS = registry.gauge('orders_pending', 'Orders queued or waiting for a fill')
+
+# Nothing more fills after these
+TERMINAL_STATUSES = ('filled', 'canceled', 'expired', 'rejected')
+
+ORDER_UPSERT = '''
+    INSERT INTO orders (id, symbol, side, quantity, signal_price, reason, status,
+                        filled_quantity, filled_price, submitted_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        status = excluded.status,
+        filled_quantity = excluded.filled_quantity,
+        filled_price = excluded.filled_price,
+        updated_at = excluded.updated_at
+'''
+
+OPEN_ORDERS_SELECT = f'''
+    SELECT id, symbol, side, quantity, signal_price, reason, status, filled_quantity, filled_price, submitted_at
+    FROM orders
+    WHERE status NOT IN ({', '.join(f"'{status}'" for status in TERMINAL_STATUSES)})
+'''
+
+
+class Order:
+    """One order, from the signal that queued it to its last fill"""
+
+    def __init__(self, symbol: str, side: str, quantity: float, price: float, reason: str,
+                 timestamp: datetime = None):
+        self.id = None
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.price = price  # at the signal
+        self.reason = reason
+        self.timestamp = timestamp  # recorded trade time, if not the fill time
+        self.queued_at = time.monotonic()
+        self.submitted_at = None
+        self.status = 'queued'
+        self.filled_quantity = 0.0
+        self.filled_value = 0.0
+
+    def row(self, now: datetime) -> Tuple[str, tuple]:
+        filled_price = self.filled_value / self.filled_quantity if self.filled_quantity else None
+        return (ORDER_UPSERT, (self.id, self.symbol, self.side, self.quantity, self.price, self.reason,
+                               self.status, self.filled_quantity, filled_price, self.submitted_at, now))
+
+
+class OrderPipeline:
+    """Sends orders off the scan path and records them as they fill
+
+    submit() only queues the order; a pool of submitter threads sends it
+    through the rate-limited API, so a scan never waits on the broker.
+    An order that is already filled in the broker's acknowledgement is
+    recorded straight away; the rest are reconciled by a poller that
+    fetches every recent order in one request. Each fill is recorded on
+    the PositionBook at the broker's fill price and quantity, in the same
+    group as the order's own row. Partial fills are recorded as they grow.
+
+    Orders live in the orders table, so any still open at shutdown are
+    picked up again on the next start.
+
+    With workers=0, submit() sends and reconciles the acknowledgement on
+    the caller's thread, e.g. for replays against a simulated broker.
+    """
+
+    def __init__(self, api, book, conn, lock: threading.RLock, writer,
+                 workers: int = 4, poll_interval: float = 2.0, max_queued: int = 1000):
+        self.api = api
+        self.book = book
+        self.conn = conn
+        self.lock = lock
+        self.writer = writer
+        self.workers = workers
+        self.poll_interval = poll_interval
+
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.state_lock = threading.RLock()
+        self.open = {}     # order id -> Order awaiting fills
+        self.pending = {}  # (symbol, side) -> quantity queued or not yet filled
+        self.threads = []
+        self.reconciler = None
+        self.stopping = threading.Event()
+        self.closed = False
+
+        # Stats
+        self.submitted = 0
+        self.filled = 0
+        self.failed = 0
+        self.load()
+
+    def load(self):
+        """Resume tracking orders left open by a previous run"""
+        with self.lock:
+            rows = self.conn.execute(OPEN_ORDERS_SELECT).fetchall()
+        for order_id, symbol, side, quantity, price, reason, status, filled, filled_price, submitted_at in rows:
+            order = Order(symbol, side, quantity, price, reason)
+            order.id, order.status = order_id, status
+            order.submitted_at = datetime.fromisoformat(str(submitted_at)) if submitted_at else datetime.now()
+            order.filled_quantity = filled or 0.0
+            order.filled_value = order.filled_quantity * (filled_price or 0.0)
+            self.open[order_id] = order
+            self._add_pending(order, order.quantity - order.filled_quantity)
+        if rows:
+            logger.info(f"Resuming {len(rows)} open orders from the last run")
+
+    def start(self):
+        """Start the submitter and reconciler threads; open orders are settled at interpreter exit"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._submit_loop, name=f'order-submitter-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        self.reconciler = threading.Thread(target=self._reconcile_loop, name='order-reconciler', daemon=True)
+        self.reconciler.start()
+        atexit.register(self.close)
+        return self
+
+    def submit(self, symbol: str, side: str, quantity: float, price: float, reason: str,
+               timestamp: datetime = None):
+        """Queue a market order; price is the signal's, for the record only"""
+        if self.closed:
+            raise RuntimeError("OrderPipeline is closed")
+        order = Order(symbol, side, quantity, price, reason, timestamp)
+        self._add_pending(order, quantity)
+        if self.threads:
+            self.queue.put(order)
+        else:
+            self._send(order)
+
+    def pending_quantity(self, symbol: str, side: str) -> float:
+        """Shares of symbol queued or ordered on side that haven't filled yet"""
+        with self.state_lock:
+            return self.pending.get((symbol, side), 0.0)
+
+    def _add_pending(self, order: Order, quantity: float):
+        with self.state_lock:
+            key = (order.symbol, order.side)
+            remaining = self.pending.get(key, 0.0) + quantity
+            if remaining > 1e-9:
+                self.pending[key] = remaining
+            else:
+                self.pending.pop(key, None)
+            PENDING_ORDERS.set(self.queue.qsize() + len(self.open))
+
+    def _submit_loop(self):
+        while True:
+            order = self.queue.get()
+            if order is None:
+                break
+            self._send(order)
+
+    def _send(self, order: Order):
+        try:
+            with SUBMIT_SECONDS.time():
+                ack = self.api.submit_order(
+                    symbol=order.symbol,
+                    qty=order.quantity,
+                    side=order.side,
+                    type='market',
+                    time_in_force='day'
+                )
+        except Exception as e:
+            with self.state_lock:
+                self.failed += 1
+            ORDERS.inc(outcome='failed')
+            self._add_pending(order, -order.quantity)
+            logger.error(f"Error submitting {order.side} order for {order.symbol}: {e}")
+            return
+
+        with self.state_lock:
+            self.submitted += 1
+        ORDERS.inc(outcome='submitted')
+        order.id = str(ack.id)
+        order.submitted_at = datetime.now()
+        self._apply(order, ack)
+
+    def _apply(self, order: Order, status):
+        """Bring an order up to date with the broker's view of it"""
+        now = datetime.now()
+        with self.state_lock:
+            filled = float(status.filled_qty or 0)
+            fill_quantity = filled - order.filled_quantity
+            fill_value = 0.0
+            if fill_quantity > 1e-9:
+                fill_value = filled * float(status.filled_avg_price) - order.filled_value
+                order.filled_quantity, order.filled_value = filled, order.filled_value + fill_value
+                self._add_pending(order, -fill_quantity)
+            else:
+                fill_quantity = 0.0
+
+            changed = fill_quantity or status.status != order.status
+            order.status = status.status
+            if order.status in TERMINAL_STATUSES:
+                self.open.pop(order.id, None)
+                if changed:
+                    # Whatever didn't fill never will
+                    self._add_pending(order, -(order.quantity - order.filled_quantity))
+                    ORDERS.inc(outcome=order.status)
+                    if order.status != 'filled':
+                        logger.warning(f"{order.side.upper()} order for {order.symbol} {order.status} "
+                                       f"after filling {order.filled_quantity:.4f}/{order.quantity:.4f} shares")
+            else:
+                self.open[order.id] = order
+            PENDING_ORDERS.set(self.queue.qsize() + len(self.open))
+
+            if not changed:
+                return
+            if fill_quantity:
+                # The order's row commits with the trade it produced
+                fill_price = fill_value / fill_quantity
+                self.book.record_trade(order.symbol, order.side, fill_quantity, fill_price, fill_value,
+                                       order.reason, order.timestamp or now, extra=[order.row(now)])
+                self.filled += 1
+                FILL_SECONDS.observe(time.monotonic() - order.queued_at)
+                logger.info(f"{order.side.upper()} filled: {order.symbol} - {fill_quantity:.4f} shares "
+                            f"at ${fill_price:.2f} (signal ${order.price:.2f})")
+            else:
+                self.writer.write(*order.row(now))
+
+    def reconcile(self) -> int:
+        """Fetch the status of every open order and apply it; returns how many are still open"""
+        with self.state_lock:
+            orders = dict(self.open)
+        if not orders:
+            return 0
+
+        # Recent orders come back oldest first, so the oldest open one is always on the first page
+        oldest = min(order.submitted_at for order in orders.values())
+        after = (oldest.astimezone(timezone.utc) - timedelta(minutes=1)).isoformat()
+        try:
+            statuses = self.api.list_orders(status='all', after=after, direction='asc', limit=500)
+        except Exception as e:
+            logger.warning(f"Could not fetch order status: {e}")
+            return len(orders)
+
+        for status in statuses:
+            order = orders.get(str(status.id))
+            if order is not None:
+                self._apply(order, status)
+        with self.state_lock:
+            return len(self.open)
+
+    def _reconcile_loop(self):
+        while not self.stopping.wait(self.poll_interval):
+            self.reconcile()
+
+    def close(self, timeout: float = 30):
+        """Send everything queued, wait up to timeout for open orders to fill, and stop"""
+        if self.closed:
+            return
+        self.closed = True
+        deadline = time.monotonic() + timeout
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.stopping.set()
+        if self.reconciler is not None:
+            self.reconciler.join(max(0.0, deadline - time.monotonic()))
+
+        while self.reconcile() and time.monotonic() < deadline:
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+        if self.open:
+            logger.warning(f"{len(self.open)} orders still open at shutdown - they are reconciled on the next start")
+        logger.info(f"Order pipeline stopped: {self.submitted} submitted, {self.filled} fills recorded, "
+                    f"{self.failed} failed")
+
+    def stats(self) -> Dict[str, int]:
+        with self.state_lock:
+            return {'submitted': self.submitted, 'filled': self.filled, 'failed': self.failed,
+                    'queued': self.queue.qsize(), 'open': len(self.open)}
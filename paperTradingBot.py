@@ -1,16 +1,32 @@
 import alpaca_trade_api as tradeapi
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import json
-import sqlite3
 import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 import yfinance as yf
 from typing import Dict, List, Tuple
 import os
 from dotenv import load_dotenv
+from asyncScan import AsyncPriceFetcher
+from changeFeed import ChangeFeed
+from dbSchema import open_database
+from dbWriter import BatchWriter
+from marketData import MarketDataClient, PreviousCloseStore, UniverseStore
+from metrics import metrics_path_for, registry
+from orderPipeline import OrderPipeline
+from portfolioSync import PortfolioSync
+from priceCache import PriceCache
+from positionBook import PositionBook
+from priceStream import PriceStream
+from rateLimiter import RequestScheduler
+from screener import ThresholdScreener
+from tickStore import TickStore, store_path_for
+from tierScheduler import TIER_NAMES, TierScheduler
 
 # Load environment variables
 load_dotenv()
@@ -26,14 +42,50 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PRICE_HISTORY_INSERT = '''
+    INSERT OR REPLACE INTO price_history 
+    (symbol, timestamp, price, daily_change_pct)
+    VALUES (?, ?, ?, ?)
+'''
+
+LATEST_PRICE_UPSERT = '''
+    INSERT OR REPLACE INTO latest_price 
+    (symbol, timestamp, price, daily_change_pct)
+    VALUES (?, ?, ?, ?)
+'''
+
+SCAN_SECONDS = registry.histogram('scan_seconds', 'Full scan duration')
+SCAN_PHASE_SECONDS = registry.histogram('scan_phase_seconds', 'Scan time by phase (universe, fetch, evaluate, persist, order)')
+SCAN_SYMBOLS = registry.gauge('scan_symbols', 'Symbols in the last scan, by kind (universe, priced)')
+SIGNALS = registry.counter('signals_total', 'Trading signals by action')
+ERRORS = registry.counter('bot_errors_total', 'Errors handled without stopping the bot, by where they happened')
+TIER_SYMBOLS = registry.gauge('tier_symbols', 'Symbols per tier in tiered mode (hot, warm, cold)')
+TIER_POLL_INTERVAL = registry.histogram('tier_poll_interval_seconds', 'Time between polls of a symbol, by tier',
+                                        buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 3600))
+
 class PaperTradingBot:
-    def __init__(self, test_thresholds=False):
+    def __init__(self, test_thresholds=False, db_path='paper_trading.db', scan_backend='threads'):
         # Alpaca API credentials (use paper trading credentials)
-        self.api = tradeapi.REST(
-            os.getenv('ALPACA_API_KEY'),
-            os.getenv('ALPACA_SECRET_KEY'),
-            base_url='https://paper-api.alpaca.markets'
+        # Every call goes through the scheduler, which paces requests to the
+        # account's rate limit and retries 429s
+        self.api = RequestScheduler(
+            tradeapi.REST(
+                os.getenv('ALPACA_API_KEY'),
+                os.getenv('ALPACA_SECRET_KEY'),
+                base_url=os.getenv('ALPACA_BASE_URL', 'https://paper-api.alpaca.markets')
+            ),
+            rate_per_minute=int(os.getenv('ALPACA_RATE_LIMIT', 200))
         )
+        # Concurrent batch requests per scan - the scheduler decides how fast they go
+        self.max_in_flight = 16
+        
+        # How a scan fetches prices: 'threads' (blocking client on a thread
+        # pool) or 'async' (aiohttp, hundreds of requests in flight)
+        self.scan_backend = scan_backend
+        self.async_fetcher = AsyncPriceFetcher(self.api) if scan_backend == 'async' else None
+        
+        # Batched market data (hundreds of symbols per request)
+        self.market_data = MarketDataClient(self.api)
         
         # Trading parameters
         self.trade_amount = 10  # $10 per trade
@@ -49,56 +101,76 @@ class PaperTradingBot:
             logger.info("Using NORMAL THRESHOLDS: Buy at -5%, Sell at +5%")
         
         # Initialize database
+        self.db_path = db_path
         self.init_database()
         
-        # Cache for stock prices
-        self.price_cache = {}
-        self.last_update = {}
+        # Price history, trades and positions are written behind, in batches
+        self.writer = BatchWriter(db_path).start()
+        
+        # Columnar copy of every price observation, for fast bulk reads
+        self.tick_store = TickStore(store_path_for(db_path))
+        
+        # Trades, position changes and held-symbol prices for the dashboard's live stream
+        self.feed = ChangeFeed(self.writer)
+        
+        # Positions held in memory, written behind to the positions table
+        self.position_book = PositionBook(self.conn, self.db_lock, self.writer, self.feed)
+        
+        # Orders are sent off the scan path and recorded at their fill price
+        self.orders = OrderPipeline(self.api, self.position_book, self.conn, self.db_lock, self.writer).start()
+        
+        # Previous closes, fetched once per trading day
+        self.prev_closes = PreviousCloseStore(db_path, self.market_data)
+        
+        # Tradable symbols, fetched once per trading day
+        self.universe = UniverseStore(db_path, self.fetch_tradable_stocks)
+        
+        # Latest prices, fresh for a minute; bounded well above the universe size
+        self.price_cache = PriceCache(max_entries=16384, ttl=60, name='bot')
+        
+        # Broker positions, account and prices in a few bulk calls
+        self.portfolio = PortfolioSync(self.api, self.market_data, self.position_book, self.orders,
+                                       self.price_cache)
         
         # Track stocks close to thresholds
         self.close_to_threshold = []
         
+        # Metrics snapshot written after every scan, for the dashboard's /metrics
+        self.metrics_path = metrics_path_for(db_path)
+        self.scan_phases = {}
+        
+        # Vectorized threshold checks for full scans
+        self.screener = ThresholdScreener(self.buy_threshold, self.sell_threshold)
+        
+        # Tiered mode: how often each symbol is polled, by how close it is to a trade
+        self.tiers = TierScheduler(self.buy_threshold, self.sell_threshold)
+        self.tier_tick = 5
+        
+        # Streaming mode: re-check a symbol at most this often (seconds),
+        # the same cadence as the polling scan
+        self.stream = None
+        self.signal_cooldown = 120
+        self.last_signal_check = {}
+        
     def init_database(self):
-        """Initialize SQLite database for tracking trades and price history"""
-        self.conn = sqlite3.connect('paper_trading.db', check_same_thread=False)
-        cursor = self.conn.cursor()
-        
-        # Create tables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS price_history (
-                symbol TEXT,
-                timestamp DATETIME,
-                price REAL,
-                daily_change_pct REAL,
-                PRIMARY KEY (symbol, timestamp)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                symbol TEXT,
-                timestamp DATETIME,
-                action TEXT,
-                quantity REAL,
-                price REAL,
-                amount REAL,
-                reason TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS positions (
-                symbol TEXT PRIMARY KEY,
-                quantity REAL,
-                avg_price REAL,
-                last_update DATETIME
-            )
-        ''')
-        
-        self.conn.commit()
+        """Open the SQLite database for tracking trades and price history"""
+        self.conn = open_database(self.db_path, check_same_thread=False)
+        # The connection is shared by scan, stream and order threads
+        self.db_lock = threading.RLock()
         
     def get_all_tradable_stocks(self) -> List[str]:
+        """Get list of all tradable US stocks (cached, refreshed once per trading day)"""
+        tradable_stocks = self.universe.get()
+        
+        # In test mode, limit to first 100 stocks to reduce API calls
+        import sys
+        if '--test' in sys.argv and len(tradable_stocks) > 100:
+            logger.info("Test mode: Limiting to first 100 stocks")
+            tradable_stocks = tradable_stocks[:100]
+            
+        return tradable_stocks
+    
+    def fetch_tradable_stocks(self) -> List[str]:
         """Get list of all tradable US stocks from Alpaca"""
         try:
             assets = self.api.list_assets(status='active', asset_class='us_equity')
@@ -108,15 +180,9 @@ class PaperTradingBot:
                 if asset.tradable and asset.fractionable  # We want fractional shares for $10 trades
             ]
             logger.info(f"Found {len(tradable_stocks)} tradable stocks")
-            
-            # In test mode, limit to first 100 stocks to reduce API calls
-            import sys
-            if '--test' in sys.argv and len(tradable_stocks) > 100:
-                logger.info("Test mode: Limiting to first 100 stocks")
-                tradable_stocks = tradable_stocks[:100]
-                
             return tradable_stocks
         except Exception as e:
+            ERRORS.inc(where='list_assets')
             logger.error(f"Error fetching tradable stocks: {e}")
             return []
     
@@ -124,22 +190,20 @@ class PaperTradingBot:
         """Get current price for a symbol"""
         try:
             # Check cache first (1-minute cache)
-            if symbol in self.price_cache:
-                if datetime.now() - self.last_update.get(symbol, datetime.min) < timedelta(minutes=1):
-                    return self.price_cache[symbol]
+            price = self.price_cache.get(symbol)
+            if price is not None:
+                return price
             
-            # Get latest trade from Alpaca
-            trade = self.api.get_latest_trade(symbol)
-            if trade:
-                price = trade.price
-                self.price_cache[symbol] = price
-                self.last_update[symbol] = datetime.now()
+            # Same batched endpoint as a scan, so a miss costs what a scan batch does
+            price = self.market_data.get_latest_prices([symbol]).get(symbol)
+            if price:
+                self.price_cache.put(symbol, price)
                 return price
             return None
         except Exception as e:
-            # Don't log every single error in detail to avoid spam
-            if "sleep" not in str(e).lower():  # Only log non-rate-limit errors
-                logger.debug(f"Error getting price for {symbol}: {e}")
+            # Rate limits are retried by the scheduler; anything left is logged quietly
+            ERRORS.inc(where='get_current_price')
+            logger.debug(f"Error getting price for {symbol}: {e}")
             return None
     
     def calculate_daily_change(self, symbol: str) -> Tuple[float, float]:
@@ -150,44 +214,65 @@ class PaperTradingBot:
             if not current_price:
                 return None, None
             
-            # Get previous close from Alpaca
-            # Format datetime properly for Alpaca API (RFC3339 format)
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=3)
-            
-            # Use pagination parameter to avoid issues
-            bars = self.api.get_bars(
-                symbol,
-                '1Day',
-                start=start_date.strftime('%Y-%m-%d'),
-                end=end_date.strftime('%Y-%m-%d'),
-                limit=2,
-                page_limit=2,
-                adjustment='raw'
-            ).df
-            
-            if bars is not None and len(bars) >= 1:
-                prev_close = bars.iloc[-2]['close'] if len(bars) > 1 else bars.iloc[-1]['open']
-                change_pct = (current_price - prev_close) / prev_close if prev_close != 0 else 0
-                return current_price, change_pct
+            # Previous close can't change during the session; a symbol not
+            # seen yet today is fetched through the batched snapshot path
+            # (once - a symbol without one isn't asked for again today)
+            prev_close = self.prev_closes.get(symbol)
+            if not prev_close:
+                self.prev_closes.warm([symbol])
+                prev_close = self.prev_closes.get(symbol)
+            if prev_close:
+                return current_price, (current_price - prev_close) / prev_close
             
             return current_price, 0.0
         except Exception as e:
-            # Don't log every single error in detail to avoid spam
-            if "sleep" not in str(e).lower():  # Only log non-rate-limit errors
-                logger.debug(f"Error calculating change for {symbol}: {e}")
+            # Rate limits are retried by the scheduler; anything left is logged quietly
+            ERRORS.inc(where='calculate_daily_change')
+            logger.debug(f"Error calculating change for {symbol}: {e}")
             return None, None
     
-    def should_buy(self, symbol: str, change_pct: float) -> bool:
-        """Check if we should buy based on criteria"""
+    def fetch_prices(self, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+        """Get (current_price, prev_close) for many symbols at once
+        
+        prev_close is None when the previous close isn't known.
+        """
+        return self.apply_latest_prices(self.market_data.get_latest_prices(symbols))
+    
+    def apply_latest_prices(self, prices: Dict[str, float]) -> Dict[str, Tuple[float, float]]:
+        """Cache fetched {symbol: price} and pair each with its previous close"""
+        self.price_cache.put_many(prices)
+        return {symbol: (current_price, self.prev_closes.get(symbol))
+                for symbol, current_price in prices.items()}
+    
+    def record_prices(self, rows: List[Tuple[str, datetime, float, float]]):
+        """Record (symbol, timestamp, price, daily_change_pct) observations in
+        price_history, the latest_price table and the tick store"""
+        self.writer.write_many(PRICE_HISTORY_INSERT, rows)
+        self.writer.write_many(LATEST_PRICE_UPSERT, rows)
+        self.tick_store.append(rows)
+        
+        # Only held symbols are interesting to the dashboard
+        held = {symbol: [price, change_pct] for symbol, _, price, change_pct in rows
+                if self.position_book.get_quantity(symbol) > 0}
+        if held:
+            self.feed.publish('prices', held)
+    
+    def should_buy(self, symbol: str, change_pct: float, price: float = None) -> bool:
+        """Check if we should buy based on criteria
+        
+        price, if given (the price the signal fired at), values the current
+        position; otherwise it is looked up.
+        """
         if change_pct <= self.buy_threshold:
             # Check if we don't have too much exposure
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT quantity FROM positions WHERE symbol = ?', (symbol,))
-            position = cursor.fetchone()
+            quantity = self.position_book.get_quantity(symbol)
+            if not quantity:
+                return True
             
-            # Limit position size to $100 per stock
-            if position and position[0] * self.get_current_price(symbol) >= 100:
+            # Limit position size to $100 per stock - without a price the
+            # position can't be valued, so don't add to it
+            price = price or self.get_current_price(symbol)
+            if price is None or quantity * price >= 100:
                 return False
             return True
         return False
@@ -196,81 +281,49 @@ class PaperTradingBot:
         """Check if we should sell based on criteria"""
         if change_pct >= self.sell_threshold:
             # Check if we have a position
-            cursor = self.conn.cursor()
-            cursor.execute('SELECT quantity FROM positions WHERE symbol = ?', (symbol,))
-            position = cursor.fetchone()
-            return position is not None and position[0] > 0
+            return self.position_book.get_quantity(symbol) > 0
         return False
     
-    def execute_trade(self, symbol: str, action: str, price: float, reason: str):
-        """Execute a paper trade through Alpaca"""
+    def execute_trade(self, symbol: str, action: str, price: float, reason: str, timestamp=None):
+        """Queue a paper trade with Alpaca
+        
+        The order pipeline sends it and records the trade at the broker's
+        fill price once it fills. timestamp is when the trade is recorded as
+        happening (default: when it fills).
+        """
         try:
             quantity = self.trade_amount / price
             
-            if action == 'buy':
-                order = self.api.submit_order(
-                    symbol=symbol,
-                    qty=quantity,
-                    side='buy',
-                    type='market',
-                    time_in_force='day'
-                )
-                logger.info(f"BUY order placed: {symbol} - {quantity:.4f} shares at ${price:.2f}")
-            else:  # sell
-                # Check current position
-                cursor = self.conn.cursor()
-                cursor.execute('SELECT quantity FROM positions WHERE symbol = ?', (symbol,))
-                position = cursor.fetchone()
-                
-                if position and position[0] > 0:
-                    sell_qty = min(quantity, position[0])
-                    order = self.api.submit_order(
-                        symbol=symbol,
-                        qty=sell_qty,
-                        side='sell',
-                        type='market',
-                        time_in_force='day'
-                    )
-                    logger.info(f"SELL order placed: {symbol} - {sell_qty:.4f} shares at ${price:.2f}")
-                else:
+            if action == 'buy' and self.orders.pending_quantity(symbol, 'buy') > 0:
+                logger.info(f"Skipping {symbol} buy: the last one hasn't filled yet")
+                return
+            if action == 'sell':
+                # Shares already on their way out can't be sold again
+                held = self.position_book.get_quantity(symbol) - self.orders.pending_quantity(symbol, 'sell')
+                if held <= 1e-9:
                     logger.warning(f"No position to sell for {symbol}")
                     return
+                quantity = min(quantity, held)
             
-            # Record trade in database
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT INTO trades (symbol, timestamp, action, quantity, price, amount, reason)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (symbol, datetime.now(), action, quantity, price, self.trade_amount, reason))
-            
-            # Update positions
-            if action == 'buy':
-                cursor.execute('''
-                    INSERT OR REPLACE INTO positions (symbol, quantity, avg_price, last_update)
-                    VALUES (?, 
-                        COALESCE((SELECT quantity FROM positions WHERE symbol = ?), 0) + ?,
-                        ?, ?)
-                ''', (symbol, symbol, quantity, price, datetime.now()))
-            else:
-                cursor.execute('''
-                    UPDATE positions 
-                    SET quantity = quantity - ?, last_update = ?
-                    WHERE symbol = ?
-                ''', (quantity, datetime.now(), symbol))
-            
-            self.conn.commit()
+            self.orders.submit(symbol, action, quantity, price, reason, timestamp)
+            logger.info(f"{action.upper()} order queued: {symbol} - {quantity:.4f} shares at ~${price:.2f}")
             
         except Exception as e:
+            ERRORS.inc(where='execute_trade')
             logger.error(f"Error executing trade for {symbol}: {e}")
     
     def process_stock(self, symbol: str):
         """Process a single stock for trading signals"""
+        current_price, change_pct = self.calculate_daily_change(symbol)
+        
+        if current_price is None or change_pct is None:
+            return
+        
+        self.evaluate_stock(symbol, current_price, change_pct)
+    
+    def evaluate_stock(self, symbol: str, current_price: float, change_pct: float):
+        """Record a price observation and act on any trading signal"""
         try:
-            current_price, change_pct = self.calculate_daily_change(symbol)
-            
-            if current_price is None or change_pct is None:
-                return
-            
             # Track stocks close to thresholds (within 1% of threshold)
             if abs(change_pct - self.buy_threshold) < 0.01 or abs(change_pct - self.sell_threshold) < 0.01:
                 self.close_to_threshold.append({
@@ -280,16 +333,10 @@ class PaperTradingBot:
                 })
             
             # Record price history
-            cursor = self.conn.cursor()
-            cursor.execute('''
-                INSERT OR REPLACE INTO price_history 
-                (symbol, timestamp, price, daily_change_pct)
-                VALUES (?, ?, ?, ?)
-            ''', (symbol, datetime.now(), current_price, change_pct))
-            self.conn.commit()
+            self.record_prices([(symbol, datetime.now(), current_price, change_pct)])
             
             # Check trading signals
-            if self.should_buy(symbol, change_pct):
+            if self.should_buy(symbol, change_pct, current_price):
                 logger.info(f"🔵 BUY SIGNAL: {symbol} dropped {change_pct*100:.2f}% to ${current_price:.2f}")
                 self.execute_trade(symbol, 'buy', current_price, 
                                  f"Price dropped {change_pct*100:.2f}%")
@@ -299,43 +346,70 @@ class PaperTradingBot:
                                  f"Price increased {change_pct*100:.2f}%")
                 
         except Exception as e:
-            if "sleep" not in str(e).lower():
-                logger.error(f"Error processing {symbol}: {e}")
+            ERRORS.inc(where='evaluate_stock')
+            logger.error(f"Error processing {symbol}: {e}")
+    
+    @contextmanager
+    def phase(self, name: str):
+        """Time one phase of the current scan"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            SCAN_PHASE_SECONDS.observe(elapsed, phase=name)
+            self.scan_phases[name] = self.scan_phases.get(name, 0.0) + elapsed
+    
+    def dump_metrics(self, **extra):
+        """Write the metrics snapshot the dashboard serves on /metrics"""
+        try:
+            registry.dump(self.metrics_path, **extra)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.metrics_path}: {e}")
     
     def run_scan(self):
         """Run a full scan of all tradable stocks"""
         logger.info("Starting market scan...")
-        stocks = self.get_all_tradable_stocks()
+        scan_start = time.perf_counter()
+        self.scan_phases = {}
+        
+        with self.phase('universe'):
+            stocks = self.get_all_tradable_stocks()
+            
+            # Only fetches closes the first time a symbol is seen each trading day
+            self.prev_closes.warm(stocks)
         
         # Reset close to threshold tracker
         self.close_to_threshold = []
         
-        # Progress tracking
-        processed = 0
-        trades_found = 0
-        
-        # Process stocks in batches using thread pool
-        batch_size = 20  # Reduced batch size to avoid rate limits
-        with ThreadPoolExecutor(max_workers=5) as executor:  # Reduced workers
-            for i in range(0, len(stocks), batch_size):
-                batch = stocks[i:i+batch_size]
-                futures = {executor.submit(self.process_stock, symbol): symbol 
-                          for symbol in batch}
-                
-                for future in as_completed(futures):
-                    symbol = futures[future]
-                    try:
-                        future.result()
-                        processed += 1
-                        if processed % 20 == 0:
-                            logger.info(f"Progress: {processed}/{len(stocks)} stocks processed...")
-                    except Exception as e:
-                        logger.error(f"Error processing {symbol}: {e}")
-                
-                # Increased delay between batches to avoid rate limits
-                time.sleep(1)
+        # Fetch: each batch is a single multi-symbol request, paced by the
+        # scheduler to the rate limit
+        with self.phase('fetch'):
+            batches = self.market_data.batches(stocks)
+            if self.scan_backend == 'async':
+                prices = self.fetch_batches_async(batches, len(stocks))
+            else:
+                prices = self.fetch_batches_threaded(batches, len(stocks))
+        
+        self.screen_prices(stocks, prices)
+        
+        elapsed = time.perf_counter() - scan_start
+        SCAN_SECONDS.observe(elapsed)
+        SCAN_SYMBOLS.set(len(stocks), kind='universe')
+        SCAN_SYMBOLS.set(len(prices), kind='priced')
+        self.dump_metrics(scan={
+            'finished': datetime.now().isoformat(),
+            'seconds': elapsed,
+            'phases': self.scan_phases,
+            'symbols': len(stocks),
+            'priced': len(prices),
+        })
         
-        logger.info(f"Market scan completed: {processed} stocks processed")
+        logger.info(f"Market scan completed: {len(prices)} stocks processed in {elapsed:.1f}s "
+                    f"({', '.join(f'{name} {seconds:.2f}s' for name, seconds in self.scan_phases.items())})")
+        api_stats = self.api.stats()
+        logger.info(f"API: {api_stats['calls']} calls, {api_stats['rate_limited']} rate-limited retries, "
+                    f"{api_stats['failures']} failures (limit {api_stats['server_limit'] or 'unknown'}/min)")
         
         # Show stocks close to thresholds
         if self.close_to_threshold:
@@ -348,52 +422,271 @@ class PaperTradingBot:
             for stock in self.close_to_threshold[:10]:  # Show top 10
                 logger.info(f"  {stock['symbol']}: {stock['change_pct']:+.2f}% (${stock['price']:.2f})")
     
-    def get_portfolio_summary(self):
-        """Get current portfolio summary"""
-        cursor = self.conn.cursor()
+    def fetch_batches_threaded(self, batches: List[List[str]], total: int) -> Dict[str, Tuple[float, float]]:
+        """Fetch prices for all batches on a thread pool"""
+        prices = {}
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = {executor.submit(self.fetch_prices, batch): batch
+                      for batch in batches}
+            
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    prices.update(future.result())
+                    logger.info(f"Progress: {len(prices)}/{total} stocks processed...")
+                except Exception as e:
+                    ERRORS.inc(where='fetch_batch')
+                    logger.error(f"Error fetching prices for batch starting at {batch[0]}: {e}")
+        return prices
+    
+    def fetch_batches_async(self, batches: List[List[str]], total: int) -> Dict[str, Tuple[float, float]]:
+        """Fetch prices for all batches concurrently on an event loop"""
+        fetched = 0
+        
+        def on_batch(batch_prices):
+            nonlocal fetched
+            fetched += len(batch_prices)
+            logger.info(f"Progress: {fetched}/{total} stocks processed...")
+        
+        return self.apply_latest_prices(self.async_fetcher.get_latest_prices(batches, on_batch))
+    
+    def screen_prices(self, stocks: List[str], prices: Dict[str, Tuple[float, float]], polled: np.ndarray = None):
+        """Evaluate a scan's prices in one vectorized pass and act on signals
+        
+        Only symbols priced in this scan can signal - the screener still
+        holds earlier prices for the rest. polled, if given, further limits
+        signals to those universe indices (a tiered poll); each symbol then
+        trades at most once per signal_cooldown.
+        """
+        screener = self.screener
+        with self.phase('evaluate'):
+            # The cached universe comes with its symbol -> index map
+            screener.set_universe(stocks, self.universe.index if stocks is self.universe.symbols else None)
+            priced = screener.update_prices(prices)
+            if polled is not None:
+                priced = np.intersect1d(priced, polled)
+            screener.set_positions({s: q for s, (q, _) in self.position_book.open_positions().items()})
+            result = screener.screen(priced)
+            if polled is not None:
+                result.buy = self.off_cooldown(result.buy)
+                result.sell = self.off_cooldown(result.sell)
+        
+        # Record price history
+        with self.phase('persist'):
+            now = datetime.now()
+            rows = [(symbol, now, price, float(result.change_pct[screener.index[symbol]]))
+                    for symbol, (price, _) in prices.items() if symbol in screener.index]
+            self.record_prices(rows)
+        
+        # Track stocks close to thresholds (within 1% of threshold)
+        for i in result.near:
+            self.close_to_threshold.append({
+                'symbol': screener.symbols[i],
+                'price': screener.last_price[i],
+                'change_pct': result.change_pct[i] * 100
+            })
+        
+        # Only the few symbols that fired a signal get per-symbol work
+        SIGNALS.inc(len(result.buy), action='buy')
+        SIGNALS.inc(len(result.sell), action='sell')
+        with self.phase('order'):
+            for i in result.buy:
+                symbol, price, change_pct = screener.symbols[i], screener.last_price[i], result.change_pct[i]
+                logger.info(f"🔵 BUY SIGNAL: {symbol} dropped {change_pct*100:.2f}% to ${price:.2f}")
+                self.execute_trade(symbol, 'buy', float(price), f"Price dropped {change_pct*100:.2f}%")
+            for i in result.sell:
+                symbol, price, change_pct = screener.symbols[i], screener.last_price[i], result.change_pct[i]
+                logger.info(f"🔴 SELL SIGNAL: {symbol} gained {change_pct*100:.2f}% to ${price:.2f}")
+                self.execute_trade(symbol, 'sell', float(price), f"Price increased {change_pct*100:.2f}%")
+        return result
+    
+    def off_cooldown(self, indices: np.ndarray) -> np.ndarray:
+        """The signalled indices whose symbol hasn't signalled within signal_cooldown"""
+        now = time.monotonic()
+        keep = []
+        for i in indices:
+            symbol = self.screener.symbols[i]
+            if now - self.last_signal_check.get(symbol, float('-inf')) >= self.signal_cooldown:
+                self.last_signal_check[symbol] = now
+                keep.append(i)
+        return np.array(keep, dtype=np.intp)
+    
+    def run_tier_tick(self):
+        """Poll the symbols whose tier says they are due, within one tick's API budget"""
+        tick_start = time.perf_counter()
+        self.scan_phases = {}
         
-        # Get all positions
-        cursor.execute('''
-            SELECT symbol, quantity, avg_price 
-            FROM positions 
-            WHERE quantity > 0
-        ''')
-        positions = cursor.fetchall()
+        with self.phase('universe'):
+            stocks = self.get_all_tradable_stocks()
+            self.prev_closes.warm(stocks)
+            index = self.universe.index if stocks is self.universe.symbols else None
+            self.screener.set_universe(stocks, index)
+            self.tiers.set_universe(stocks, self.screener.index)
+        
+        # Leave a fifth of the tick's requests for orders
+        requests = max(1, int(self.api.bucket.rate * self.tier_tick * 0.8))
+        # Scheduled from the tick's start, so a 5s symbol is due again next tick
+        now = time.monotonic()
+        due = self.tiers.due(now, limit=requests * self.market_data.batch_size)
+        if not len(due):
+            return
+        self.close_to_threshold = []
+        
+        with self.phase('fetch'):
+            symbols = self.screener.symbols[due].tolist()
+            batches = self.market_data.batches(symbols)
+            if self.scan_backend == 'async':
+                prices = self.fetch_batches_async(batches, len(symbols))
+            else:
+                prices = self.fetch_batches_threaded(batches, len(symbols))
+        
+        result = self.screen_prices(stocks, prices, polled=due)
+        
+        # Unpriced symbols are re-tiered from their last known price (cold if
+        # they never had one), so a failed batch doesn't hog the next tick
+        # Intervals are attributed to the tier that scheduled them
+        tiers = self.tiers.tier[due]
+        waited = self.tiers.update(due, result.change_pct, self.screener.quantity, now)
+        for tier, name in enumerate(TIER_NAMES):
+            for seconds in waited[(tiers == tier) & ~np.isnan(waited)]:
+                TIER_POLL_INTERVAL.observe(float(seconds), tier=name)
+        for name, count in self.tiers.counts().items():
+            TIER_SYMBOLS.set(count, tier=name)
+        
+        SCAN_SECONDS.observe(time.perf_counter() - tick_start)
+        SCAN_SYMBOLS.set(len(stocks), kind='universe')
+        SCAN_SYMBOLS.set(len(prices), kind='priced')
+    
+    def run_tiered(self, test_mode=False):
+        """Main loop for tiered mode: each tick polls only the symbols that are due
+        
+        Held and near-threshold symbols are polled every few seconds, moving
+        ones about once a minute and flat ones every ten minutes, all within
+        the same request budget as a full scan.
+        """
+        logger.info("Starting Paper Trading Bot in TIERED mode...")
+        last_report = float('-inf')
+        is_open = False
+        
+        try:
+            while True:
+                tick_start = time.monotonic()
+                try:
+                    if tick_start - last_report >= 60:
+                        is_open = test_mode or self.api.get_clock().is_open
+                        if last_report > float('-inf'):
+                            self.writer.flush()
+                            self.dump_metrics(tiers=self.tiers.counts())
+                            summary = self.get_portfolio_summary()
+                            logger.info(f"Tiers: {', '.join(f'{n} {c}' for n, c in self.tiers.counts().items())}, "
+                                        f"Portfolio Value: ${summary['total_value']:.2f}, "
+                                        f"Active Positions: {len(summary['positions'])}")
+                        last_report = tick_start
+                    
+                    if is_open:
+                        self.run_tier_tick()
+                    else:
+                        logger.info("Market is closed. To run anyway, use test mode: --test")
+                except Exception as e:
+                    ERRORS.inc(where='tier_tick')
+                    logger.error(f"Error in tiered loop: {e}")
+                
+                time.sleep(max(0.0, self.tier_tick - (time.monotonic() - tick_start)) if is_open else 60)
+        except KeyboardInterrupt:
+            logger.info("Shutting down...")
+        finally:
+            self.orders.close()
+            self.writer.close()
+            self.tick_store.close()
+    
+    def start_streaming(self) -> List[str]:
+        """Subscribe to live trades for the whole tradable universe"""
+        stocks = self.get_all_tradable_stocks()
+        self.prev_closes.warm(stocks)
+        
+        self.stream = PriceStream(
+            os.getenv('ALPACA_STREAM_URL', 'wss://stream.data.alpaca.markets/v2/iex'),
+            os.getenv('ALPACA_API_KEY'),
+            os.getenv('ALPACA_SECRET_KEY'),
+            on_price=self.on_stream_price
+        )
+        self.stream.start(stocks)
+        return stocks
+    
+    def on_stream_price(self, symbol: str, price: float):
+        """Check a single streamed price update against the thresholds"""
+        self.price_cache.put(symbol, price)
+        
+        prev_close = self.prev_closes.get(symbol)
+        if not prev_close:
+            return
+        change_pct = (price - prev_close) / prev_close
+        if self.buy_threshold < change_pct < self.sell_threshold:
+            return
+        
+        # One big move arrives as many trades - don't turn it into a burst of orders
+        now = time.monotonic()
+        if now - self.last_signal_check.get(symbol, float('-inf')) < self.signal_cooldown:
+            return
+        self.last_signal_check[symbol] = now
+        self.evaluate_stock(symbol, price, change_pct)
+    
+    def record_stream_prices(self) -> int:
+        """Write streamed prices that changed since the last call to price_history"""
+        now = datetime.now()
+        rows = []
+        for symbol, price in self.stream.drain_updates().items():
+            prev_close = self.prev_closes.get(symbol)
+            change_pct = (price - prev_close) / prev_close if prev_close else 0.0
+            rows.append((symbol, now, price, change_pct))
+        
+        self.record_prices(rows)
+        return len(rows)
+    
+    def run_streaming(self):
+        """Main loop for streaming mode: signals are checked as trades arrive"""
+        logger.info("Starting Paper Trading Bot in STREAMING mode...")
+        self.start_streaming()
+        
+        try:
+            while True:
+                time.sleep(60)
+                
+                # New trading day: fetch fresh closes before judging moves
+                if self.prev_closes.roll():
+                    self.prev_closes.warm(self.stream.symbols)
+                
+                recorded = self.record_stream_prices()
+                self.dump_metrics()
+                summary = self.get_portfolio_summary()
+                logger.info(f"Streamed updates for {recorded} stocks, "
+                            f"Portfolio Value: ${summary['total_value']:.2f}, "
+                            f"Active Positions: {len(summary['positions'])}")
+        except KeyboardInterrupt:
+            logger.info("Shutting down...")
+        finally:
+            self.stream.stop()
+            self.record_stream_prices()
+            self.orders.close()
+            self.writer.close()
+            self.tick_store.close()
+    
+    def get_portfolio_summary(self):
+        """Sync positions with the broker and get the current portfolio summary"""
+        summary = self.portfolio.sync()
         
         # Get recent trades
-        cursor.execute('''
-            SELECT symbol, action, quantity, price, timestamp 
-            FROM trades 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        ''')
-        recent_trades = cursor.fetchall()
-        
-        # Calculate portfolio value
-        total_value = 0
-        position_details = []
-        for symbol, quantity, avg_price in positions:
-            current_price = self.get_current_price(symbol)
-            if current_price:
-                value = quantity * current_price
-                total_value += value
-                pnl = (current_price - avg_price) * quantity
-                pnl_pct = (current_price - avg_price) / avg_price * 100
-                position_details.append({
-                    'symbol': symbol,
-                    'quantity': quantity,
-                    'avg_price': avg_price,
-                    'current_price': current_price,
-                    'value': value,
-                    'pnl': pnl,
-                    'pnl_pct': pnl_pct
-                })
+        with self.db_lock:
+            cursor = self.conn.cursor()
+            cursor.execute('''
+                SELECT symbol, action, quantity, price, timestamp 
+                FROM trades 
+                ORDER BY timestamp DESC 
+                LIMIT 10
+            ''')
+            summary['recent_trades'] = cursor.fetchall()
         
-        return {
-            'total_value': total_value,
-            'positions': position_details,
-            'recent_trades': recent_trades
-        }
+        return summary
     
     def run(self, test_mode=False):
         """Main run loop
@@ -420,11 +713,14 @@ class PaperTradingBot:
                     
                     logger.info("Running scan...")
                     self.run_scan()
+                    self.writer.flush()
                     
                     # Show portfolio summary
                     summary = self.get_portfolio_summary()
                     logger.info(f"Portfolio Value: ${summary['total_value']:.2f}")
                     logger.info(f"Active Positions: {len(summary['positions'])}")
+                    if summary['equity'] is not None:
+                        logger.info(f"Account Equity: ${summary['equity']:.2f}")
                     
                     # Wait 5 minutes before next scan
                     time.sleep(120)
@@ -441,6 +737,11 @@ class PaperTradingBot:
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
                 time.sleep(60)  # Wait a minute before retrying
+        
+        # Make sure everything queued during the last scan hits the database
+        self.orders.close()
+        self.writer.close()
+        self.tick_store.close()
 
 if __name__ == "__main__":
     import sys
@@ -448,6 +749,10 @@ if __name__ == "__main__":
     # Check for test mode flag
     test_mode = '--test' in sys.argv
     test_thresholds = '--test-thresholds' in sys.argv
+    stream_mode = '--stream' in sys.argv
+    scan_backend = 'async' if '--async' in sys.argv else 'threads'
+    refresh_universe = '--refresh-universe' in sys.argv
+    tiered_mode = '--tiered' in sys.argv
     
     # Show help if requested
     if '--help' in sys.argv:
@@ -455,14 +760,28 @@ if __name__ == "__main__":
 Paper Trading Bot - Options:
   --test             Run even when market is closed
   --test-thresholds  Use lower thresholds (±2% instead of ±5%) for testing
+  --stream           React to live trades over the websocket instead of polling
+  --async            Fetch scan prices with asyncio instead of a thread pool
+  --refresh-universe Re-fetch the tradable stock list now instead of using today's cached one
+  --tiered           Poll held and near-threshold stocks every few seconds, quiet ones rarely
   --help            Show this help message
   
 Examples:
   python paper_trading_bot.py                    # Normal mode (market hours only, ±5%)
   python paper_trading_bot.py --test             # Test mode (any time, ±5%)
   python paper_trading_bot.py --test --test-thresholds  # Test with ±2% thresholds
+  python paper_trading_bot.py --stream           # Streaming mode
+  python paper_trading_bot.py --async            # Polling with the asyncio scan backend
+  python paper_trading_bot.py --tiered --test    # Tiered polling, any time
         """)
         sys.exit(0)
     
-    bot = PaperTradingBot(test_thresholds=test_thresholds)
-    bot.run(test_mode=test_mode)
\ No newline at end of file
+    bot = PaperTradingBot(test_thresholds=test_thresholds, scan_backend=scan_backend)
+    if refresh_universe:
+        bot.universe.refresh()
+    if stream_mode:
+        bot.run_streaming()
+    elif tiered_mode:
+        bot.run_tiered(test_mode=test_mode)
+    else:
+        bot.run(test_mode=test_mode)
\ No newline at end of file
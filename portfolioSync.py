@@ -0,0 +1,143 @@
+import logging
+from datetime import datetime
+from typing import Dict, Tuple
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SYNCS = registry.counter('portfolio_syncs_total', 'Broker portfolio syncs by outcome (ok, error)')
+ADJUSTED = registry.counter('portfolio_positions_adjusted_total', 'Local positions corrected to match the broker')
+EQUITY = registry.gauge('portfolio_equity', 'Account equity at the last sync')
+
+SNAPSHOT_INSERT = '''
+    INSERT INTO portfolio_snapshots (timestamp, equity, cash, buying_power, market_value,
+                                     position_count, adjusted_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _float(value) -> float:
+    return float(value) if value not in (None, '') else None
+
+
+class PortfolioSync:
+    """Brings the local position book in line with the broker, in bulk
+
+    One sync costs a fixed number of requests however many positions are
+    held: all broker positions (with their current prices) in one call,
+    the account in another, and one batched latest-trade request for any
+    local position that neither the broker nor the PriceCache (if given)
+    has a price for. Broker prices are cached too. Positions whose
+    quantity differs from the broker's are overwritten with the broker's,
+    in the same transaction as the sync's portfolio_snapshots row.
+
+    Symbols with an order still in flight are left alone: the broker may
+    already hold the fill that the order pipeline hasn't recorded yet.
+    """
+
+    def __init__(self, api, market_data, book, orders=None, prices=None, tolerance: float = 1e-6):
+        self.api = api
+        self.market_data = market_data
+        self.book = book
+        self.orders = orders
+        self.prices = prices
+        self.tolerance = tolerance  # shares
+
+    def fetch(self) -> Tuple[Dict[str, Tuple[float, float, float]], object]:
+        """Broker {symbol: (quantity, avg_entry_price, current_price)} and the account"""
+        positions = {
+            position.symbol: (float(position.qty), _float(position.avg_entry_price),
+                              _float(position.current_price))
+            for position in self.api.list_positions()
+        }
+        return positions, self.api.get_account()
+
+    def in_flight(self, symbol: str) -> bool:
+        return bool(self.orders and (self.orders.pending_quantity(symbol, 'buy') or
+                                     self.orders.pending_quantity(symbol, 'sell')))
+
+    @staticmethod
+    def value(positions: Dict[str, Tuple[float, float]], prices: Dict[str, float]) -> Tuple[list, float]:
+        """Per-position details and total market value of {symbol: (quantity, avg_price)}
+
+        Positions without a price are left out.
+        """
+        details = []
+        market_value = 0.0
+        for symbol, (quantity, avg_price) in positions.items():
+            current_price = prices.get(symbol)
+            if not current_price:
+                continue
+            value = quantity * current_price
+            market_value += value
+            details.append({
+                'symbol': symbol,
+                'quantity': quantity,
+                'avg_price': avg_price,
+                'current_price': current_price,
+                'value': value,
+                'pnl': (current_price - avg_price) * quantity,
+                'pnl_pct': (current_price - avg_price) / avg_price * 100 if avg_price else 0.0,
+            })
+        return details, market_value
+
+    def sync(self) -> dict:
+        """Reconcile with the broker and return the portfolio summary
+
+        If the broker can't be reached the local book is left as it is and
+        valued at batched latest-trade prices.
+        """
+        held = self.book.open_positions()
+        try:
+            broker, account = self.fetch()
+            SYNCS.inc(outcome='ok')
+        except Exception as e:
+            SYNCS.inc(outcome='error')
+            logger.warning(f"Portfolio sync failed, valuing local positions only: {e}")
+            broker, account = None, None
+
+        adjusted = {}
+        if broker is not None:
+            for symbol in held.keys() | broker.keys():
+                quantity, avg_price = held.get(symbol, (0.0, None))
+                broker_quantity, broker_avg_price, _ = broker.get(symbol, (0.0, None, None))
+                if abs(quantity - broker_quantity) <= self.tolerance or self.in_flight(symbol):
+                    continue
+                logger.warning(f"Position drift on {symbol}: local {quantity:.6f}, broker {broker_quantity:.6f} "
+                               f"- taking the broker's")
+                adjusted[symbol] = (broker_quantity, broker_avg_price or avg_price or 0.0)
+        positions = {**held, **adjusted}
+        positions = {symbol: position for symbol, position in positions.items() if position[0] > 0}
+
+        prices = {symbol: price for symbol, (_, _, price) in (broker or {}).items() if price}
+        if self.prices is not None:
+            self.prices.put_many(prices)
+            prices.update(self.prices.get_many(symbol for symbol in positions if symbol not in prices))
+        missing = [symbol for symbol in positions if symbol not in prices]
+        if missing:
+            fetched = self.market_data.get_latest_prices(missing)
+            if self.prices is not None:
+                self.prices.put_many(fetched)
+            prices.update(fetched)
+
+        details, market_value = self.value(positions, prices)
+
+        equity = _float(account.equity) if account is not None else None
+        cash = _float(account.cash) if account is not None else None
+        buying_power = _float(account.buying_power) if account is not None else None
+        snapshot = (SNAPSHOT_INSERT, (datetime.now(), equity, cash, buying_power, market_value,
+                                      len(positions), len(adjusted)))
+        self.book.reconcile(adjusted, extra=[snapshot] if broker is not None else [])
+        ADJUSTED.inc(len(adjusted))
+        if equity is not None:
+            EQUITY.set(equity)
+
+        return {
+            'total_value': market_value,
+            'positions': details,
+            'equity': equity,
+            'cash': cash,
+            'buying_power': buying_power,
+            'adjusted': len(adjusted),
+        }
@@ -0,0 +1,117 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from tradeStats import daily_stats_statements
+
+logger = logging.getLogger(__name__)
+
+
+TRADE_INSERT = '''
+    INSERT INTO trades (symbol, timestamp, action, quantity, price, amount, reason)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
+POSITION_UPSERT = '''
+    INSERT OR REPLACE INTO positions (symbol, quantity, avg_price, last_update)
+    VALUES (?, ?, ?, ?)
+'''
+
+
+class PositionBook:
+    """Thread-safe in-memory copy of the positions table
+
+    Loaded once at startup; lookups never touch the database. Trades are
+    written behind: the book changes immediately, and the trade row and
+    updated position row are queued on the BatchWriter as one group, with
+    the day's aggregate updates, so they always commit together.
+
+    The connection is shared with the bot, so every use of it goes through
+    the same lock.
+
+    With a ChangeFeed, each trade also publishes 'trade' and 'position'
+    events in that same group.
+    """
+
+    def __init__(self, conn, lock: threading.RLock, writer, feed=None):
+        self.conn = conn
+        self.lock = lock
+        self.writer = writer
+        self.feed = feed
+        self.positions = {}  # symbol -> (quantity, avg_price)
+        self.load()
+
+    def load(self):
+        """(Re)load all positions from the database"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT symbol, quantity, avg_price FROM positions')
+            self.positions = {symbol: (quantity, avg_price) for symbol, quantity, avg_price in cursor.fetchall()}
+        logger.info(f"Position book loaded: {len(self.open_positions())} open positions")
+
+    def get(self, symbol: str) -> Tuple[float, float]:
+        """(quantity, avg_price) for symbol, or None if never traded"""
+        return self.positions.get(symbol)
+
+    def get_quantity(self, symbol: str) -> float:
+        """Quantity held for symbol (0 if none)"""
+        position = self.positions.get(symbol)
+        return position[0] if position else 0.0
+
+    def open_positions(self) -> Dict[str, Tuple[float, float]]:
+        """{symbol: (quantity, avg_price)} for positions with quantity > 0"""
+        return {symbol: position for symbol, position in list(self.positions.items()) if position[0] > 0}
+
+    def record_trade(self, symbol: str, action: str, quantity: float, price: float,
+                     amount: float, reason: str, timestamp: datetime = None,
+                     extra: List[Tuple[str, tuple]] = ()):
+        """Record a trade and apply it to the position
+
+        extra statements (e.g. the order that produced the trade) are
+        committed in the same group.
+        """
+        timestamp = timestamp or datetime.now()
+        with self.lock:
+            held, avg_price = self.positions.get(symbol, (0.0, price))
+            if action == 'buy':
+                held, avg_price = held + quantity, price
+            else:
+                held = held - quantity
+            self.positions[symbol] = (held, avg_price)
+
+            statements = [
+                (TRADE_INSERT, (symbol, timestamp, action, quantity, price, amount, reason)),
+                (POSITION_UPSERT, (symbol, held, avg_price, timestamp)),
+                *daily_stats_statements(symbol, timestamp, action, amount),
+                *extra,
+            ]
+            if self.feed:
+                statements.append(self.feed.entry('trade', {
+                    'symbol': symbol, 'timestamp': str(timestamp), 'action': action,
+                    'quantity': quantity, 'price': price, 'amount': amount, 'reason': reason,
+                }, timestamp))
+                statements.append(self.feed.entry('position', {
+                    'symbol': symbol, 'quantity': held, 'avg_price': avg_price,
+                }, timestamp))
+            self.writer.write_group(statements)
+
+    def reconcile(self, positions: Dict[str, Tuple[float, float]], extra: List[Tuple[str, tuple]] = ()):
+        """Overwrite positions with {symbol: (quantity, avg_price)} from the broker
+
+        Position rows, feed events and extra statements are committed as one
+        group.
+        """
+        timestamp = datetime.now()
+        with self.lock:
+            statements = []
+            for symbol, (quantity, avg_price) in positions.items():
+                self.positions[symbol] = (quantity, avg_price)
+                statements.append((POSITION_UPSERT, (symbol, quantity, avg_price, timestamp)))
+                if self.feed:
+                    statements.append(self.feed.entry('position', {
+                        'symbol': symbol, 'quantity': quantity, 'avg_price': avg_price,
+                    }, timestamp))
+            statements.extend(extra)
+            if statements:
+                self.writer.write_group(statements)
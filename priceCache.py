@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = registry.counter('price_cache_requests_total', 'Price cache lookups by cache and result (hit, miss)')
+EVICTIONS = registry.counter('price_cache_evictions_total', 'Prices dropped to stay under the size bound, by cache')
+ENTRIES = registry.gauge('price_cache_entries', 'Prices held, by cache')
+
+
+class PriceCache:
+    """Thread-safe, size-bounded price cache with a TTL
+
+    Each symbol owns a slot in preallocated arrays of price, update time
+    and last use (all time.monotonic()); a plain dict maps symbol -> slot.
+    Entries older than ttl seconds read as misses. When a new symbol
+    finds every slot taken, the least recently used sixteenth of the
+    cache is evicted in one vectorized pass, so eviction costs nothing
+    per lookup.
+    """
+
+    def __init__(self, max_entries: int = 16384, ttl: float = 60.0, name: str = 'prices'):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name  # metrics label
+        self.evict_batch = max(1, max_entries // 16)
+        self.lock = threading.Lock()
+
+        self.index = {}                       # symbol -> slot
+        self.symbols = [None] * max_entries   # slot -> symbol
+        self.free = list(range(max_entries - 1, -1, -1))
+        self.price = np.zeros(max_entries)
+        self.updated = np.zeros(max_entries)
+        self.used = np.full(max_entries, np.inf)  # free slots sort last
+
+        self.hit_metric = LOOKUPS.labels(cache=name, result='hit')
+        self.miss_metric = LOOKUPS.labels(cache=name, result='miss')
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def get(self, symbol: str, max_age: float = None) -> float:
+        """The cached price if it is fresher than max_age (default: ttl) seconds, else None"""
+        max_age = self.ttl if max_age is None else max_age
+        now = time.monotonic()
+        with self.lock:
+            slot = self.index.get(symbol)
+            if slot is not None and now - self.updated[slot] < max_age:
+                self.used[slot] = now
+                self.hits += 1
+                price = float(self.price[slot])
+            else:
+                self.expired += slot is not None
+                self.misses += 1
+                price = None
+        (self.hit_metric if price is not None else self.miss_metric).inc()
+        return price
+
+    def get_many(self, symbols: Iterable[str], max_age: float = None) -> Dict[str, float]:
+        """{symbol: price} for the symbols with a fresh price"""
+        max_age = self.ttl if max_age is None else max_age
+        now = time.monotonic()
+        symbols = list(symbols)
+        with self.lock:
+            index = self.index
+            known = [symbol for symbol in symbols if symbol in index]
+            slots = np.fromiter((index[symbol] for symbol in known), dtype=np.intp, count=len(known))
+            fresh = now - self.updated[slots] < max_age
+            self.used[slots[fresh]] = now
+            prices = dict(zip((symbol for symbol, ok in zip(known, fresh.tolist()) if ok),
+                              self.price[slots[fresh]].tolist()))
+            self.hits += len(prices)
+            self.misses += len(symbols) - len(prices)
+            self.expired += len(known) - len(prices)
+        self.hit_metric.inc(len(prices))
+        self.miss_metric.inc(len(symbols) - len(prices))
+        return prices
+
+    def put(self, symbol: str, price: float):
+        self.put_many({symbol: price})
+
+    def put_many(self, prices: Dict[str, float]):
+        """Cache {symbol: price}, all stamped now"""
+        if not prices:
+            return
+        now = time.monotonic()
+        with self.lock:
+            index = self.index
+            known = [(index[symbol], price) for symbol, price in prices.items() if symbol in index]
+            new = [(symbol, price) for symbol, price in prices.items() if symbol not in index]
+            if known:
+                slots, values = zip(*known)
+                self.price[list(slots)] = values
+                self.updated[list(slots)] = now
+                self.used[list(slots)] = now
+
+            new = new[-self.max_entries:]
+            evicted = self._evict(len(new) - len(self.free)) if len(new) > len(self.free) else 0
+            if new:
+                slots = [self.free.pop() for _ in new]
+                for (symbol, _), slot in zip(new, slots):
+                    index[symbol] = slot
+                    self.symbols[slot] = symbol
+                self.price[slots] = [price for _, price in new]
+                self.updated[slots] = now
+                self.used[slots] = now
+            size = len(index)
+        if evicted:
+            EVICTIONS.inc(evicted, cache=self.name)
+        ENTRIES.set(size, cache=self.name)
+
+    def _evict(self, needed: int) -> int:
+        """Free at least needed slots, least recently used first (lock held)"""
+        count = min(len(self.index), max(needed, self.evict_batch))
+        victims = np.argpartition(self.used, count - 1)[:count]
+        for slot in victims.tolist():
+            del self.index[self.symbols[slot]]
+            self.symbols[slot] = None
+            self.free.append(slot)
+        self.used[victims] = np.inf
+        self.evictions += count
+        return count
+
+    def clear(self):
+        with self.lock:
+            self.index.clear()
+            self.symbols = [None] * self.max_entries
+            self.free = list(range(self.max_entries - 1, -1, -1))
+            self.used[:] = np.inf
+        ENTRIES.set(0, cache=self.name)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {'entries': len(self.index), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'expired': self.expired, 'evictions': self.evictions}
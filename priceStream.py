@@ -0,0 +1,120 @@
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+import websocket
+
+logger = logging.getLogger(__name__)
+
+
+class PriceStream:
+    """Alpaca market data websocket client that keeps a last-price table
+
+    Subscribes to trades (or minute bars) for a list of symbols and calls
+    on_price(symbol, price) from the websocket thread for every update.
+    Reconnects and resubscribes if the connection drops.
+    """
+
+    # Symbols per subscribe message, keeps individual frames small
+    SUBSCRIBE_CHUNK = 1000
+
+    def __init__(self, url: str, key_id: str, secret_key: str,
+                 on_price: Callable[[str, float], None] = None,
+                 channel: str = 'trades', reconnect_delay: float = 5):
+        self.url = url
+        self.key_id = key_id
+        self.secret_key = secret_key
+        self.on_price = on_price
+        self.channel = channel  # 'trades' or 'bars'
+        self.reconnect_delay = reconnect_delay
+
+        self.lock = threading.Lock()
+        self.last_prices = {}
+        self.updated_at = {}
+        # Symbols updated since the last drain_updates() call
+        self.changed = set()
+        self.messages_received = 0
+
+        self.symbols = []
+        self.ws = None
+        self.thread = None
+        self.running = False
+        self.subscribed = threading.Event()
+
+    def start(self, symbols: List[str]):
+        """Connect and subscribe in a background thread"""
+        self.symbols = list(symbols)
+        self.running = True
+        self.thread = threading.Thread(target=self._run_forever, name='price-stream', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Close the connection and stop reconnecting"""
+        self.running = False
+        if self.ws is not None:
+            self.ws.close()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def get_price(self, symbol: str) -> float:
+        """Last streamed price for symbol, or None"""
+        return self.last_prices.get(symbol)
+
+    def drain_updates(self) -> Dict[str, float]:
+        """Return {symbol: price} for symbols updated since the last call"""
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            return {symbol: self.last_prices[symbol] for symbol in changed}
+
+    def _run_forever(self):
+        while self.running:
+            self.subscribed.clear()
+            self.ws = websocket.WebSocketApp(
+                self.url,
+                on_message=self._on_message,
+                on_error=self._on_error,
+            )
+            self.ws.run_forever(ping_interval=30, ping_timeout=10)
+            if self.running:
+                logger.warning(f"Price stream disconnected, reconnecting in {self.reconnect_delay}s")
+                time.sleep(self.reconnect_delay)
+
+    def _on_error(self, ws, error):
+        logger.error(f"Price stream error: {error}")
+
+    def _on_message(self, ws, message):
+        for msg in json.loads(message):
+            kind = msg.get('T')
+            if kind == 't':
+                self._update(msg['S'], msg['p'])
+            elif kind == 'b':
+                self._update(msg['S'], msg['c'])
+            elif kind == 'success' and msg.get('msg') == 'connected':
+                ws.send(json.dumps({'action': 'auth', 'key': self.key_id, 'secret': self.secret_key}))
+            elif kind == 'success' and msg.get('msg') == 'authenticated':
+                self._subscribe(ws)
+            elif kind == 'subscription':
+                self.subscribed.set()
+            elif kind == 'error':
+                logger.error(f"Price stream error {msg.get('code')}: {msg.get('msg')}")
+
+    def _subscribe(self, ws):
+        logger.info(f"Subscribing to {self.channel} for {len(self.symbols)} symbols")
+        for i in range(0, len(self.symbols), self.SUBSCRIBE_CHUNK):
+            chunk = self.symbols[i:i + self.SUBSCRIBE_CHUNK]
+            ws.send(json.dumps({'action': 'subscribe', self.channel: chunk}))
+
+    def _update(self, symbol: str, price: float):
+        with self.lock:
+            self.last_prices[symbol] = price
+            self.updated_at[symbol] = time.monotonic()
+            self.changed.add(symbol)
+            self.messages_received += 1
+
+        if self.on_price is not None:
+            try:
+                self.on_price(symbol, price)
+            except Exception as e:
+                logger.error(f"Error handling streamed price for {symbol}: {e}")
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import HTTPError
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = registry.counter('alpaca_requests_total', 'Alpaca REST requests by call and outcome (ok, retry, error)')
+REQUEST_SECONDS = registry.histogram('alpaca_request_seconds', 'Alpaca REST request latency by call')
+THROTTLE_SECONDS = registry.histogram('alpaca_throttle_seconds', 'Time spent waiting for a rate-limit token')
+RATE_LIMITED = registry.counter('alpaca_rate_limited_total', 'HTTP 429 responses by call')
+
+# Status codes worth retrying: rate limited, or the gateway timed out
+RETRY_STATUS_CODES = (429, 504)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute"""
+
+    def __init__(self, rate_per_minute: float, burst: float = None):
+        self.lock = threading.Lock()
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1.0, rate_per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # No tokens are handed out before this (monotonic) time
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available and return 0, else return seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return max(self.blocked_until - now, (tokens - self.tokens) / self.rate)
+
+    def acquire(self, tokens: float = 1):
+        """Block until tokens are available, then take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """acquire() for coroutines - waits without blocking the event loop"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate_per_minute: float):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = rate_per_minute / 60.0
+            self.capacity = max(1.0, rate_per_minute / 10)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def limit_tokens(self, tokens: float):
+        """Never hold more tokens than the server says we have left"""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, tokens)
+
+    def block_for(self, seconds: float):
+        """Hand out nothing for the next `seconds`"""
+        with self.lock:
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RequestScheduler:
+    """Routes every Alpaca REST call through a shared token bucket
+
+    Wraps an alpaca_trade_api.REST instance and exposes the same methods.
+    The bucket starts at rate_per_minute and follows the X-RateLimit-*
+    headers on each response. Rate-limited (429) and gateway-timeout
+    calls are retried with jittered exponential backoff instead of being
+    dropped. Any number of threads can call through it; they run
+    concurrently as far as the budget allows.
+    """
+
+    def __init__(self, api, rate_per_minute: float = 200, max_retries: int = 5,
+                 base_backoff: float = 0.5, max_backoff: float = 30, max_connections: int = 32):
+        self.api = api
+        self.bucket = TokenBucket(rate_per_minute)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        # Stats
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.server_limit = None
+        self.server_remaining = None
+
+        # Take over retries from alpaca_trade_api, which sleeps a fixed 3s
+        # and surfaces exhausted retries only as a "sleep ..." log line
+        api._retry = 0
+        api._session.hooks['response'].append(self._observe_response)
+
+        # Scan workers and order submitters share the session; requests'
+        # default pool of 10 would drop and reopen the extra connections
+        adapter = HTTPAdapter(pool_maxsize=max_connections)
+        api._session.mount('https://', adapter)
+        api._session.mount('http://', adapter)
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if not callable(attr):
+            return attr
+
+        def scheduled(*args, **kwargs):
+            return self.call(attr, *args, **kwargs)
+        scheduled.__name__ = name
+        return scheduled
+
+    def call(self, fn, *args, **kwargs):
+        """Call fn once a token is available, retrying rate-limited attempts"""
+        name = getattr(fn, '__name__', 'request')
+        attempt = 0
+        while True:
+            with THROTTLE_SECONDS.time(call=name):
+                self.bucket.acquire()
+            self.record_call()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+                self.observe_request(name, time.perf_counter() - start, 'ok')
+                return result
+            except Exception as e:
+                status = _status_code(e)
+                if status not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    self.observe_request(name, time.perf_counter() - start, 'error')
+                    self.record_call(failed=True)
+                    raise
+
+                self.observe_request(name, time.perf_counter() - start, 'retry')
+                attempt += 1
+                backoff = self.retry_backoff(name, status, attempt)
+                if status != 429:
+                    time.sleep(backoff)
+
+    @staticmethod
+    def observe_request(name: str, seconds: float, outcome: str):
+        """Record one request's latency and outcome in the metrics registry"""
+        REQUESTS.inc(call=name, outcome=outcome)
+        REQUEST_SECONDS.observe(seconds, call=name)
+
+    def record_call(self, failed: bool = False):
+        """Count a request, or a request that failed for good"""
+        with self.lock:
+            if failed:
+                self.failures += 1
+            else:
+                self.calls += 1
+
+    def retry_backoff(self, name: str, status: int, attempt: int) -> float:
+        """Count a retry and return its jittered backoff
+
+        For a 429 the whole bucket is paused, so every caller backs off,
+        not just this one.
+        """
+        with self.lock:
+            self.retries += 1
+            if status == 429:
+                self.rate_limited += 1
+        if status == 429:
+            RATE_LIMITED.inc(call=name)
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+        backoff *= random.uniform(0.5, 1.5)
+        logger.debug(f"{name} got HTTP {status}, retry {attempt}/{self.max_retries} in {backoff:.2f}s")
+        if status == 429:
+            self.bucket.block_for(backoff)
+        return backoff
+
+    def _observe_response(self, response, *args, **kwargs):
+        self.observe_headers(response.headers)
+
+    def observe_headers(self, headers):
+        """Adapt the bucket to the server's rate-limit headers"""
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = float(headers.get('X-RateLimit-Reset', 0))
+        except (KeyError, ValueError):
+            return
+
+        if limit != self.server_limit:
+            logger.info(f"Alpaca rate limit is {limit} requests/minute")
+            self.bucket.set_rate(limit)
+        self.server_limit = limit
+        self.server_remaining = remaining
+
+        self.bucket.limit_tokens(remaining)
+        if remaining == 0 and reset:
+            self.bucket.block_for(max(0.0, reset - time.time()))
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'rate_limited': self.rate_limited,
+                'failures': self.failures,
+                'server_limit': self.server_limit,
+                'server_remaining': self.server_remaining,
+            }
+
+
+def _status_code(error):
+    """HTTP status of an alpaca APIError or requests HTTPError, if any"""
+    status = getattr(error, 'status_code', None)
+    if status is None and isinstance(error, HTTPError) and error.response is not None:
+        status = error.response.status_code
+    return status
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Replay recorded price_history through the bot's real trading logic.
+Rows are streamed in timestamp order into PaperTradingBot.should_buy /
+should_sell / execute_trade, with orders filled by a simulated broker at
+the recorded price - no network, and memory stays flat however long the
+history is.
+
+Usage:
+  python replay.py                                  # Replay paper_trading.db
+  python replay.py other.db                         # Replay another database
+  python replay.py history.csv.gz                   # Replay an exported file
+  python replay.py --export history.csv.gz          # Export price_history to a file
+  python replay.py --test-thresholds                # ±2% instead of ±5%
+  python replay.py --since "2024-01-01" --until "2024-04-01"   # Replay a date range
+  python replay.py --keep replay.db                 # Keep the replay's trades/positions
+"""
+
+import csv
+import gzip
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Iterable, Iterator, List, Tuple
+
+from dbSchema import DEFAULT_DB_PATH, connect_readonly
+
+logger = logging.getLogger(__name__)
+
+Row = Tuple[str, str, float, float]  # (symbol, timestamp, price, daily_change_pct)
+
+EXPORT_COLUMNS = ['symbol', 'timestamp', 'price', 'daily_change_pct']
+
+
+def iter_db_rows(db_path: str, since: str = None, until: str = None,
+                 chunk_size: int = 10000) -> Iterator[Row]:
+    """Stream price_history rows in timestamp order, chunk_size at a time
+
+    The database is opened read-only: replaying or exporting it never
+    migrates it or changes its journal mode.
+    """
+    conn = connect_readonly(db_path)
+    try:
+        query = 'SELECT symbol, timestamp, price, daily_change_pct FROM price_history'
+        conditions, params = [], []
+        if since:
+            conditions.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            conditions.append('timestamp < ?')
+            params.append(until)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        cursor = conn.execute(query + ' ORDER BY timestamp', params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def _open_text(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', newline='')
+    return open(path, mode, newline='')
+
+
+def iter_file_rows(path: str, since: str = None, until: str = None) -> Iterator[Row]:
+    """Stream rows from a CSV written by export_price_history (optionally gzipped)"""
+    with _open_text(path, 'r') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # header
+        for symbol, timestamp, price, change_pct in reader:
+            if (since and timestamp < since) or (until and timestamp >= until):
+                continue
+            yield symbol, timestamp, float(price), float(change_pct) if change_pct else None
+
+
+def export_price_history(db_path: str, out_path: str) -> int:
+    """Write price_history to a CSV file in timestamp order; returns the row count"""
+    count = 0
+    with _open_text(out_path, 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in iter_db_rows(db_path):
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def iter_scans(rows: Iterable[Row]) -> Iterator[List[Row]]:
+    """Group a timestamp-ordered row stream into scans
+
+    A scan observes each symbol at most once, so a new scan starts as soon
+    as a symbol repeats.
+    """
+    scan, seen = [], set()
+    for row in rows:
+        if row[0] in seen:
+            yield scan
+            scan, seen = [], set()
+        scan.append(row)
+        seen.add(row[0])
+    if scan:
+        yield scan
+
+
+class SimulatedBroker:
+    """Stands in for the Alpaca API: fills every order at the replay price"""
+
+    def __init__(self):
+        self.prices = {}        # symbol -> last replayed price
+        self.positions = {}     # symbol -> shares held
+        self.cash = 0.0
+        self.orders = 0
+        self.turnover = 0.0
+
+    def submit_order(self, symbol, qty, side, type='market', time_in_force='day', **kwargs):
+        price = self.prices[symbol]
+        held = self.positions.get(symbol, 0.0)
+        if side == 'buy':
+            self.positions[symbol] = held + qty
+            self.cash -= qty * price
+        else:
+            self.positions[symbol] = held - qty
+            self.cash += qty * price
+        self.orders += 1
+        self.turnover += qty * price
+        return SimpleNamespace(id=str(uuid.uuid4()), symbol=symbol, qty=qty, side=side, type=type,
+                               status='filled', filled_qty=qty, filled_avg_price=price)
+
+    def get_latest_trade(self, symbol):
+        """The last replayed price as a trade, so price lookups that miss the cache stay offline"""
+        price = self.prices.get(symbol)
+        return SimpleNamespace(symbol=symbol, price=price) if price is not None else None
+
+    def get_latest_trades(self, symbols):
+        return {symbol: trade for symbol, trade in ((s, self.get_latest_trade(s)) for s in symbols) if trade}
+
+    def market_value(self) -> float:
+        return sum(qty * self.prices[symbol] for symbol, qty in self.positions.items())
+
+
+def run_replay(rows: Iterable[Row], test_thresholds=False, db_path: str = None,
+               progress_every: int = 100) -> dict:
+    """Drive a PaperTradingBot with recorded rows and a SimulatedBroker
+
+    The bot's own database (trades and positions from the replay) goes to
+    db_path, or a scratch file that is deleted afterwards.
+    """
+    os.environ.setdefault('ALPACA_API_KEY', 'replay-key')
+    os.environ.setdefault('ALPACA_SECRET_KEY', 'replay-secret')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from orderPipeline import OrderPipeline
+    from paperTradingBot import PaperTradingBot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bot = PaperTradingBot(test_thresholds=test_thresholds,
+                              db_path=db_path or os.path.join(tmp, 'replay.db'))
+        broker = SimulatedBroker()
+        bot.api = broker
+        bot.market_data.api = broker
+        # Each fill is recorded before the next row is replayed
+        bot.orders.close()
+        bot.orders = OrderPipeline(broker, bot.position_book, bot.conn, bot.db_lock, bot.writer, workers=0)
+        # Order and signal lines for every replayed trade would dominate the run
+        logging.getLogger('paperTradingBot').setLevel(logging.WARNING)
+        logging.getLogger('orderPipeline').setLevel(logging.WARNING)
+
+        try:
+            scans = observations = 0
+            first_timestamp = last_timestamp = None
+            start = time.perf_counter()
+            for scan in iter_scans(rows):
+                # Prices count as fresh for the whole scan, so any lookup the bot
+                # makes mid-scan reads them from the cache
+                bot.price_cache.put_many({symbol: price for symbol, _, price, _ in scan})
+                for symbol, timestamp, price, change_pct in scan:
+                    broker.prices[symbol] = price
+                    if change_pct is None:
+                        continue
+                    if bot.should_buy(symbol, change_pct, price):
+                        bot.execute_trade(symbol, 'buy', price, f"Price dropped {change_pct*100:.2f}%",
+                                          timestamp=timestamp)
+                    elif bot.should_sell(symbol, change_pct):
+                        bot.execute_trade(symbol, 'sell', price, f"Price increased {change_pct*100:.2f}%",
+                                          timestamp=timestamp)
+
+                scans += 1
+                observations += len(scan)
+                first_timestamp = first_timestamp or scan[0][1]
+                last_timestamp = scan[-1][1]
+                if scans % progress_every == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Replayed {scans:,} scans ({observations:,} prices) up to {last_timestamp} "
+                                f"- {scans / elapsed:,.1f} scans/s")
+
+            elapsed = time.perf_counter() - start
+        finally:
+            bot.orders.close()
+            bot.writer.close()
+            bot.tick_store.close()
+            bot.conn.close()
+
+    market_value = broker.market_value()
+    return {
+        'scans': scans,
+        'observations': observations,
+        'elapsed': elapsed,
+        'scans_per_second': scans / elapsed if elapsed else 0.0,
+        'first_timestamp': first_timestamp,
+        'last_timestamp': last_timestamp,
+        'orders': broker.orders,
+        'turnover': broker.turnover,
+        'market_value': market_value,
+        'pnl': broker.cash + market_value,
+        'open_positions': sum(1 for qty in broker.positions.values() if qty > 1e-9),
+    }
+
+
+def _speedup(summary) -> float:
+    """How much faster than real time the replay ran"""
+    try:
+        span = (datetime.fromisoformat(summary['last_timestamp']) -
+                datetime.fromisoformat(summary['first_timestamp'])).total_seconds()
+    except (TypeError, ValueError):
+        return 0.0
+    return span / summary['elapsed'] if summary['elapsed'] else 0.0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    def option(name):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else None
+
+    option_values = {option(name) for name in ('--export', '--since', '--until', '--keep')}
+    args = [a for a in sys.argv[1:] if not a.startswith('--') and a not in option_values]
+    source = args[0] if args else DEFAULT_DB_PATH
+    since, until = option('--since'), option('--until')
+
+    if '--export' in sys.argv:
+        out_path = option('--export')
+        count = export_price_history(source, out_path)
+        logger.info(f"Exported {count:,} price_history rows to {out_path}")
+        sys.exit(0)
+
+    if not os.path.exists(source):
+        logger.error(f"{source} not found")
+        sys.exit(1)
+
+    if source.endswith(('.csv', '.csv.gz')):
+        rows = iter_file_rows(source, since, until)
+    else:
+        rows = iter_db_rows(source, since, until)
+
+    summary = run_replay(rows, test_thresholds='--test-thresholds' in sys.argv, db_path=option('--keep'))
+
+    logger.info("=" * 60)
+    logger.info(f"Replayed {summary['scans']:,} scans ({summary['observations']:,} prices) "
+                f"from {summary['first_timestamp']} to {summary['last_timestamp']}")
+    logger.info(f"Speed:          {summary['scans_per_second']:,.1f} scans/s, "
+                f"{summary['observations'] / summary['elapsed'] if summary['elapsed'] else 0:,.0f} prices/s, "
+                f"{_speedup(summary):,.0f}x real time")
+    logger.info(f"Orders:         {summary['orders']:,} (turnover ${summary['turnover']:,.2f})")
+    logger.info(f"Open positions: {summary['open_positions']:,} worth ${summary['market_value']:,.2f}")
+    logger.info(f"P&L:            ${summary['pnl']:,.2f}")
@@ -0,0 +1,124 @@
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenResult:
+    """Outcome of one screening pass, as indices into the screener's universe"""
+
+    def __init__(self, change_pct, buy, sell, near):
+        self.change_pct = change_pct
+        self.buy = buy
+        self.sell = sell
+        self.near = near
+
+
+class ThresholdScreener:
+    """Vectorized buy/sell threshold checks over the whole universe
+
+    Holds the universe as aligned arrays (symbol, last price, previous
+    close, position quantity) so each scan is a single NumPy pass. Only
+    the symbols that fire a signal need any per-symbol work afterwards.
+    """
+
+    def __init__(self, buy_threshold: float, sell_threshold: float,
+                 max_position_value: float = 100, near_band: float = 0.01):
+        self.buy_threshold = buy_threshold
+        self.sell_threshold = sell_threshold
+        self.max_position_value = max_position_value  # $ cap per stock
+        self.near_band = near_band  # "close to threshold" distance
+
+        self.symbols = np.array([], dtype=object)
+        self.source = None  # the list set_universe was last given
+        self.index = {}
+        self.last_price = np.array([], dtype=np.float64)
+        self.prev_close = np.array([], dtype=np.float64)
+        self.quantity = np.array([], dtype=np.float64)
+
+    def set_universe(self, symbols: List[str], index: Dict[str, int] = None):
+        """Reset the arrays to a new symbol list, keeping known positions
+
+        index, if given, is a prebuilt {symbol: position} map for symbols.
+        Passing the same list object again is a no-op.
+        """
+        if symbols is self.source:
+            return
+        if len(symbols) == len(self.symbols) and all(a == b for a, b in zip(symbols, self.symbols)):
+            self.source = symbols
+            return
+
+        held = {s: q for s, q in zip(self.symbols, self.quantity) if q}
+        self.source = symbols
+        self.symbols = np.array(symbols, dtype=object)
+        self.index = index if index is not None else {symbol: i for i, symbol in enumerate(symbols)}
+        self.last_price = np.full(len(symbols), np.nan)
+        self.prev_close = np.full(len(symbols), np.nan)
+        self.quantity = np.zeros(len(symbols))
+        self.set_positions(held)
+
+    def _indices(self, symbols) -> np.ndarray:
+        index = self.index
+        return np.fromiter((index[s] for s in symbols), dtype=np.intp, count=len(symbols))
+
+    def update_prices(self, prices: Dict[str, tuple]) -> np.ndarray:
+        """Set last price and previous close from {symbol: (price, prev_close)}
+
+        A prev_close of None is stored as NaN. Symbols outside the universe
+        are ignored. Returns the indices that were updated; other symbols
+        keep their last price, so pass these to screen() to act on this
+        update only.
+        """
+        index = self.index
+        idx, last_price, prev_close = [], [], []
+        for symbol, (price, close) in prices.items():
+            i = index.get(symbol)
+            if i is not None:
+                idx.append(i)
+                last_price.append(price)
+                prev_close.append(close)
+        idx = np.array(idx, dtype=np.intp)
+        self.last_price[idx] = last_price
+        self.prev_close[idx] = np.array(prev_close, dtype=np.float64)
+        return idx
+
+    def set_positions(self, positions: Dict[str, float]):
+        """Replace all position quantities with {symbol: quantity}"""
+        self.quantity[:] = 0
+        known = [s for s in positions if s in self.index]
+        self.quantity[self._indices(known)] = [positions[s] for s in known]
+
+    def set_quantity(self, symbol: str, quantity: float):
+        i = self.index.get(symbol)
+        if i is not None:
+            self.quantity[i] = quantity
+
+    def screen(self, indices: np.ndarray = None) -> ScreenResult:
+        """Compute daily change and buy/sell/near-threshold sets for the universe
+
+        indices, if given, limits the buy/sell/near sets to those symbols
+        (e.g. the ones whose prices were just refreshed).
+        """
+        price = self.last_price
+        prev_close = self.prev_close
+        # Same fallback as the per-symbol path: no previous close means no change
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = np.where(prev_close > 0, (price - prev_close) / prev_close, 0.0)
+        change_pct[np.isnan(price)] = np.nan
+
+        # NaN compares False, so unpriced symbols drop out of every mask
+        under_cap = self.quantity * price < self.max_position_value
+        buy = (change_pct <= self.buy_threshold) & under_cap
+        sell = (change_pct >= self.sell_threshold) & (self.quantity > 0) & ~buy
+        near = ((np.abs(change_pct - self.buy_threshold) < self.near_band) |
+                (np.abs(change_pct - self.sell_threshold) < self.near_band))
+        if indices is not None:
+            subset = np.zeros(len(price), dtype=bool)
+            subset[indices] = True
+            buy &= subset
+            sell &= subset
+            near &= subset
+
+        return ScreenResult(change_pct, np.flatnonzero(buy), np.flatnonzero(sell), np.flatnonzero(near))
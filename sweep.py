@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep for the threshold strategy.
+Runs run_threshold_backtest for every combination of buy threshold, sell
+threshold, trade amount and position cap across a process pool, then
+ranks the configurations. Price matrices are placed in shared memory once
+and every worker maps them directly - nothing is pickled per task.
+
+Usage:
+  python sweep.py                                   # Default grid over simulated prices
+  python sweep.py --symbols 5000 --days 1000 --seed 7
+  python sweep.py --db paper_trading.db             # Sweep over recorded price_history
+  python sweep.py --store price_store --interval 120   # ...or over tick store bars (faster to load)
+  python sweep.py --buy -0.02,-0.05 --sell 0.02,0.05 --amount 10,25 --cap 100,250
+  python sweep.py --workers 4                       # Pool size (default: all cores)
+  python sweep.py --rank max_drawdown --top 10      # Rank by another column
+  python sweep.py --out sweep.csv                   # Save the full table
+"""
+
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List
+
+import numpy as np
+
+from backtest import load_recorded_matrix, load_store_matrix, run_threshold_backtest
+from marketSim import MarketSimulator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID = {
+    'buy_threshold': [-0.02, -0.03, -0.05, -0.07],
+    'sell_threshold': [0.02, 0.03, 0.05, 0.07],
+    'trade_amount': [10, 25],
+    'max_position_value': [50, 100, 250],
+}
+
+# Lower is better for these; everything else ranks highest first
+ASCENDING = {'max_drawdown', 'avg_exposure', 'max_exposure'}
+
+# Per-worker views of the shared price matrices, set by _attach_shared
+_shared = {}
+
+
+class SharedMatrices:
+    """Copies named arrays into shared memory once, for every worker to map"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.blocks = {}
+        self.specs = {}
+        for name, array in arrays.items():
+            if array is None:
+                continue
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks[name] = block
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _attach_shared(specs):
+    """Pool initializer: map the parent's shared arrays read-only"""
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        # Keep the block referenced for the life of the worker
+        _shared[name] = (block, array)
+
+
+def _run_config(config: dict) -> dict:
+    prev_close = _shared['prev_close'][1] if 'prev_close' in _shared else None
+    result = run_threshold_backtest(_shared['prices'][1], prev_close=prev_close, **config)
+    return {**config, **result.summary()}
+
+
+def make_grid(grid: Dict[str, list]) -> List[dict]:
+    """Every combination of the grid's values, skipping buy/sell pairs that overlap"""
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return [c for c in configs if c['buy_threshold'] < c['sell_threshold']]
+
+
+def run_sweep(prices: np.ndarray, grid: Dict[str, list] = None, prev_close: np.ndarray = None,
+              workers: int = None, rank_by: str = 'total_pnl') -> List[dict]:
+    """Backtest every configuration in grid over prices; returns ranked result rows"""
+    configs = make_grid(grid or DEFAULT_GRID)
+    workers = workers or os.cpu_count() or 1
+    shared = SharedMatrices({'prices': prices, 'prev_close': prev_close})
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared,
+                                 initargs=(shared.specs,)) as executor:
+            results = list(executor.map(_run_config, configs))
+    finally:
+        shared.close()
+
+    results.sort(key=lambda r: r[rank_by], reverse=rank_by not in ASCENDING)
+    return results
+
+
+def _parse_list(value: str) -> list:
+    return [float(v) for v in value.split(',')]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    def option(name, default=None):
+        return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+    grid = dict(DEFAULT_GRID)
+    for flag, key in (('--buy', 'buy_threshold'), ('--sell', 'sell_threshold'),
+                      ('--amount', 'trade_amount'), ('--cap', 'max_position_value')):
+        if flag in sys.argv:
+            grid[key] = _parse_list(option(flag))
+
+    start = time.perf_counter()
+    prev_close = None
+    if '--db' in sys.argv:
+        from replay import iter_db_rows
+        db_path = option('--db')
+        symbols, prices, prev_close = load_recorded_matrix(iter_db_rows(db_path))
+        logger.info(f"Loaded {prices.shape[0] - 1:,} scans x {len(symbols):,} symbols from {db_path} "
+                    f"in {time.perf_counter() - start:.2f}s")
+    elif '--store' in sys.argv:
+        from tickStore import TickStore
+        root = option('--store')
+        symbols, prices, prev_close = load_store_matrix(TickStore(root), interval=float(option('--interval', 120)))
+        logger.info(f"Loaded {prices.shape[0] - 1:,} bars x {len(symbols):,} symbols from {root} "
+                    f"in {time.perf_counter() - start:.2f}s")
+    else:
+        num_symbols = int(option('--symbols', 2_000))
+        num_days = int(option('--days', 1_000))
+        prices, _ = MarketSimulator().simulate_price_matrix(num_symbols, num_days,
+                                                             seed=int(option('--seed', 42)))
+        logger.info(f"Simulated {num_symbols:,} symbols x {num_days:,} days "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    workers = int(option('--workers', os.cpu_count() or 1))
+    rank_by = option('--rank', 'total_pnl')
+    num_configs = len(make_grid(grid))
+    logger.info(f"Sweeping {num_configs} configurations on {workers} worker(s)...")
+
+    start = time.perf_counter()
+    results = run_sweep(prices, grid, prev_close, workers, rank_by)
+    elapsed = time.perf_counter() - start
+    logger.info(f"Sweep finished in {elapsed:.2f}s ({num_configs / elapsed:.1f} configs/s)")
+
+    top = int(option('--top', 20))
+    logger.info("=" * 100)
+    logger.info(f"{'rank':>4} {'buy':>6} {'sell':>6} {'amount':>7} {'cap':>6} | {'P&L':>12} "
+                f"{'drawdown':>10} {'turnover':>13} {'avg expo':>11} {'trades':>9}")
+    for rank, r in enumerate(results[:top], 1):
+        logger.info(f"{rank:>4} {r['buy_threshold']*100:>5.1f}% {r['sell_threshold']*100:>5.1f}% "
+                    f"{r['trade_amount']:>7.0f} {r['max_position_value']:>6.0f} | "
+                    f"{r['total_pnl']:>12,.2f} {r['max_drawdown']:>10,.2f} {r['total_turnover']:>13,.0f} "
+                    f"{r['avg_exposure']:>11,.0f} {r['buys'] + r['sells']:>9,}")
+
+    out_path = option('--out')
+    if out_path:
+        with open(out_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        logger.info(f"Wrote {len(results)} rows to {out_path}")
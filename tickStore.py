@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Append-only columnar store for price observations.
+Each day is a directory holding one flat binary file per column, so a day
+(or a symbol, or a time range) comes back as NumPy arrays memory-mapped
+straight from disk instead of rows pulled through SQLite.
+
+Layout:
+  price_store/symbols.txt              # symbol dictionary, id = line number
+  price_store/2024-01-02/timestamp.bin # datetime64[us]
+  price_store/2024-01-02/symbol.bin    # int32 symbol id
+  price_store/2024-01-02/price.bin     # float64
+  price_store/2024-01-02/change_pct.bin  # float64 (NaN if unknown)
+
+Usage:
+  python tickStore.py                          # Summarize price_store/
+  python tickStore.py --import paper_trading.db   # Copy price_history into the store
+  python tickStore.py --store other_store      # Use another store directory
+"""
+
+import logging
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = 'price_store'
+
+COLUMNS = {
+    'timestamp': np.dtype('<M8[us]'),
+    'symbol': np.dtype('<i4'),
+    'price': np.dtype('<f8'),
+    'change_pct': np.dtype('<f8'),
+}
+
+
+def store_path_for(db_path: str) -> str:
+    """The store that sits next to a database"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), DEFAULT_STORE_PATH)
+
+
+def _to_datetime64(value) -> np.datetime64:
+    return np.datetime64(value, 'us') if value is not None else None
+
+
+class TickStore:
+    """Per-day, per-column binary store with memory-mapped readers
+
+    Writers append whole batches under a lock and flush them, so readers
+    in other processes always see complete rows: a partly written batch
+    is ignored by using the shortest column's length.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_PATH):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.symbols = []
+        self.symbol_ids = {}
+        self._load_symbols()
+        self.files = {}  # column -> open append handle for current_day
+        self.current_day = None
+
+    def _load_symbols(self):
+        path = os.path.join(self.root, 'symbols.txt')
+        if os.path.exists(path):
+            with open(path) as f:
+                self.symbols = f.read().splitlines()
+            self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def _symbol_id(self, symbol: str, new_symbols: list) -> int:
+        i = self.symbol_ids.get(symbol)
+        if i is None:
+            i = self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            new_symbols.append(symbol)
+        return i
+
+    # Writing
+
+    def append(self, rows: Iterable[Tuple[str, datetime, float, float]]) -> int:
+        """Append (symbol, timestamp, price, daily_change_pct) rows; returns the count"""
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        with self.lock:
+            new_symbols = []
+            ids = np.array([self._symbol_id(row[0], new_symbols) for row in rows], dtype=COLUMNS['symbol'])
+            if new_symbols:
+                # The dictionary must be on disk before any row refers to it
+                with open(os.path.join(self.root, 'symbols.txt'), 'a') as f:
+                    f.write(''.join(f"{symbol}\n" for symbol in new_symbols))
+
+            timestamps = np.array([row[1] for row in rows], dtype=COLUMNS['timestamp'])
+            prices = np.array([row[2] for row in rows], dtype=COLUMNS['price'])
+            changes = np.array([row[3] for row in rows], dtype=COLUMNS['change_pct'])  # None -> NaN
+
+            days = timestamps.astype('datetime64[D]')
+            for day in np.unique(days):
+                in_day = days == day
+                self._write_day(str(day), {
+                    'timestamp': timestamps[in_day],
+                    'symbol': ids[in_day],
+                    'price': prices[in_day],
+                    'change_pct': changes[in_day],
+                })
+        return len(rows)
+
+    def _write_day(self, day: str, columns: Dict[str, np.ndarray]):
+        if day != self.current_day:
+            self._close_files()
+            directory = os.path.join(self.root, day)
+            os.makedirs(directory, exist_ok=True)
+            self.files = {name: open(os.path.join(directory, f"{name}.bin"), 'ab') for name in COLUMNS}
+            self.current_day = day
+        for name, values in columns.items():
+            self.files[name].write(values.tobytes())
+        for f in self.files.values():
+            f.flush()
+
+    def _close_files(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        self.current_day = None
+
+    def close(self):
+        with self.lock:
+            self._close_files()
+
+    # Reading
+
+    def days(self) -> List[str]:
+        """Days with data, oldest first"""
+        return sorted(d for d in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, d)) and len(d) == 10)
+
+    def read_day(self, day: str) -> Dict[str, np.ndarray]:
+        """All rows for a day as read-only memory-mapped column arrays (no copy)"""
+        directory = os.path.join(self.root, day)
+        paths = {name: os.path.join(directory, f"{name}.bin") for name in COLUMNS}
+        if not all(os.path.exists(path) for path in paths.values()):
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+
+        # Rows are only complete up to the shortest column
+        count = min(os.path.getsize(paths[name]) // dtype.itemsize for name, dtype in COLUMNS.items())
+        if count == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.memmap(paths[name], dtype=dtype, mode='r', shape=(count,))
+                for name, dtype in COLUMNS.items()}
+
+    def read(self, start=None, end=None, symbol: str = None) -> Dict[str, np.ndarray]:
+        """Rows with start <= timestamp < end, optionally for one symbol
+
+        A single unfiltered day is returned without copying; anything else
+        is filtered and concatenated in NumPy.
+        """
+        start, end = _to_datetime64(start), _to_datetime64(end)
+        first_day = str(start.astype('datetime64[D]')) if start is not None else None
+        last_day = str(end.astype('datetime64[D]')) if end is not None else None
+        days = [d for d in self.days()
+                if (first_day is None or d >= first_day) and (last_day is None or d <= last_day)]
+
+        symbol_id = None
+        if symbol is not None:
+            if symbol not in self.symbol_ids:
+                self._load_symbols()  # a writer in another process may have added it
+            symbol_id = self.symbol_ids.get(symbol, -1)
+
+        parts = []
+        for day in days:
+            columns = self.read_day(day)
+            mask = None
+            if start is not None and day == first_day:
+                mask = columns['timestamp'] >= start
+            if end is not None and day == last_day:
+                before_end = columns['timestamp'] < end
+                mask = before_end if mask is None else mask & before_end
+            if symbol_id is not None:
+                is_symbol = columns['symbol'] == symbol_id
+                mask = is_symbol if mask is None else mask & is_symbol
+            parts.append(columns if mask is None else {name: values[mask] for name, values in columns.items()})
+
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+    def symbol_names(self, ids: np.ndarray) -> np.ndarray:
+        """Map symbol ids to symbol strings"""
+        if len(ids) and ids.max() >= len(self.symbols):
+            self._load_symbols()
+        return np.array(self.symbols, dtype=object)[ids]
+
+    def bars(self, start=None, end=None, interval: float = 60) -> tuple:
+        """Last observation per symbol per interval-second bar
+
+        Returns (symbols, bar_times, price, prev_close) where price and
+        prev_close are (bars x symbols) matrices with NaN where a symbol
+        wasn't observed in a bar.
+        """
+        data = self.read(start, end)
+        interval_us = int(interval * 1_000_000)
+        bar = data['timestamp'].astype(np.int64) // interval_us
+        bar_ids, bar_row = np.unique(bar, return_inverse=True)
+        symbol_ids, symbol_col = np.unique(data['symbol'], return_inverse=True)
+
+        # Sort by (bar, symbol, timestamp); the last row of each (bar, symbol) run wins
+        order = np.lexsort((data['timestamp'], symbol_col, bar_row))
+        key = bar_row[order].astype(np.int64) * len(symbol_ids) + symbol_col[order]
+        last = order[np.append(key[1:] != key[:-1], True)] if len(order) else order
+
+        price = np.full((len(bar_ids), len(symbol_ids)), np.nan)
+        prev_close = np.full_like(price, np.nan)
+        price[bar_row[last], symbol_col[last]] = data['price'][last]
+        change = data['change_pct'][last]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prev_close[bar_row[last], symbol_col[last]] = np.where(
+                change > -1, data['price'][last] / (1 + change), np.nan)
+
+        bar_times = (bar_ids * interval_us).astype('datetime64[us]')
+        return list(self.symbol_names(symbol_ids)), bar_times, price, prev_close
+
+    def import_price_history(self, db_path: str, chunk_size: int = 100000) -> int:
+        """Copy a database's price_history into the store, oldest first"""
+        from replay import iter_db_rows
+
+        count, chunk = 0, []
+        for symbol, timestamp, price, change_pct in iter_db_rows(db_path):
+            chunk.append((symbol, timestamp, price, change_pct))
+            if len(chunk) >= chunk_size:
+                count += self.append(chunk)
+                chunk = []
+        count += self.append(chunk)
+        return count
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    root = sys.argv[sys.argv.index('--store') + 1] if '--store' in sys.argv else DEFAULT_STORE_PATH
+    store = TickStore(root)
+
+    if '--import' in sys.argv:
+        db_path = sys.argv[sys.argv.index('--import') + 1]
+        count = store.import_price_history(db_path)
+        store.close()
+        logger.info(f"Imported {count:,} price_history rows from {db_path} into {root}")
+
+    days = store.days()
+    total = 0
+    for day in days:
+        rows = len(store.read_day(day)['price'])
+        total += rows
+        logger.info(f"  {day}: {rows:,} rows")
+    logger.info(f"{root}: {total:,} rows over {len(days)} days, {len(store.symbols):,} symbols")
@@ -0,0 +1,92 @@
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HOT, WARM, COLD = 0, 1, 2
+TIER_NAMES = ('hot', 'warm', 'cold')
+
+
+class TierScheduler:
+    """Decides which symbols to poll next, by how close they are to a trade
+
+    Every symbol has a tier and a next-due time, held as arrays aligned
+    with a ThresholdScreener's universe. After each poll a symbol is
+    re-tiered from its latest daily change:
+
+      hot   held, within near_band of a threshold, or past one
+      warm  moving at least warm_band either way
+      cold  everything else
+
+    and is next due `intervals[tier]` seconds later. Symbols that have
+    never been polled are due immediately.
+    """
+
+    def __init__(self, buy_threshold: float, sell_threshold: float,
+                 intervals=(5, 60, 600), near_band: float = 0.01, warm_band: float = 0.02):
+        self.buy_threshold = buy_threshold
+        self.sell_threshold = sell_threshold
+        self.intervals = np.array(intervals, dtype=np.float64)
+        self.near_band = near_band
+        self.warm_band = warm_band
+
+        self.source = None  # the symbol list the arrays are aligned with
+        self.index = {}
+        self.tier = np.array([], dtype=np.int8)
+        self.next_due = np.array([], dtype=np.float64)
+        self.last_polled = np.array([], dtype=np.float64)
+
+    def set_universe(self, symbols: List[str], index: Dict[str, int] = None):
+        """Align with a new symbol list, keeping the schedule of known symbols"""
+        if symbols is self.source:
+            return
+        index = index if index is not None else {symbol: i for i, symbol in enumerate(symbols)}
+        tier = np.full(len(symbols), COLD, dtype=np.int8)
+        next_due = np.zeros(len(symbols))
+        last_polled = np.full(len(symbols), np.nan)
+
+        kept = [(i, self.index[symbol]) for symbol, i in index.items() if symbol in self.index]
+        if kept:
+            new, old = np.array(kept, dtype=np.intp).T
+            tier[new] = self.tier[old]
+            next_due[new] = self.next_due[old]
+            last_polled[new] = self.last_polled[old]
+
+        self.source = symbols
+        self.index = index
+        self.tier, self.next_due, self.last_polled = tier, next_due, last_polled
+
+    def due(self, now: float, limit: int = None) -> np.ndarray:
+        """Indices due for a poll at monotonic time now, hottest then most overdue first"""
+        due = np.flatnonzero(self.next_due <= now)
+        due = due[np.lexsort((self.next_due[due], self.tier[due]))]
+        return due[:limit] if limit is not None else due
+
+    def update(self, indices: np.ndarray, change_pct: np.ndarray, quantity: np.ndarray, now: float) -> np.ndarray:
+        """Re-tier freshly polled symbols and schedule their next poll
+
+        change_pct and quantity are full-universe arrays (the screener's);
+        a NaN change (no price) counts as cold. Returns the seconds since
+        each symbol's previous poll (NaN for a first poll).
+        """
+        change = change_pct[indices]
+        hot = ((quantity[indices] > 0) |
+               (change <= self.buy_threshold + self.near_band) |
+               (change >= self.sell_threshold - self.near_band))
+        warm = ~hot & (np.abs(change) >= self.warm_band)
+
+        tier = np.full(len(indices), COLD, dtype=np.int8)
+        tier[warm] = WARM
+        tier[hot] = HOT
+
+        waited = now - self.last_polled[indices]
+        self.tier[indices] = tier
+        self.next_due[indices] = now + self.intervals[tier]
+        self.last_polled[indices] = now
+        return waited
+
+    def counts(self) -> Dict[str, int]:
+        """Symbols per tier"""
+        return dict(zip(TIER_NAMES, np.bincount(self.tier, minlength=len(TIER_NAMES)).tolist()))
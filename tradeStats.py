@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Daily trade aggregates for the dashboard's performance view.
+Every recorded trade also updates its day's row in daily_trades (buy and
+sell totals, counts, distinct symbols and the running cumulative P&L), so
+/api/performance reads one row per trading day instead of grouping the
+whole trades table.
+
+Usage:
+  python tradeStats.py                          # Show daily_trades for paper_trading.db
+  python tradeStats.py --backfill               # Rebuild the aggregates from the trades table
+  python tradeStats.py --backfill other.db      # ...for another database
+"""
+
+import logging
+import sqlite3
+import sys
+import time
+from typing import List, Tuple
+
+from dbSchema import DEFAULT_DB_PATH, open_database
+
+logger = logging.getLogger(__name__)
+
+
+# New day: cumulative P&L carries on from the latest earlier day
+DAILY_UPSERT = '''
+    INSERT INTO daily_trades (date, buy_amount, sell_amount, buy_count, sell_count, symbol_count, cumulative_pnl)
+    VALUES (?1, ?2, ?3, ?4, ?5, 0,
+            COALESCE((SELECT cumulative_pnl FROM daily_trades WHERE date < ?1 ORDER BY date DESC LIMIT 1), 0)
+            + ?3 - ?2)
+    ON CONFLICT (date) DO UPDATE SET
+        buy_amount = buy_amount + excluded.buy_amount,
+        sell_amount = sell_amount + excluded.sell_amount,
+        buy_count = buy_count + excluded.buy_count,
+        sell_count = sell_count + excluded.sell_count,
+        cumulative_pnl = cumulative_pnl + excluded.sell_amount - excluded.buy_amount
+'''
+
+# Only touches rows when a trade is recorded for an earlier day (replays, backdated fills)
+LATER_DAYS_UPDATE = '''
+    UPDATE daily_trades SET cumulative_pnl = cumulative_pnl + ? WHERE date > ?
+'''
+
+DAY_SYMBOL_INSERT = '''
+    INSERT OR IGNORE INTO daily_trade_symbols (date, symbol) VALUES (?, ?)
+'''
+
+SYMBOL_COUNT_UPDATE = '''
+    UPDATE daily_trades
+    SET symbol_count = (SELECT COUNT(*) FROM daily_trade_symbols WHERE date = ?1)
+    WHERE date = ?1
+'''
+
+TRADED_SYMBOL_INSERT = '''
+    INSERT OR IGNORE INTO traded_symbols (symbol) VALUES (?)
+'''
+
+BACKFILL = [
+    'DELETE FROM daily_trades',
+    'DELETE FROM daily_trade_symbols',
+    'DELETE FROM traded_symbols',
+    'INSERT INTO daily_trade_symbols (date, symbol) SELECT DISTINCT DATE(timestamp), symbol FROM trades',
+    'INSERT INTO traded_symbols (symbol) SELECT DISTINCT symbol FROM trades',
+    '''
+    INSERT INTO daily_trades (date, buy_amount, sell_amount, buy_count, sell_count, symbol_count, cumulative_pnl)
+    SELECT date, buy_amount, sell_amount, buy_count, sell_count, symbol_count,
+           SUM(sell_amount - buy_amount) OVER (ORDER BY date)
+    FROM (
+        SELECT DATE(timestamp) AS date,
+               SUM(CASE WHEN action = 'buy' THEN amount ELSE 0 END) AS buy_amount,
+               SUM(CASE WHEN action = 'buy' THEN 0 ELSE amount END) AS sell_amount,
+               SUM(CASE WHEN action = 'buy' THEN 1 ELSE 0 END) AS buy_count,
+               SUM(CASE WHEN action = 'sell' THEN 1 ELSE 0 END) AS sell_count,
+               COUNT(DISTINCT symbol) AS symbol_count
+        FROM trades
+        GROUP BY DATE(timestamp)
+    )
+    ''',
+]
+
+# Changes whenever anything /api/performance shows does - including after a
+# backfill, which adds no trades
+DAILY_TRADES_MARKER = '''
+    SELECT COUNT(*), SUM(buy_count), SUM(sell_count), SUM(buy_amount), SUM(sell_amount),
+           SUM(cumulative_pnl), (SELECT COUNT(*) FROM traded_symbols)
+    FROM daily_trades
+'''
+
+
+def trade_date(timestamp) -> str:
+    """The trades table's DATE(timestamp) for a datetime or ISO string"""
+    return str(timestamp)[:10]
+
+
+def daily_stats_statements(symbol: str, timestamp, action: str, amount: float) -> List[Tuple[str, tuple]]:
+    """(sql, params) statements that apply one trade to the daily aggregates
+
+    Queue them in the same group as the trade row so both commit together.
+    """
+    date = trade_date(timestamp)
+    buy, sell = (amount, 0.0) if action == 'buy' else (0.0, amount)
+    return [
+        (DAILY_UPSERT, (date, buy, sell, int(action == 'buy'), int(action == 'sell'))),
+        (LATER_DAYS_UPDATE, (sell - buy, date)),
+        (DAY_SYMBOL_INSERT, (date, symbol)),
+        (SYMBOL_COUNT_UPDATE, (date,)),
+        (TRADED_SYMBOL_INSERT, (symbol,)),
+    ]
+
+
+def backfill(conn: sqlite3.Connection) -> int:
+    """Rebuild the aggregates from the trades table; returns the number of days"""
+    with conn:
+        for statement in BACKFILL:
+            conn.execute(statement)
+    return conn.execute('SELECT COUNT(*) FROM daily_trades').fetchone()[0]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db_path = args[0] if args else DEFAULT_DB_PATH
+    conn = open_database(db_path)
+
+    if '--backfill' in sys.argv:
+        start = time.perf_counter()
+        days = backfill(conn)
+        logger.info(f"Rebuilt {days:,} days of aggregates in {time.perf_counter() - start:.2f}s")
+
+    logger.info(f"{'date':<12} {'buys':>6} {'sells':>6} {'symbols':>8} {'bought':>12} {'sold':>12} {'cumulative':>12}")
+    for row in conn.execute('SELECT date, buy_count, sell_count, symbol_count, buy_amount, sell_amount, '
+                            'cumulative_pnl FROM daily_trades ORDER BY date'):
+        date, buys, sells, symbols, bought, sold, cumulative = row
+        logger.info(f"{date:<12} {buys:>6,} {sells:>6,} {symbols:>8,} {bought:>12,.2f} {sold:>12,.2f} {cumulative:>12,.2f}")
+    conn.close()